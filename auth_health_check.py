@@ -2,15 +2,45 @@
 """
 Authentication Health Check for MatheVilla
 Tests the specific authentication flows requested in the review.
+
+Monitoring mode runs the same flows concurrently at a fixed rate and checks
+latency SLOs, for use as a canary. It needs an explicit --base-url, and only
+probes registration with --registration, since every probe creates an account
+that the API has no way to delete:
+
+    python auth_health_check.py --monitor --base-url http://localhost:8001/api --rate 5 --duration 120
+    python auth_health_check.py --monitor --base-url http://localhost:8001/api --slo admin_login=p95:800 --slo protected_route=p99:200
+
+Latency is measured from the time a probe was scheduled, so probes waiting
+for a free worker count against the SLO. It prints one JSON report per
+--report-every window (and a final one) on stdout and exits with 1 if an SLO
+was breached.
 """
 
 import requests
+import argparse
 import json
 import sys
-from datetime import datetime
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+DEFAULT_BASE_URL = "https://matheschule.preview.emergentagent.com/api"
+ADMIN_CREDENTIALS = {"email": "admin@mathevilla.de", "password": "admin123"}
+STUDENT_CREDENTIALS = {"email": "max2@test.de", "password": "test123"}
+
+# Per flow: latency limits in ms by percentile, plus the allowed error rate
+DEFAULT_SLOS = {
+    "admin_login": {"p95": 1500, "error_rate": 0.01},
+    "student_login": {"p95": 1500, "error_rate": 0.01},
+    "protected_route": {"p95": 300, "error_rate": 0.01},
+    "registration": {"p95": 2000, "error_rate": 0.01},
+}
 
 class AuthHealthChecker:
-    def __init__(self, base_url="https://matheschule.preview.emergentagent.com/api"):
+    def __init__(self, base_url=DEFAULT_BASE_URL):
         self.base_url = base_url
         self.tests_run = 0
         self.tests_passed = 0
@@ -257,8 +287,177 @@ class AuthHealthChecker:
             print("💚 AUTHENTICATION SYSTEM IS HEALTHY")
             return True
 
+class AuthMonitor:
+    """Runs the authentication flows concurrently and tracks latency per flow"""
+    
+    def __init__(self, base_url, slos, concurrency=10, timeout=10, registration=False):
+        self.base_url = base_url
+        self.slos = slos
+        self.timeout = timeout
+        self.flows = [flow for flow in DEFAULT_SLOS if registration or flow != "registration"]
+        self.pool = ThreadPoolExecutor(max_workers=concurrency)
+        # Bounds the probes queued or running; the scheduler waits for a slot
+        self.in_flight = threading.BoundedSemaphore(concurrency * 2)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.admin_token = None
+        self.window = self._empty_window()
+        self.total = self._empty_window()
+    
+    def _empty_window(self):
+        return {flow: {"latencies": [], "errors": 0} for flow in self.flows}
+    
+    def _session(self):
+        # requests.Session is not thread-safe; keep one per worker thread
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+    
+    def _login(self, credentials, role):
+        response = self._session().post(f"{self.base_url}/auth/login", json=credentials, timeout=self.timeout)
+        result = response.json() if response.status_code == 200 else {}
+        ok = "access_token" in result and result.get("user", {}).get("role") == role
+        return ok, result.get("access_token")
+    
+    def probe_admin_login(self):
+        ok, token = self._login(ADMIN_CREDENTIALS, "admin")
+        if ok:
+            self.admin_token = token
+        return ok
+    
+    def probe_student_login(self):
+        return self._login(STUDENT_CREDENTIALS, "student")[0]
+    
+    def probe_protected_route(self):
+        if not self.admin_token:
+            self._login(ADMIN_CREDENTIALS, "admin")
+            return False
+        response = self._session().get(
+            f"{self.base_url}/auth/me", headers={"Authorization": f"Bearer {self.admin_token}"}, timeout=self.timeout
+        )
+        if response.status_code == 401:
+            self.admin_token = None
+        return response.status_code == 200 and "email" in response.json()
+    
+    def probe_registration(self):
+        response = self._session().post(f"{self.base_url}/auth/register", json={
+            "email": f"canary_{uuid.uuid4().hex[:12]}@test.de",
+            "password": "test123",
+            "name": "Canary User",
+            "role": "student",
+            "grade": 7
+        }, timeout=self.timeout)
+        return response.status_code == 200 and "access_token" in response.json()
+    
+    def _run_probe(self, flow, scheduled):
+        try:
+            ok = getattr(self, f"probe_{flow}")()
+        except (requests.RequestException, ValueError):
+            ok = False
+        finally:
+            self.in_flight.release()
+        latency = (time.monotonic() - scheduled) * 1000
+        with self.lock:
+            for stats in (self.window[flow], self.total[flow]):
+                stats["latencies"].append(latency)
+                if not ok:
+                    stats["errors"] += 1
+    
+    def evaluate(self, window):
+        """Percentiles per flow and the SLOs they breach"""
+        flows = {}
+        breaches = []
+        for flow, stats in window.items():
+            latencies = sorted(stats["latencies"])
+            count = len(latencies)
+            if not count:
+                continue
+            summary = {
+                "count": count,
+                "errors": stats["errors"],
+                "error_rate": round(stats["errors"] / count, 4),
+                "max_ms": round(latencies[-1], 1)
+            }
+            for pct in (50, 95, 99):
+                summary[f"p{pct}_ms"] = round(latencies[min(count - 1, int(count * pct / 100))], 1)
+            for key, limit in self.slos.get(flow, {}).items():
+                value = summary["error_rate"] if key == "error_rate" else summary[f"{key}_ms"]
+                if value > limit:
+                    breaches.append({"flow": flow, "slo": key, "limit": limit, "value": value})
+            flows[flow] = summary
+        return flows, breaches
+    
+    def report(self, window, started):
+        flows, breaches = self.evaluate(window)
+        report = {
+            "base_url": self.base_url,
+            "at": datetime.now(timezone.utc).isoformat(),
+            "window_s": round(time.monotonic() - started, 1),
+            "flows": flows,
+            "breaches": breaches,
+            "ok": not breaches
+        }
+        print(json.dumps(report), flush=True)
+        return report
+    
+    def run(self, rate, duration, report_every):
+        """Start `rate` rounds of all flows per second; returns True if all SLOs held"""
+        self.probe_admin_login()
+        started = window_started = next_tick = time.monotonic()
+        window_ok = True
+        try:
+            while not duration or time.monotonic() - started < duration:
+                for flow in self.flows:
+                    self.in_flight.acquire()
+                    self.pool.submit(self._run_probe, flow, next_tick)
+                next_tick += 1 / rate
+                time.sleep(max(0.0, next_tick - time.monotonic()))
+                if report_every and time.monotonic() - window_started >= report_every:
+                    with self.lock:
+                        window, self.window = self.window, self._empty_window()
+                    window_ok &= self.report(window, window_started)["ok"]
+                    window_started = time.monotonic()
+        except KeyboardInterrupt:
+            pass
+        self.pool.shutdown(wait=True)
+        return self.report(self.total, started)["ok"] and window_ok
+
+def parse_slos(values):
+    """--slo flow=p95:800 or flow=error_rate:0.05, on top of the defaults"""
+    slos = {flow: dict(limits) for flow, limits in DEFAULT_SLOS.items()}
+    for value in values or []:
+        flow, _, rule = value.partition("=")
+        key, _, limit = rule.partition(":")
+        if flow not in slos or key not in ("p50", "p95", "p99", "error_rate") or not limit:
+            raise argparse.ArgumentTypeError(f"invalid SLO '{value}'")
+        slos[flow][key] = float(limit)
+    return slos
+
 def main():
-    checker = AuthHealthChecker()
+    parser = argparse.ArgumentParser(description="MatheVilla authentication health check")
+    parser.add_argument("--base-url", help=f"API base URL (default for the health check: {DEFAULT_BASE_URL})")
+    parser.add_argument("--monitor", action="store_true", help="run the flows concurrently and check latency SLOs")
+    parser.add_argument("--rate", type=float, default=2, help="rounds of all flows started per second")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to run; 0 runs until interrupted")
+    parser.add_argument("--report-every", type=float, default=0, help="also report every N seconds")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--registration", action="store_true",
+                        help="also probe registration; creates one account per round")
+    parser.add_argument("--slo", action="append", metavar="FLOW=KEY:LIMIT",
+                        help=f"override an SLO; flows: {', '.join(DEFAULT_SLOS)}")
+    args = parser.parse_args()
+    
+    if args.monitor:
+        if not args.base_url:
+            parser.error("--monitor needs an explicit --base-url")
+        try:
+            slos = parse_slos(args.slo)
+        except argparse.ArgumentTypeError as e:
+            parser.error(str(e))
+        monitor = AuthMonitor(args.base_url, slos, concurrency=args.concurrency, registration=args.registration)
+        return 0 if monitor.run(args.rate, args.duration, args.report_every) else 1
+    
+    checker = AuthHealthChecker(args.base_url or DEFAULT_BASE_URL)
     success = checker.run_health_check()
     return 0 if success else 1
 
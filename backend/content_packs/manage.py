@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Maintain the seed content packs (gzip-compressed JSON, one file per pack).
+
+    python content_packs/manage.py list
+    python content_packs/manage.py export core > core.json
+    python content_packs/manage.py import core core.json
+
+export writes a pack as editable JSON. import writes it back: tasks without a
+content_id get the next free one, and the version is bumped when any task
+changed, so deployments pick up the new content on their next seed.
+"""
+
+import argparse
+import gzip
+import json
+import sys
+from pathlib import Path
+
+PACK_DIR = Path(__file__).parent
+REQUIRED_FIELDS = ("grade", "topic", "question", "task_type", "correct_answer", "explanation", "xp_reward", "difficulty")
+# The server fills in question, answer and explanation of template tasks
+TEMPLATE_REQUIRED_FIELDS = ("grade", "topic", "task_type", "xp_reward", "difficulty", "template")
+
+
+def pack_path(name):
+    return PACK_DIR / f"{name}.json.gz"
+
+
+def read_pack(name):
+    with gzip.open(pack_path(name), "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_pack(pack):
+    data = json.dumps(pack, ensure_ascii=False, indent=1).encode("utf-8")
+    # mtime=0 keeps the file byte-identical for identical content
+    with gzip.GzipFile(pack_path(pack["name"]), "wb", compresslevel=9, mtime=0) as f:
+        f.write(data)
+
+
+def assign_content_ids(name, tasks):
+    used = {task["content_id"] for task in tasks if task.get("content_id")}
+    if len(used) != sum(1 for task in tasks if task.get("content_id")):
+        sys.exit("duplicate content_id in pack")
+    next_number = max((int(cid.rsplit("-", 1)[1]) for cid in used), default=0) + 1
+    for task in tasks:
+        if not task.get("content_id"):
+            task["content_id"] = f"{name}-{next_number:04d}"
+            next_number += 1
+
+
+def validate(tasks):
+    for number, task in enumerate(tasks, 1):
+        required = TEMPLATE_REQUIRED_FIELDS if "template" in task else REQUIRED_FIELDS
+        missing = [field for field in required if field not in task]
+        if missing:
+            sys.exit(f"task {number}: missing {', '.join(missing)}")
+        if "template" in task:
+            for field in ("question", "answer", "params"):
+                if field not in task["template"]:
+                    sys.exit(f"task {number}: template without {field}")
+        elif task["task_type"] == "multiple_choice" and task["correct_answer"] not in (task.get("options") or []):
+            sys.exit(f"task {number}: correct_answer is not one of the options")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain seed content packs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list")
+    export_cmd = commands.add_parser("export")
+    export_cmd.add_argument("name")
+    import_cmd = commands.add_parser("import")
+    import_cmd.add_argument("name")
+    import_cmd.add_argument("source", help="JSON file with a list of tasks or a whole pack")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for path in sorted(PACK_DIR.glob("*.json.gz")):
+            pack = read_pack(path.name[:-len(".json.gz")])
+            print(f"{pack['name']:<20} v{pack['version']:<4} {len(pack['tasks']):>5} tasks")
+    elif args.command == "export":
+        json.dump(read_pack(args.name), sys.stdout, ensure_ascii=False, indent=1)
+        print()
+    else:
+        source = json.loads(Path(args.source).read_text(encoding="utf-8"))
+        tasks = source["tasks"] if isinstance(source, dict) else source
+        validate(tasks)
+        assign_content_ids(args.name, tasks)
+        current = read_pack(args.name) if pack_path(args.name).exists() else None
+        version = current["version"] if current else 0
+        if current is None or current["tasks"] != tasks:
+            version += 1
+        write_pack({"name": args.name, "version": version, "tasks": tasks})
+        print(f"{args.name} v{version}: {len(tasks)} tasks")
+
+
+if __name__ == "__main__":
+    main()
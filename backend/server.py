@@ -1,28 +1,125 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Header, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import CollectionInvalid, DuplicateKeyError, OperationFailure
+from pymongo import monitoring
+import contextvars
+import cProfile
+import pstats
+import asyncio
+import sys
+import threading
+import traceback
+from collections import defaultdict, deque
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, EmailStr, ValidationError
+from typing import List, Optional, Dict, Any, Tuple, Set
 import uuid
 from datetime import datetime, timezone, timedelta
+from fractions import Fraction
 import jwt
 from passlib.context import CryptContext
 import csv
 import io
 import random
+import hashlib
+import ast
+import functools
+import heapq
+import math
+import gzip
+import base64
+import re
+import json
+import time
+import numpy as np
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Database accounting for the current request. Motor copies the context into
+# its worker threads, so the listener sees the stats of the calling request.
+_request_stats: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("request_stats", default=None)
+
+def _returned_documents(reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if reply.get("value") is not None:
+        return 1
+    return 0
+
+class QueryAccountingListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+    
+    def succeeded(self, event):
+        stats = _request_stats.get()
+        if stats is not None:
+            stats["queries"] += 1
+            stats["db_time"] += event.duration_micros / 1_000_000
+            stats["documents"] += _returned_documents(event.reply)
+            self._record_command(stats, event)
+    
+    def failed(self, event):
+        stats = _request_stats.get()
+        if stats is not None:
+            stats["queries"] += 1
+            stats["db_time"] += event.duration_micros / 1_000_000
+            self._record_command(stats, event)
+    
+    @staticmethod
+    def _record_command(stats: dict, event):
+        # Per-command breakdown, only collected for profiled requests
+        commands = stats.get("commands")
+        if commands is not None:
+            entry = commands.setdefault(event.command_name, {"count": 0, "time_ms": 0.0})
+            entry["count"] += 1
+            entry["time_ms"] += event.duration_micros / 1000
+
+class PoolUsageListener(monitoring.ConnectionPoolListener):
+    """Connections currently checked out of the pool, for the readiness probe"""
+    
+    def __init__(self):
+        self.checked_out = 0
+        self.check_out_failures = 0
+    
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+    
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+    
+    def connection_check_out_failed(self, event):
+        self.check_out_failures += 1
+    
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_created(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): pass
+    def connection_check_out_started(self, event): pass
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 100))
+pool_usage = PoolUsageListener()
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    event_listeners=[QueryAccountingListener(), pool_usage]
+)
 db = client[os.environ['DB_NAME']]
 
 # JWT Config
@@ -84,6 +181,20 @@ class TokenResponse(BaseModel):
     token_type: str = "bearer"
     user: UserResponse
 
+class TemplateParam(BaseModel):
+    min: Optional[float] = None
+    max: Optional[float] = None
+    step: float = 1.0
+    choices: Optional[List[float]] = None
+
+class TaskTemplate(BaseModel):
+    question: str  # with {param} placeholders
+    explanation: str = ""  # may also use {answer}
+    params: Dict[str, TemplateParam]
+    answer: str  # formula over the params
+    constraints: List[str] = []
+    decimals: int = 0
+
 class TaskCreate(BaseModel):
     grade: int
     topic: str
@@ -94,6 +205,7 @@ class TaskCreate(BaseModel):
     explanation: str
     xp_reward: int = 10
     difficulty: str = "mittel"  # leicht, mittel, schwer
+    template: Optional[TaskTemplate] = None
 
 class TaskResponse(BaseModel):
     id: str
@@ -106,10 +218,31 @@ class TaskResponse(BaseModel):
     explanation: str
     xp_reward: int
     difficulty: str
+    is_template: bool = False
+    version: int = 1
+
+class AdminTaskResponse(TaskResponse):
+    near_duplicate_of: Optional[str] = None
+    template: Optional[TaskTemplate] = None
+
+class TaskInstance(TaskResponse):
+    seed: int
+
+class TaskVersionResponse(BaseModel):
+    id: str
+    version: int
+    deleted: bool = False
+    written_at: Optional[str] = None
+    written_by: Optional[str] = None
+    task: Optional[AdminTaskResponse] = None  # None for the tombstone of a deleted task
+
+TEMPLATE_SEED_LIMIT = 2 ** 53  # seeds round-trip through JavaScript numbers
 
 class AnswerSubmit(BaseModel):
     task_id: str
     answer: str
+    seed: Optional[int] = Field(None, ge=0, lt=TEMPLATE_SEED_LIMIT)  # instance of a template task
+    task_version: Optional[int] = Field(None, ge=1)  # version the student was shown, default current
 
 class ProgressResponse(BaseModel):
     topic: str
@@ -124,6 +257,7 @@ class DailyChallengeResponse(BaseModel):
     tasks: List[TaskResponse]
     completed: bool
     bonus_xp: int = 50
+    missing_task_ids: List[str] = []
 
 class RecommendationResponse(BaseModel):
     topic: str
@@ -138,6 +272,13 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+# bcrypt takes ~100ms of CPU per call; routes run it off the event loop
+async def hash_password_async(password: str) -> str:
+    return await run_in_threadpool(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await run_in_threadpool(verify_password, plain_password, hashed_password)
+
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -164,6 +305,65 @@ async def get_admin_user(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Admin-Zugang erforderlich")
     return current_user
 
+# ================== IDEMPOTENCY KEYS ==================
+
+# Clients may send an Idempotency-Key header on answer submissions. The first
+# request with a key runs normally and its response is stored; replays of the
+# same key return the stored response without executing any writes again.
+# A pending key is leased to the request running it: the lease is released
+# when that request fails or is cancelled, and a retry takes over a lease
+# that ran out because its worker died.
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 86400))
+IDEMPOTENCY_LEASE_SECONDS = int(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', 60))
+
+async def run_idempotent(idempotency_key: Optional[str], user_id: str, route: str, payload: dict, handler):
+    if not idempotency_key:
+        return await handler()
+    
+    key_filter = {"user_id": user_id, "key": idempotency_key}
+    request_hash = hashlib.sha256(json.dumps([route, payload], sort_keys=True).encode()).hexdigest()
+    lease_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc)
+    lease_until = now + timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)
+    try:
+        await db.idempotency_keys.insert_one({
+            **key_filter,
+            "request_hash": request_hash,
+            "status": "pending",
+            "lease_id": lease_id,
+            "lease_until": lease_until,
+            # BSON date (not an ISO string) so the TTL index can expire it
+            "created_at": now
+        })
+    except DuplicateKeyError:
+        taken_over = await db.idempotency_keys.find_one_and_update(
+            {**key_filter, "request_hash": request_hash, "status": "pending",
+             "$or": [{"lease_until": {"$lt": now}}, {"lease_until": {"$exists": False}}]},
+            {"$set": {"lease_id": lease_id, "lease_until": lease_until}},
+            projection={"_id": 1}
+        )
+        if taken_over is None:
+            stored = await db.idempotency_keys.find_one(key_filter, {"_id": 0})
+            if stored is None:
+                # Expired or released between insert attempt and lookup - treat as new
+                return await run_idempotent(idempotency_key, user_id, route, payload, handler)
+            if stored["request_hash"] != request_hash:
+                raise HTTPException(status_code=422, detail="Idempotency-Key wurde bereits für eine andere Anfrage verwendet")
+            if stored["status"] != "done":
+                raise HTTPException(status_code=409, detail="Anfrage wird noch verarbeitet")
+            return stored["response"]
+    
+    lease_filter = {**key_filter, "lease_id": lease_id}
+    try:
+        response = await handler()
+    except BaseException:
+        # Failed and cancelled requests may be retried with the same key
+        await db.idempotency_keys.delete_one(lease_filter)
+        raise
+    
+    await db.idempotency_keys.update_one(lease_filter, {"$set": {"status": "done", "response": response}})
+    return response
+
 # ================== AUTH ROUTES ==================
 
 @api_router.post("/auth/register", response_model=TokenResponse)
@@ -176,7 +376,7 @@ async def register(user_data: UserCreate):
     user_doc = {
         "id": user_id,
         "email": user_data.email,
-        "password_hash": hash_password(user_data.password),
+        "password_hash": await hash_password_async(user_data.password),
         "name": user_data.name,
         "role": user_data.role,
         "grade": user_data.grade,
@@ -206,7 +406,7 @@ async def register(user_data: UserCreate):
 @api_router.post("/auth/login", response_model=TokenResponse)
 async def login(credentials: UserLogin):
     user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user["password_hash"]):
+    if not user or not await verify_password_async(credentials.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Ungültige E-Mail oder Passwort")
     
     token = create_access_token({"sub": user["id"]})
@@ -266,6 +466,7 @@ async def request_password_reset(data: PasswordResetRequest):
         "user_id": user["id"],
         "email": data.email,
         "expires_at": expires_at.isoformat(),
+        "expire_at": expires_at,  # BSON date for the TTL index
         "used": False,
         "created_at": datetime.now(timezone.utc).isoformat()
     })
@@ -302,7 +503,7 @@ async def confirm_password_reset(data: PasswordResetConfirm):
         raise HTTPException(status_code=400, detail="Passwort muss mindestens 6 Zeichen haben")
     
     # Update password
-    new_hash = hash_password(data.new_password)
+    new_hash = await hash_password_async(data.new_password)
     await db.users.update_one(
         {"id": reset_doc["user_id"]},
         {"$set": {"password_hash": new_hash}}
@@ -323,7 +524,7 @@ async def change_password(data: PasswordChange, current_user: dict = Depends(get
     user = await db.users.find_one({"id": current_user["id"]}, {"_id": 0})
     
     # Verify old password
-    if not verify_password(data.old_password, user["password_hash"]):
+    if not await verify_password_async(data.old_password, user["password_hash"]):
         raise HTTPException(status_code=400, detail="Aktuelles Passwort ist falsch")
     
     # Validate new password
@@ -331,7 +532,7 @@ async def change_password(data: PasswordChange, current_user: dict = Depends(get
         raise HTTPException(status_code=400, detail="Neues Passwort muss mindestens 6 Zeichen haben")
     
     # Update password
-    new_hash = hash_password(data.new_password)
+    new_hash = await hash_password_async(data.new_password)
     await db.users.update_one(
         {"id": current_user["id"]},
         {"$set": {"password_hash": new_hash}}
@@ -339,6 +540,389 @@ async def change_password(data: PasswordChange, current_user: dict = Depends(get
     
     return {"message": "Passwort erfolgreich geändert"}
 
+# ================== ANSWER MATCHING ==================
+
+# Answers are compared by canonical form: numbers (German or English decimals,
+# fractions, mixed numbers, percentages, units) become an exact fraction plus
+# a unit, terms with variables a normal form, anything else normalised text.
+# The canonical form of a task's correct_answer is computed when the task is
+# written and stored as answer_canonical, so grading only parses the
+# student's answer. Ambiguous inputs are read the German way: "1,000" is one,
+# "1.000" a thousand. A unit missing on one side is not held against the
+# answer ("250" for "250 m"), and % is a unit, so "25 %" means 25, not 0,25.
+# Letters after a number are only read as a unit when the expected answer is
+# not a term: for "m·2" the answer "2m" is the monomial, and letters on their
+# own ("ab") are always a product of variables.
+ANSWER_CANONICAL_VERSION = 3
+
+# unit -> (dimension, factor to the dimension's base unit)
+UNITS = {
+    "mm": ("length", Fraction(1, 1000)), "cm": ("length", Fraction(1, 100)), "dm": ("length", Fraction(1, 10)),
+    "m": ("length", Fraction(1)), "km": ("length", Fraction(1000)),
+    "mm²": ("area", Fraction(1, 10 ** 6)), "cm²": ("area", Fraction(1, 10 ** 4)), "dm²": ("area", Fraction(1, 100)),
+    "m²": ("area", Fraction(1)), "ha": ("area", Fraction(10 ** 4)), "km²": ("area", Fraction(10 ** 6)),
+    "mm³": ("volume", Fraction(1, 10 ** 9)), "cm³": ("volume", Fraction(1, 10 ** 6)), "dm³": ("volume", Fraction(1, 1000)),
+    "m³": ("volume", Fraction(1)), "ml": ("volume", Fraction(1, 10 ** 6)), "l": ("volume", Fraction(1, 1000)),
+    "mg": ("mass", Fraction(1, 1000)), "g": ("mass", Fraction(1)), "kg": ("mass", Fraction(1000)), "t": ("mass", Fraction(10 ** 6)),
+    "s": ("time", Fraction(1)), "min": ("time", Fraction(60)), "h": ("time", Fraction(3600)),
+    "ct": ("money", Fraction(1, 100)), "€": ("money", Fraction(1)),
+    "%": ("percent", Fraction(1)), "°": ("angle", Fraction(1)),
+}
+UNIT_ALIASES = {
+    **{unit: unit for unit in UNITS},
+    **{f"{base}{suffix}": f"{base}²" for base in ("mm", "cm", "dm", "m", "km") for suffix in ("^2", "2")},
+    **{f"{base}{suffix}": f"{base}³" for base in ("mm", "cm", "dm", "m") for suffix in ("^3", "3")},
+    "qm": "m²", "liter": "l", "gramm": "g", "sek": "s", "sekunden": "s", "minuten": "min", "std": "h", "stunden": "h",
+    "euro": "€", "eur": "€", "cent": "ct", "prozent": "%", "grad": "°",
+}
+UNICODE_FRACTIONS = {"½": " 1/2", "¼": " 1/4", "¾": " 3/4", "⅓": " 1/3", "⅔": " 2/3"}
+ANSWER_VARIABLE_PREFIX = re.compile(r"^[a-z]\s*=\s*")
+FRACTION_ANSWER = re.compile(r"(?P<sign>[+-]?)\s*(?:(?P<whole>\d+)\s+)?(?P<num>\d+)\s*/\s*(?P<den>\d+)\s*(?P<unit>.*)")
+DECIMAL_ANSWER = re.compile(
+    r"(?P<sign>[+-]?)\s*(?:"
+    r"(?P<de>\d{1,3}(?:[ .]\d{3})+(?:,\d+)?)"  # 1.000 / 1 000,5 / 1.102,50
+    r"|(?P<en>\d{1,3}(?:,\d{3})+\.\d+)"  # 1,000.5
+    r"|(?P<plain>\d+(?:[.,]\d+)?|[.,]\d+)"  # 282,6 / 282.6 / ,5
+    r")\s*(?P<unit>.*)"
+)
+
+# Terms are brought into a normal form that only undoes commutativity and
+# associativity (3 + 2x = 2x + 3, x·2 = 2x, x/2 = 0,5x). Like terms are not
+# collected and products not expanded, so "3a + 5a" does not match "8a":
+# tasks that ask to simplify or factor still need the simplified answer.
+# Numeric coefficients are folded exactly; a term whose folding would exceed
+# EXPRESSION_MAX_BITS (e.g. ((9^64)^64)^64) is rejected and never matches.
+EXPRESSION_MAX_LENGTH = 120
+EXPRESSION_MAX_BITS = 512
+EXPRESSION_FUNCTIONS = {"sqrt", "abs"}
+EXPRESSION_SYMBOLS = {"·": "*", "⋅": "*", "×": "*", ":": "/", "^": "**", "²": "**2", "³": "**3", "⁴": "**4", "⁵": "**5", "⁶": "**6"}
+EXPRESSION_TOKEN = re.compile(r"\s*(?:(?P<number>\d+(?:\.\d+)?)|(?P<name>[a-z]+)|(?P<op>\*\*|[-+*/()]))")
+
+def normalize_answer(answer: str) -> str:
+    return answer.strip().lower()
+
+def expression_source(text: str) -> Optional[str]:
+    """Python syntax for a school-notation term (2x, 3(x + 1), x², 0,5a, ab), or
+    None if the text is not a term with at least one variable"""
+    if len(text) > EXPRESSION_MAX_LENGTH:
+        return None
+    for symbol, replacement in EXPRESSION_SYMBOLS.items():
+        text = text.replace(symbol, replacement)
+    text = re.sub(r"(\d),(\d)", r"\1.\2", text)
+    
+    tokens, position, has_variable = [], 0, False
+    while position < len(text):
+        match = EXPRESSION_TOKEN.match(text, position)
+        if not match or match.end() == position:
+            return None
+        position = match.end()
+        if match["name"] in EXPRESSION_FUNCTIONS:
+            tokens.append(("function", match["name"]))
+        elif match["name"]:
+            if len(match["name"]) > 3:
+                return None
+            tokens.extend(("name", letter) for letter in match["name"])  # ab = a·b
+            has_variable = True
+        elif match["number"]:
+            tokens.append(("number", match["number"]))
+        elif match["op"]:
+            tokens.append(("op", match["op"]))
+    if not has_variable:
+        return None
+    
+    # Implicit multiplication: 2x, 3(x + 1), (a + b)(a - b), x sqrt(x)
+    source = []
+    for i, (kind, value) in enumerate(tokens):
+        if i:
+            previous_kind, previous = tokens[i - 1]
+            ends_operand = previous_kind in ("number", "name") or previous == ")"
+            if ends_operand and kind == "number":
+                return None
+            if ends_operand and (kind in ("name", "function") or value == "("):
+                source.append("*")
+        source.append(value)
+    return "".join(source)
+
+def expression_memo(function):
+    """Cache a node's normal form on the node. Powers and divisors need both a
+    subterm's product and its factor string, which would otherwise evaluate
+    nested terms like x^x^x^x once per path, exponentially often"""
+    attribute = f"_{function.__name__}"
+    
+    @functools.wraps(function)
+    def memoised(node: ast.AST):
+        result = getattr(node, attribute, None)
+        if result is None:
+            result = function(node)
+            setattr(node, attribute, result)
+        return result
+    return memoised
+
+def expression_coefficient(value: Fraction) -> Fraction:
+    if max(abs(value.numerator).bit_length(), value.denominator.bit_length()) > EXPRESSION_MAX_BITS:
+        raise ValueError("Koeffizient zu groß")
+    return value
+
+@expression_memo
+def expression_product(node: ast.AST) -> Tuple[Fraction, Tuple[str, ...]]:
+    """A term as coefficient times a sorted tuple of canonical factors"""
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return Fraction(str(node.value)), ()
+    if isinstance(node, ast.Name):
+        return Fraction(1), (node.id,)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        coefficient, factors = expression_product(node.operand)
+        return (-coefficient if isinstance(node.op, ast.USub) else coefficient), factors
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult):
+        (left_coefficient, left), (right_coefficient, right) = expression_product(node.left), expression_product(node.right)
+        return expression_coefficient(left_coefficient * right_coefficient), tuple(sorted(left + right))
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Div):
+        coefficient, factors = expression_product(node.left)
+        divisor_coefficient, divisor = expression_product(node.right)
+        if not divisor_coefficient:
+            raise ValueError("Division durch Null")
+        if not divisor:
+            return expression_coefficient(coefficient / divisor_coefficient), factors
+        return coefficient, tuple(sorted(factors + (f"^({expression_factor(node.right)},-1)",)))
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+        base_coefficient, base = expression_product(node.left)
+        exponent_coefficient, exponent = expression_product(node.right)
+        if not exponent and exponent_coefficient == 1:
+            return base_coefficient, base
+        if not base and not exponent and exponent_coefficient.denominator == 1 and base_coefficient:
+            # Checked before computing: the power itself is what would hang
+            bits = max(abs(base_coefficient.numerator).bit_length(), base_coefficient.denominator.bit_length())
+            if (bits - 1) * abs(exponent_coefficient) > EXPRESSION_MAX_BITS:
+                raise ValueError("Koeffizient zu groß")
+            return expression_coefficient(base_coefficient ** exponent_coefficient), ()
+        return Fraction(1), (f"^({expression_factor(node.left)},{expression_factor(node.right)})",)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub)):
+        terms = expression_terms(node)
+        if len(terms) == 1:
+            return terms[0]
+        return Fraction(1), (f"({expression_sum(terms)})",)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in EXPRESSION_FUNCTIONS and len(node.args) == 1 and not node.keywords:
+        return Fraction(1), (f"{node.func.id}({expression_factor(node.args[0])})",)
+    raise ValueError(f"Nicht erlaubter Ausdruck: {ast.unparse(node)}")
+
+@expression_memo
+def expression_terms(node: ast.AST) -> List[Tuple[Fraction, Tuple[str, ...]]]:
+    """The summands of a term, subtraction as negated summands"""
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub)):
+        right = expression_terms(node.right)
+        if isinstance(node.op, ast.Sub):
+            right = [(-coefficient, factors) for coefficient, factors in right]
+        return expression_terms(node.left) + right
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) and isinstance(node.operand, ast.BinOp) and isinstance(node.operand.op, (ast.Add, ast.Sub)):
+        return [(-coefficient, factors) for coefficient, factors in expression_terms(node.operand)]
+    return [expression_product(node)]
+
+def expression_term(coefficient: Fraction, factors: Tuple[str, ...]) -> str:
+    return "*".join((str(coefficient),) + factors) if coefficient != 1 or not factors else "*".join(factors)
+
+def expression_sum(terms: List[Tuple[Fraction, Tuple[str, ...]]]) -> str:
+    return "+".join(sorted(expression_term(coefficient, factors) for coefficient, factors in terms if coefficient))
+
+def expression_factor(node: ast.AST) -> str:
+    return expression_sum(expression_terms(node)) or "0"
+
+def canonical_expression(text: str) -> Optional[str]:
+    """Normal form of a term, or None if the text is not a term"""
+    source = expression_source(text)
+    if source is None:
+        return None
+    try:
+        return expression_factor(ast.parse(source, mode="eval").body)
+    except (SyntaxError, ValueError, ZeroDivisionError, OverflowError, RecursionError):
+        return None
+
+def canonical_unit(text: str) -> Optional[str]:
+    """Canonical unit symbol, "" for no unit, None if the text is not a known unit"""
+    text = text.replace(" ", "").rstrip(".")
+    return "" if not text else UNIT_ALIASES.get(text)
+
+def canonical_answer(answer: str) -> dict:
+    """{"kind": "number", "value": "p/q", "unit", "decimals", "expression"}, {"kind": "expression", "value"}
+    or {"kind": "text", "value"}. The expression of a number with a unit is its
+    reading as a term (2m = 2·m), or None."""
+    text = normalize_answer(answer).replace("−", "-")
+    for symbol, replacement in UNICODE_FRACTIONS.items():
+        text = text.replace(symbol, replacement)
+    number = ANSWER_VARIABLE_PREFIX.sub("", text)
+    
+    value, decimals, unit = None, 0, None
+    match = FRACTION_ANSWER.fullmatch(number)
+    if match and int(match["den"]):
+        value = int(match["whole"] or 0) + Fraction(int(match["num"]), int(match["den"]))
+        unit = canonical_unit(match["unit"])
+    else:
+        match = DECIMAL_ANSWER.fullmatch(number)
+        if match:
+            if match["de"]:
+                digits = match["de"].replace(" ", "").replace(".", "").replace(",", ".")
+            elif match["en"]:
+                digits = match["en"].replace(",", "")
+            else:
+                digits = match["plain"].replace(",", ".")
+            value = Fraction(digits)
+            decimals = len(digits.partition(".")[2])
+            unit = canonical_unit(match["unit"])
+    
+    if value is None or unit is None:
+        expression = canonical_expression(number)
+        if expression is not None:
+            return {"v": ANSWER_CANONICAL_VERSION, "kind": "expression", "value": expression}
+        return {"v": ANSWER_CANONICAL_VERSION, "kind": "text", "value": re.sub(r"\s+", "", text).rstrip(".")}
+    if match["sign"] == "-":
+        value = -value
+    return {
+        "v": ANSWER_CANONICAL_VERSION,
+        "kind": "number",
+        "value": f"{value.numerator}/{value.denominator}",
+        "unit": unit or None,
+        "decimals": decimals,
+        "expression": canonical_expression(number) if unit else None
+    }
+
+def answers_match(given: dict, expected: dict) -> bool:
+    if given["kind"] != expected["kind"]:
+        # A number with a unit against a term is compared as a term
+        given_term = given["value"] if given["kind"] == "expression" else given.get("expression")
+        expected_term = expected["value"] if expected["kind"] == "expression" else expected.get("expression")
+        return given_term is not None and given_term == expected_term
+    if expected["kind"] != "number":
+        return given["value"] == expected["value"]
+    
+    given_value, expected_value = Fraction(given["value"]), Fraction(expected["value"])
+    # A missing unit on either side compares the bare numbers
+    if given["unit"] and expected["unit"] and given["unit"] != expected["unit"]:
+        (given_dim, given_factor), (expected_dim, expected_factor) = UNITS[given["unit"]], UNITS[expected["unit"]]
+        if given_dim != expected_dim:
+            return False
+        given_value = given_value * given_factor / expected_factor
+    if given_value == expected_value:
+        return True
+    # A rounded expected answer also accepts a more precise answer that rounds to it
+    decimals = expected["decimals"]
+    return 0 < decimals < given["decimals"] and abs(given_value - expected_value) <= Fraction(1, 2 * 10 ** decimals)
+
+def is_answer_correct(answer: str, correct_answer: str, canonical: Optional[dict] = None) -> bool:
+    """Grade an answer; canonical is the task's stored answer_canonical, if any"""
+    if not canonical or canonical.get("v") != ANSWER_CANONICAL_VERSION:
+        canonical = canonical_answer(correct_answer)
+    return answers_match(canonical_answer(answer), canonical)
+
+# A class tends to submit the same few answers to a task, so grading results
+# are memoised per (task version, template seed, normalised answer). Task
+# versions never change, so entries are never invalidated, only evicted.
+# Routes grade uncached answers in the threadpool, and an answer that takes
+# longer than GRADING_TIMEOUT_SECONDS to parse counts as wrong.
+GRADING_CACHE_SIZE = 50_000
+GRADING_TIMEOUT_SECONDS = float(os.environ.get('GRADING_TIMEOUT_SECONDS', 2))
+_grading_cache: Dict[Tuple[str, int, Optional[int], str], bool] = {}
+_grading_cache_lock = threading.Lock()
+
+def grading_cache_key(task: dict, answer: str) -> Tuple[str, int, Optional[int], str]:
+    return (task["id"], task.get("version", 1), task.get("seed"), normalize_answer(answer))
+
+def grade_answer(task: dict, answer: str) -> bool:
+    """is_answer_correct for a task document, memoised"""
+    key = grading_cache_key(task, answer)
+    result = _grading_cache.get(key)
+    if result is None:
+        result = is_answer_correct(answer, task["correct_answer"], task.get("answer_canonical"))
+        with _grading_cache_lock:
+            if len(_grading_cache) >= GRADING_CACHE_SIZE:
+                del _grading_cache[next(iter(_grading_cache))]
+            _grading_cache[key] = result
+    return result
+
+async def grade_answer_async(task: dict, answer: str) -> bool:
+    result = _grading_cache.get(grading_cache_key(task, answer))
+    if result is not None:
+        return result
+    try:
+        return await asyncio.wait_for(run_in_threadpool(grade_answer, task, answer), GRADING_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning(f"Grading timed out for task {task['id']}")
+        return False
+
+# ================== TASK VERSIONS ==================
+
+# A task version is immutable. tasks holds the current version of every live
+# task; task_versions holds every version ever written plus a tombstone for
+# each deleted task, so results, challenges and assignments can always be
+# resolved to the question that was shown. Edits write version n + 1 and
+# deletes a tombstone. Only derived fields (fingerprints, canonical answer)
+# are ever refreshed in place. Anything computed from a task can therefore
+# be cached per (id, version) without cross-process invalidation.
+#
+# Answers are graded against the current version. A client may send the
+# version it showed, which is accepted for the version an edit replaced less
+# than TASK_VERSION_GRACE_SECONDS ago, so a student mid-task is not graded
+# against an answer key they never saw; older versions would let a client
+# pick a superseded answer key.
+TASK_VERSION_CACHE_SIZE = 5000
+TASK_VERSION_GRACE_SECONDS = 2 * 3600
+TASK_VERSION_HISTORY_LIMIT = 100
+_task_version_cache: Dict[Tuple[str, int], dict] = {}
+
+def remember_task_version(task: dict) -> dict:
+    key = (task["id"], task.get("version", 1))
+    if key not in _task_version_cache:
+        if len(_task_version_cache) >= TASK_VERSION_CACHE_SIZE:
+            del _task_version_cache[next(iter(_task_version_cache))]
+        _task_version_cache[key] = task
+    return task
+
+def task_snapshot(task: dict) -> dict:
+    return {key: value for key, value in task.items() if key != "_id"}
+
+def task_tombstone(task: dict, admin_id: str) -> dict:
+    return {
+        "id": task["id"],
+        "version": task.get("version", 1) + 1,
+        "deleted": True,
+        "deleted_at": datetime.now(timezone.utc).isoformat(),
+        "deleted_by": admin_id
+    }
+
+async def get_task_version(task_id: str, version: int) -> Optional[dict]:
+    """A task as it was at a version; None if unknown or a tombstone"""
+    task = _task_version_cache.get((task_id, version))
+    if task is None:
+        task = await db.task_versions.find_one({"id": task_id, "version": version}, {"_id": 0})
+        if task is None:
+            return None
+        remember_task_version(task)
+    return None if task.get("deleted") else task
+
+async def get_graded_task(task_id: str, version: Optional[int] = None) -> dict:
+    """The task version an answer is graded against: the current one, or the
+    one the student was shown if the client sent it and it was replaced less
+    than TASK_VERSION_GRACE_SECONDS ago. Deleted tasks are not graded."""
+    task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
+    if not task:
+        raise HTTPException(status_code=404, detail="Aufgabe nicht gefunden")
+    remember_task_version(task)
+    current = task.get("version", 1)
+    if version is None or version == current:
+        return task
+    replaced_at = task.get("updated_at")
+    if version != current - 1 or not replaced_at or datetime.fromisoformat(replaced_at) < datetime.now(timezone.utc) - timedelta(seconds=TASK_VERSION_GRACE_SECONDS):
+        raise HTTPException(status_code=409, detail="Aufgabe wurde geändert, bitte neu laden")
+    task = await get_task_version(task_id, version)
+    if not task:
+        raise HTTPException(status_code=404, detail="Aufgabe nicht gefunden")
+    return task
+
+async def insert_task_version(task: dict):
+    """Write a new version; a concurrent edit that got there first is a conflict"""
+    try:
+        await db.task_versions.insert_one(task_snapshot(task))
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Aufgabe wurde gleichzeitig geändert, bitte neu laden")
+
 # ================== TASK ROUTES ==================
 
 @api_router.get("/tasks/grades")
@@ -357,11 +941,7 @@ async def get_topics(grade: int):
     }
     return {"grade": grade, "topics": topics_by_grade.get(grade, [])}
 
-@api_router.get("/tasks/{grade}/{topic}", response_model=List[TaskResponse])
-async def get_tasks(grade: int, topic: str, current_user: dict = Depends(get_current_user)):
-    tasks = await db.tasks.find({"grade": grade, "topic": topic}, {"_id": 0}).to_list(100)
-    return [TaskResponse(**task) for task in tasks]
-
+# Registered before /tasks/{grade}/{topic}, which would otherwise match "single"
 @api_router.get("/tasks/single/{task_id}", response_model=TaskResponse)
 async def get_single_task(task_id: str, current_user: dict = Depends(get_current_user)):
     task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
@@ -369,25 +949,48 @@ async def get_single_task(task_id: str, current_user: dict = Depends(get_current
         raise HTTPException(status_code=404, detail="Aufgabe nicht gefunden")
     return TaskResponse(**task)
 
+@api_router.get("/tasks/{grade}/{topic}", response_model=List[TaskResponse])
+async def get_tasks(grade: int, topic: str, current_user: dict = Depends(get_current_user)):
+    tasks = await db.tasks.find({"grade": grade, "topic": topic}, {"_id": 0}).to_list(100)
+    return [TaskResponse(**task) for task in tasks]
+
 @api_router.post("/tasks/submit")
-async def submit_answer(submission: AnswerSubmit, current_user: dict = Depends(get_current_user)):
-    task = await db.tasks.find_one({"id": submission.task_id}, {"_id": 0})
-    if not task:
-        raise HTTPException(status_code=404, detail="Aufgabe nicht gefunden")
-    
-    is_correct = submission.answer.strip().lower() == task["correct_answer"].strip().lower()
+async def submit_answer(
+    submission: AnswerSubmit,
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    return await run_idempotent(
+        idempotency_key, current_user["id"], "tasks/submit", submission.model_dump(),
+        lambda: record_answer(submission, current_user)
+    )
+
+MILESTONE_BADGES = [(10, "Anfänger"), (50, "Fortgeschritten"), (100, "Experte"), (500, "Mathe-Meister")]
+
+def milestone_badges(correct_count: int, current_badges: List[str]) -> List[str]:
+    """Milestone badges newly reached with this many correct answers"""
+    return [badge for threshold, badge in MILESTONE_BADGES if correct_count >= threshold and badge not in current_badges]
+
+async def record_answer(submission: AnswerSubmit, current_user: dict) -> dict:
+    """Grade an answer, store the result and award XP and badges"""
+    task = await get_graded_task(submission.task_id, submission.task_version)
+    task = task_for_seed(task, submission.seed)
+    is_correct = await grade_answer_async(task, submission.answer)
     
     # Save result
     result_doc = {
         "id": str(uuid.uuid4()),
         "user_id": current_user["id"],
         "task_id": submission.task_id,
+        "task_version": task.get("version", 1),
         "grade": task["grade"],
         "topic": task["topic"],
         "answer": submission.answer,
         "is_correct": is_correct,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
+    if submission.seed is not None:
+        result_doc["seed"] = submission.seed
     await db.results.insert_one(result_doc)
     
     # Update XP and level if correct
@@ -397,29 +1000,26 @@ async def submit_answer(submission: AnswerSubmit, current_user: dict = Depends(g
     
     if is_correct:
         xp_earned = task["xp_reward"]
-        user = await db.users.find_one({"id": current_user["id"]}, {"_id": 0})
-        new_xp = user.get("xp", 0) + xp_earned
-        new_level = (new_xp // 100) + 1
+        # XP is incremented in place so concurrent answers cannot overwrite
+        # each other; level and badges only ever grow from the result
+        user = await db.users.find_one_and_update(
+            {"id": current_user["id"]},
+            {"$inc": {"xp": xp_earned}},
+            projection={"_id": 0, "xp": 1, "level": 1, "badges": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        new_level = (user.get("xp", 0) // 100) + 1
         level_up = new_level > user.get("level", 1)
         
         # Check for badges
-        current_badges = user.get("badges", [])
         correct_count = await db.results.count_documents({"user_id": current_user["id"], "is_correct": True})
+        new_badges = milestone_badges(correct_count, user.get("badges", []))
         
-        if correct_count >= 10 and "Anfänger" not in current_badges:
-            new_badges.append("Anfänger")
-        if correct_count >= 50 and "Fortgeschritten" not in current_badges:
-            new_badges.append("Fortgeschritten")
-        if correct_count >= 100 and "Experte" not in current_badges:
-            new_badges.append("Experte")
-        if correct_count >= 500 and "Mathe-Meister" not in current_badges:
-            new_badges.append("Mathe-Meister")
-        
-        update_data = {"$set": {"xp": new_xp, "level": new_level}}
-        if new_badges:
-            update_data["$push"] = {"badges": {"$each": new_badges}}
-        
-        await db.users.update_one({"id": current_user["id"]}, update_data)
+        if level_up or new_badges:
+            update_data = {"$max": {"level": new_level}}
+            if new_badges:
+                update_data["$addToSet"] = {"badges": {"$each": new_badges}}
+            await db.users.update_one({"id": current_user["id"]}, update_data)
     
     return {
         "is_correct": is_correct,
@@ -430,6 +1030,203 @@ async def submit_answer(submission: AnswerSubmit, current_user: dict = Depends(g
         "new_badges": new_badges
     }
 
+# ================== TASK TEMPLATES ==================
+
+# A task with a template is a generator: the template's question and
+# explanation have {param} placeholders and its answer is a formula over the
+# params. An instance is a pure function of (template, seed), so instances are
+# never stored and a submission only carries its seed. The stored question,
+# answer and explanation are the seed-0 instance, for views that show single
+# tasks. Generation is vectorised: a whole batch of seeds is drawn from a
+# counter-based hash and every formula is evaluated once over numpy arrays.
+TEMPLATE_MAX_INSTANCES = 500
+TEMPLATE_MAX_ATTEMPTS = 32
+TEMPLATE_MAX_STEPS = 10 ** 6  # values a min/max/step param can take
+TEMPLATE_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+FORMULA_BINARY_OPS = {
+    ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.true_divide,
+    ast.FloorDiv: np.floor_divide, ast.Mod: np.mod, ast.Pow: np.power,
+}
+FORMULA_COMPARE_OPS = {
+    ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater, ast.GtE: np.greater_equal,
+    ast.Eq: np.equal, ast.NotEq: np.not_equal,
+}
+FORMULA_FUNCTIONS = {"sqrt": np.sqrt, "abs": np.abs, "floor": np.floor, "ceil": np.ceil, "min": np.minimum, "max": np.maximum}
+
+@functools.lru_cache(maxsize=1024)
+def parse_formula(source: str) -> ast.AST:
+    try:
+        return ast.parse(source, mode="eval").body
+    except SyntaxError:
+        raise ValueError(f"Ungültige Formel: {source}")
+
+def eval_formula(node: ast.AST, values: Dict[str, np.ndarray]) -> np.ndarray:
+    """Evaluate a parsed formula element-wise. Only numbers, params, arithmetic,
+    comparisons and FORMULA_FUNCTIONS are allowed, nothing else is executed."""
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return np.float64(node.value)
+    if isinstance(node, ast.Name) and node.id in values:
+        return values[node.id]
+    if isinstance(node, ast.BinOp) and type(node.op) in FORMULA_BINARY_OPS:
+        return FORMULA_BINARY_OPS[type(node.op)](eval_formula(node.left, values), eval_formula(node.right, values))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        operand = eval_formula(node.operand, values)
+        return np.negative(operand) if isinstance(node.op, ast.USub) else operand
+    if isinstance(node, ast.Compare) and all(type(op) in FORMULA_COMPARE_OPS for op in node.ops):
+        result, left = np.True_, eval_formula(node.left, values)
+        for op, comparator in zip(node.ops, node.comparators):
+            right = eval_formula(comparator, values)
+            result = np.logical_and(result, FORMULA_COMPARE_OPS[type(op)](left, right))
+            left = right
+        return result
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FORMULA_FUNCTIONS and not node.keywords:
+        return FORMULA_FUNCTIONS[node.func.id](*(eval_formula(arg, values) for arg in node.args))
+    raise ValueError(f"Nicht erlaubter Ausdruck: {ast.unparse(node)}")
+
+def mix64(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finaliser, element-wise on uint64 (wraps on overflow)"""
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def draw_param(param: TemplateParam, keys: np.ndarray) -> np.ndarray:
+    if param.choices:
+        return np.asarray(param.choices, dtype=np.float64)[keys % np.uint64(len(param.choices))]
+    steps = int(math.floor((param.max - param.min) / param.step + 1e-9)) + 1
+    return np.round(param.min + (keys % np.uint64(steps)).astype(np.float64) * param.step, 9)
+
+def format_number(value: float, decimals: int = 9) -> str:
+    """German notation: decimal comma, no trailing zeros"""
+    text = f"{float(value):.{decimals}f}"
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text.replace(".", ",")
+
+def render_template_text(text: str, replacements: Dict[str, str]) -> str:
+    return TEMPLATE_PLACEHOLDER.sub(lambda m: replacements.get(m.group(1), m.group(0)), text)
+
+def generate_instances(task: dict, seeds: List[int]) -> List[dict]:
+    """Instances of a template task for the given seeds. A seed whose draws keep
+    failing the constraints has no instance and is left out."""
+    template = TaskTemplate.model_validate(task["template"])
+    names = list(template.params)
+    answer_formula = parse_formula(template.answer)
+    constraints = [parse_formula(c) for c in template.constraints]
+    # Keyed by the validated template, so spelled-out defaults do not change the instances
+    template_key = int.from_bytes(hashlib.sha256(json.dumps(template.model_dump(), sort_keys=True).encode()).digest()[:8], "big")
+    
+    count = len(seeds)
+    base = mix64(np.asarray(seeds, dtype=np.uint64) ^ np.uint64(template_key))
+    values = {name: np.zeros(count) for name in names}
+    answers = np.zeros(count)
+    pending = np.arange(count)
+    with np.errstate(all="ignore"):
+        for attempt in range(TEMPLATE_MAX_ATTEMPTS):
+            drawn = {
+                name: draw_param(template.params[name], mix64(base[pending] + np.uint64(attempt * len(names) + i)))
+                for i, name in enumerate(names)
+            }
+            answer = np.broadcast_to(eval_formula(answer_formula, drawn), pending.shape)
+            ok = np.isfinite(answer)
+            for constraint in constraints:
+                ok &= np.broadcast_to(eval_formula(constraint, drawn), pending.shape).astype(bool)
+            done = pending[ok]
+            for name in names:
+                values[name][done] = drawn[name][ok]
+            answers[done] = answer[ok]
+            pending = pending[~ok]
+            if not pending.size:
+                break
+    answers = np.round(answers, template.decimals)
+    failed = set(pending.tolist())
+    
+    instances = []
+    for i, seed in enumerate(seeds):
+        if i in failed:
+            continue
+        replacements = {name: format_number(values[name][i]) for name in names}
+        replacements["answer"] = format_number(answers[i], template.decimals)
+        instances.append({
+            **{field: task[field] for field in ("grade", "topic", "xp_reward", "difficulty")},
+            "id": task.get("id", ""),
+            "version": task.get("version", 1),
+            "seed": seed,
+            "question": render_template_text(template.question, replacements),
+            "task_type": "free_text",
+            "options": None,
+            "correct_answer": replacements["answer"],
+            "explanation": render_template_text(template.explanation, replacements)
+        })
+    return instances
+
+def validate_task_template(task: dict):
+    """Raise ValueError unless the template reliably produces instances. Any
+    other error a bad template causes is reported as a ValueError too."""
+    try:
+        check_task_template(task)
+    except ValidationError as e:
+        raise ValueError(f"Ungültige Vorlage: {e.errors()[0]['msg']}")
+    except (TypeError, OverflowError, ZeroDivisionError) as e:
+        raise ValueError(f"Fehler in der Vorlage: {e}")
+
+def check_task_template(task: dict):
+    template = TaskTemplate.model_validate(task["template"])
+    if task["task_type"] != "free_text":
+        raise ValueError("Vorlagen gibt es nur für Freitext-Aufgaben")
+    for name, param in template.params.items():
+        if not name.isidentifier() or name == "answer":
+            raise ValueError(f"Ungültiger Parametername: {name}")
+        if param.choices:
+            continue
+        if param.min is None or param.max is None or param.max < param.min or param.step <= 0:
+            raise ValueError(f"Parameter {name}: min <= max und step > 0 oder choices angeben")
+        if not (param.max - param.min) / param.step < TEMPLATE_MAX_STEPS:
+            raise ValueError(f"Parameter {name}: höchstens {TEMPLATE_MAX_STEPS} Werte")
+    placeholders = set(TEMPLATE_PLACEHOLDER.findall(template.question + template.explanation))
+    unknown = placeholders - set(template.params) - {"answer"}
+    if unknown:
+        raise ValueError(f"Unbekannte Platzhalter: {', '.join(sorted(unknown))}")
+    sample = {name: np.ones(1) for name in template.params}
+    for formula in [template.answer, *template.constraints]:
+        eval_formula(parse_formula(formula), sample)
+    if len(generate_instances(task, list(range(20)))) < 18:
+        raise ValueError("Die Bedingungen werden zu selten erfüllt")
+
+def template_example(task: dict) -> dict:
+    """Question, answer and explanation of the seed-0 instance, stored on the task"""
+    instance = generate_instances(task, [0])
+    if not instance:
+        raise ValueError("Die Vorlage erzeugt für Seed 0 keine Aufgabe")
+    return {field: instance[0][field] for field in ("question", "correct_answer", "explanation")}
+
+def task_for_seed(task: dict, seed: Optional[int]) -> dict:
+    """The task as answered: the seed's instance if it is a template task"""
+    if seed is None or not task.get("template"):
+        return task
+    instances = generate_instances(task, [seed])
+    if not instances:
+        raise HTTPException(status_code=400, detail="Für diesen Seed gibt es keine Aufgabe")
+    return {**task, **instances[0], "answer_canonical": canonical_answer(instances[0]["correct_answer"])}
+
+@api_router.get("/tasks/single/{task_id}/instances", response_model=List[TaskInstance])
+async def get_task_instances(
+    task_id: str,
+    seed: int = Query(0, ge=0, lt=TEMPLATE_SEED_LIMIT),
+    count: int = Query(20, ge=1, le=TEMPLATE_MAX_INSTANCES),
+    current_user: dict = Depends(get_current_user)
+):
+    """Instances seed, seed+1, ... of a template task, e.g. to prefetch a practice session"""
+    task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
+    if not task:
+        raise HTTPException(status_code=404, detail="Aufgabe nicht gefunden")
+    if not task.get("template"):
+        raise HTTPException(status_code=400, detail="Aufgabe ist keine Vorlage")
+    seeds = [s for s in range(seed, seed + count) if s < TEMPLATE_SEED_LIMIT]
+    instances = await run_in_threadpool(generate_instances, task, seeds)
+    return [TaskInstance(**instance) for instance in instances]
+
 # ================== PROGRESS ROUTES ==================
 
 @api_router.get("/progress/overview", response_model=List[ProgressResponse])
@@ -438,21 +1235,36 @@ async def get_progress_overview(current_user: dict = Depends(get_current_user)):
     topics_resp = await get_topics(grade)
     topics = topics_resp["topics"]
     
+    # Task totals and the student's results per topic, one aggregation each
+    task_counts = await db.tasks.aggregate([
+        {"$match": {"grade": grade, "topic": {"$in": topics}}},
+        {"$group": {"_id": "$topic", "total": {"$sum": 1}}}
+    ]).to_list(None)
+    totals = {t["_id"]: t["total"] for t in task_counts}
+    
+    result_stats = await db.results.aggregate([
+        {"$match": {"user_id": current_user["id"], "grade": grade, "topic": {"$in": topics}}},
+        {"$group": {
+            "_id": "$topic",
+            "task_ids": {"$addToSet": "$task_id"},
+            "correct": {"$sum": {"$cond": ["$is_correct", 1, 0]}}
+        }},
+        {"$project": {"completed": {"$size": "$task_ids"}, "correct": 1}}
+    ]).to_list(None)
+    stats_by_topic = {r["_id"]: r for r in result_stats}
+    
     progress_list = []
     for topic in topics:
-        total_tasks = await db.tasks.count_documents({"grade": grade, "topic": topic})
-        results = await db.results.find({"user_id": current_user["id"], "grade": grade, "topic": topic}, {"_id": 0}).to_list(1000)
-        
-        completed_task_ids = set(r["task_id"] for r in results)
-        correct_count = sum(1 for r in results if r["is_correct"])
+        total_tasks = totals.get(topic, 0)
+        completed_tasks = stats_by_topic.get(topic, {}).get("completed", 0)
         
-        percentage = (len(completed_task_ids) / total_tasks * 100) if total_tasks > 0 else 0
+        percentage = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
         
         progress_list.append(ProgressResponse(
             topic=topic,
             total_tasks=total_tasks,
-            completed_tasks=len(completed_task_ids),
-            correct_answers=correct_count,
+            completed_tasks=completed_tasks,
+            correct_answers=stats_by_topic.get(topic, {}).get("correct", 0),
             percentage=round(percentage, 1)
         ))
     
@@ -496,89 +1308,293 @@ async def get_user_stats(current_user: dict = Depends(get_current_user)):
         "weaknesses": sorted(weaknesses, key=lambda x: x["rate"])[:3]
     }
 
+# ================== TASK CATALOG CACHE ==================
+
+# Ordered task ids (and creation times) per (grade, difficulty), so challenges
+# can be derived without loading whole task documents on every request.
+CATALOG_TTL_SECONDS = int(os.environ.get('CATALOG_TTL_SECONDS', 300))
+_task_id_catalog: Dict[Any, Dict[str, Any]] = {}
+
+async def get_task_catalog(grade: Optional[int] = None, difficulty: Optional[str] = None, loaded_after: float = 0) -> Dict[str, Any]:
+    """{"ids", "id_set", "created_at"} for a grade (and difficulty), cached per
+    process; loaded_after (epoch seconds) forces a reload of an older copy"""
+    key = (grade, difficulty)
+    cached = _task_id_catalog.get(key)
+    if cached and time.monotonic() - cached["loaded_at"] < CATALOG_TTL_SECONDS and cached["loaded_wall"] >= loaded_after:
+        return cached
+    
+    query = {}
+    if grade is not None:
+        query["grade"] = grade
+    if difficulty is not None:
+        query["difficulty"] = difficulty
+    loaded_wall = time.time()
+    docs = await db.tasks.find(query, {"_id": 0, "id": 1, "created_at": 1}).sort("id", 1).to_list(None)
+    ids = [d["id"] for d in docs]
+    catalog = {
+        "ids": ids,
+        "id_set": set(ids),
+        "created_at": {d["id"]: d.get("created_at", "") for d in docs},
+        "loaded_at": time.monotonic(),
+        "loaded_wall": loaded_wall
+    }
+    _task_id_catalog[key] = catalog
+    return catalog
+
+async def get_catalog_task_ids(grade: Optional[int] = None, difficulty: Optional[str] = None) -> List[str]:
+    """Return the sorted task ids for a grade (and difficulty), cached per process"""
+    return (await get_task_catalog(grade, difficulty))["ids"]
+
+async def get_live_task_ids() -> Set[str]:
+    """Ids of all tasks that currently exist, from the cached catalog"""
+    await get_catalog_task_ids()
+    return _task_id_catalog[(None, None)]["id_set"]
+
+async def get_tasks_by_ids(task_ids: List[str]) -> Tuple[List[dict], List[str]]:
+    """Fetch tasks in one query, keeping the order of task_ids.
+    
+    Returns the tasks found and the ids that no longer exist.
+    """
+    if not task_ids:
+        return [], []
+    docs = await db.tasks.find({"id": {"$in": task_ids}}, {"_id": 0}).to_list(len(task_ids))
+    by_id = {d["id"]: d for d in docs}
+    missing = [t for t in task_ids if t not in by_id]
+    if missing:
+        logger.warning(f"{len(missing)} referenced task(s) no longer exist: {missing}")
+    return [by_id[t] for t in task_ids if t in by_id], missing
+
+def invalidate_task_catalog():
+    """Drop cached task id lists after the task collection changed"""
+    _task_id_catalog.clear()
+
 # ================== DAILY CHALLENGE ROUTES ==================
 
+# A challenge is derived, not stored, until its first submission: every task
+# is ranked by a hash of (user_id, day, task_id) and the lowest ranks win.
+# The candidates are the tasks that existed when the day began (UTC), read
+# from a catalog loaded after that, so every worker derives the same
+# challenge all day, whatever is added to the catalog meanwhile. A deleted
+# task only frees its own slot. Submissions are accepted for challenges
+# served up to DAILY_CHALLENGE_GRACE_DAYS days ago, so a challenge opened
+# before midnight can still be finished after it.
+DAILY_CHALLENGE_SIZE = 5
+DAILY_CHALLENGE_GRACE_DAYS = 1
+DAILY_CHALLENGE_NAMESPACE = uuid.UUID("6f1c2f0e-5b7a-4c1e-9a53-2d8c0b6e7a41")
+
+def daily_challenge_id(user_id: str, day: str) -> str:
+    return str(uuid.uuid5(DAILY_CHALLENGE_NAMESPACE, f"{user_id}:{day}"))
+
+def daily_challenge_day(user_id: str, challenge_id: str, now: datetime) -> Optional[str]:
+    """The day a derived challenge id was served for, within the grace period"""
+    for offset in range(DAILY_CHALLENGE_GRACE_DAYS + 1):
+        day = (now - timedelta(days=offset)).strftime("%Y-%m-%d")
+        if challenge_id == daily_challenge_id(user_id, day):
+            return day
+    return None
+
+def pick_daily_task_ids(task_ids: List[str], user_id: str, day: str) -> List[str]:
+    """Deterministically pick the challenge tasks by hash rank; the result does
+    not depend on the order of task_ids, and adding or removing a task only
+    changes it if that task is (or was) among the picks"""
+    def rank(task_id: str) -> bytes:
+        return hashlib.sha256(f"{user_id}:{day}:{task_id}".encode()).digest()
+    return heapq.nsmallest(DAILY_CHALLENGE_SIZE, task_ids, key=rank)
+
+async def get_daily_task_ids(user_id: str, grade: int, day: str) -> List[str]:
+    day_start = datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+    current = None
+    for catalog_grade in (grade, None):
+        catalog = await get_task_catalog(catalog_grade, loaded_after=day_start)
+        # ISO timestamps of earlier days sort before the bare date
+        snapshot = [t for t in catalog["ids"] if catalog["created_at"][t] < day]
+        if len(snapshot) >= DAILY_CHALLENGE_SIZE:
+            return pick_daily_task_ids(snapshot, user_id, day)
+        if current is None and len(catalog["ids"]) >= DAILY_CHALLENGE_SIZE:
+            current = catalog["ids"]
+    # A catalog created today has no snapshot yet; use what exists now
+    return pick_daily_task_ids(current or catalog["ids"], user_id, day)
+
 @api_router.get("/challenges/daily", response_model=DailyChallengeResponse)
 async def get_daily_challenge(current_user: dict = Depends(get_current_user)):
     today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
     grade = current_user.get("grade", 5)
     
-    # Check if challenge exists for today
-    existing = await db.daily_challenges.find_one({"user_id": current_user["id"], "date": today}, {"_id": 0})
+    # Only challenges with submissions are stored; otherwise derive the tasks
+    existing = await db.daily_challenges.find_one(
+        {"user_id": current_user["id"], "date": today},
+        {"_id": 0, "id": 1, "task_ids": 1, "completed": 1}
+    )
     
     if existing:
         task_ids = existing["task_ids"]
-        tasks = await db.tasks.find({"id": {"$in": task_ids}}, {"_id": 0}).to_list(5)
-        return DailyChallengeResponse(
-            id=existing["id"],
-            date=today,
-            tasks=[TaskResponse(**t) for t in tasks],
-            completed=existing["completed"],
-            bonus_xp=50
-        )
-    
-    # Create new daily challenge
-    all_tasks = await db.tasks.find({"grade": grade}, {"_id": 0}).to_list(1000)
-    if len(all_tasks) < 5:
-        all_tasks = await db.tasks.find({}, {"_id": 0}).to_list(1000)
-    
-    selected_tasks = random.sample(all_tasks, min(5, len(all_tasks)))
-    task_ids = [t["id"] for t in selected_tasks]
-    
-    challenge_doc = {
-        "id": str(uuid.uuid4()),
-        "user_id": current_user["id"],
-        "date": today,
-        "task_ids": task_ids,
-        "completed": False,
-        "completed_task_ids": []
-    }
-    await db.daily_challenges.insert_one(challenge_doc)
+        challenge_id = existing["id"]
+        completed = existing.get("completed", False)
+    else:
+        task_ids = await get_daily_task_ids(current_user["id"], grade, today)
+        challenge_id = daily_challenge_id(current_user["id"], today)
+        completed = False
     
+    tasks, missing_task_ids = await get_tasks_by_ids(task_ids)
     return DailyChallengeResponse(
-        id=challenge_doc["id"],
+        id=challenge_id,
         date=today,
-        tasks=[TaskResponse(**t) for t in selected_tasks],
-        completed=False,
-        bonus_xp=50
+        tasks=[TaskResponse(**t) for t in tasks],
+        completed=completed,
+        bonus_xp=50,
+        missing_task_ids=missing_task_ids
     )
 
 @api_router.post("/challenges/submit/{challenge_id}")
-async def submit_challenge_answer(challenge_id: str, submission: AnswerSubmit, current_user: dict = Depends(get_current_user)):
-    challenge = await db.daily_challenges.find_one({"id": challenge_id, "user_id": current_user["id"]}, {"_id": 0})
-    if not challenge:
-        raise HTTPException(status_code=404, detail="Challenge nicht gefunden")
+async def submit_challenge_answer(
+    challenge_id: str,
+    submission: AnswerSubmit,
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    return await run_idempotent(
+        idempotency_key, current_user["id"], f"challenges/submit/{challenge_id}", submission.model_dump(),
+        lambda: record_challenge_answer(challenge_id, submission, current_user)
+    )
+
+async def record_challenge_answer(challenge_id: str, submission: AnswerSubmit, current_user: dict) -> dict:
+    user_id = current_user["id"]
+    day = daily_challenge_day(user_id, challenge_id, datetime.now(timezone.utc))
     
-    # Submit the answer normally
-    result = await submit_answer(submission, current_user)
+    if day and not await db.daily_challenges.find_one({"user_id": user_id, "date": day}, {"_id": 0, "id": 1}):
+        # First submission of a derived challenge persists it, so its tasks
+        # are only ranked once; the unique (user_id, date) index keeps
+        # concurrent requests to one document
+        task_ids = await get_daily_task_ids(user_id, current_user.get("grade", 5), day)
+        try:
+            await db.daily_challenges.update_one(
+                {"user_id": user_id, "date": day},
+                {"$setOnInsert": {
+                    "id": challenge_id,
+                    "task_ids": task_ids,
+                    "completed": False,
+                    "completed_task_ids": [],
+                    "created_at": datetime.now(timezone.utc).isoformat()
+                }},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            pass
+    
+    # Only the first submission per task gets through this filter
+    challenge = await db.daily_challenges.find_one_and_update(
+        {"id": challenge_id, "user_id": user_id, "task_ids": submission.task_id, "completed_task_ids": {"$ne": submission.task_id}},
+        {"$addToSet": {"completed_task_ids": submission.task_id}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
     
-    # Track completion
-    completed_tasks = challenge.get("completed_task_ids", [])
-    if submission.task_id not in completed_tasks:
-        completed_tasks.append(submission.task_id)
+    if challenge:
+        # Submit the answer normally. The task was claimed above so that only
+        # one request records it; if recording fails the claim is released
+        # again, or the task could never be submitted
+        try:
+            result = await record_answer(submission, current_user)
+        except BaseException:
+            await db.daily_challenges.update_one(
+                {"id": challenge_id, "user_id": user_id},
+                {"$pull": {"completed_task_ids": submission.task_id}}
+            )
+            raise
+    else:
+        challenge = await db.daily_challenges.find_one({"id": challenge_id, "user_id": user_id}, {"_id": 0})
+        if not challenge:
+            raise HTTPException(status_code=404, detail="Challenge nicht gefunden")
+        if submission.task_id not in challenge["task_ids"]:
+            raise HTTPException(status_code=400, detail="Aufgabe gehört nicht zur Challenge")
+        # Repeated submission - grade it again without recording or rewarding
+        task = await get_graded_task(submission.task_id, submission.task_version)
+        task = task_for_seed(task, submission.seed)
+        result = {
+            "is_correct": await grade_answer_async(task, submission.answer),
+            "correct_answer": task["correct_answer"],
+            "explanation": task["explanation"],
+            "xp_earned": 0,
+            "level_up": False,
+            "new_badges": [],
+            "already_submitted": True
+        }
     
-    all_completed = len(completed_tasks) >= len(challenge["task_ids"])
+    # Track completion; tasks deleted since the challenge was created are not required
+    live_task_ids = await get_live_task_ids()
+    required_task_ids = [t for t in challenge["task_ids"] if t in live_task_ids]
+    remaining = [t for t in required_task_ids if t not in challenge["completed_task_ids"]]
+    all_completed = not remaining
     bonus_awarded = False
     
     if all_completed and not challenge["completed"]:
-        # Award bonus XP
-        await db.users.update_one(
-            {"id": current_user["id"]},
-            {"$inc": {"xp": 50}}
+        # Exactly one request flips the flag and awards the bonus
+        flipped = await db.daily_challenges.update_one(
+            {"id": challenge_id, "completed": False},
+            {"$set": {"completed": True}}
         )
-        bonus_awarded = True
-    
-    await db.daily_challenges.update_one(
-        {"id": challenge_id},
-        {"$set": {"completed_task_ids": completed_tasks, "completed": all_completed}}
-    )
+        if flipped.modified_count:
+            await db.users.update_one(
+                {"id": user_id},
+                {"$inc": {"xp": 50}}
+            )
+            bonus_awarded = True
     
     result["challenge_completed"] = all_completed
     result["bonus_xp_awarded"] = bonus_awarded
-    result["tasks_remaining"] = len(challenge["task_ids"]) - len(completed_tasks)
+    result["tasks_remaining"] = len(remaining)
     
     return result
 
+# ================== LLM GATEWAY ==================
+
+# After LLM_FAILURE_THRESHOLD consecutive failures the circuit opens and LLM
+# calls fail fast (callers fall back to static texts) until LLM_RESET_SECONDS
+# have passed; then one trial call decides whether it closes again.
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', 20))
+LLM_FAILURE_THRESHOLD = 5
+LLM_RESET_SECONDS = 30
+
+class CircuitOpenError(Exception):
+    pass
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_running = False
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+    
+    async def call(self, awaitable, timeout: float):
+        state = self.state
+        if state == "open" or (state == "half_open" and self.trial_running):
+            awaitable.close()
+            raise CircuitOpenError("LLM circuit open")
+        self.trial_running = state == "half_open"
+        try:
+            result = await asyncio.wait_for(awaitable, timeout)
+        except Exception:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            raise
+        finally:
+            self.trial_running = False
+        self.failures = 0
+        self.opened_at = None
+        return result
+
+llm_breaker = CircuitBreaker(LLM_FAILURE_THRESHOLD, LLM_RESET_SECONDS)
+
 # ================== AI RECOMMENDATIONS ==================
 
 @api_router.get("/recommendations", response_model=List[RecommendationResponse])
@@ -656,7 +1672,7 @@ Gib eine kurze, ermutigende Lernempfehlung auf Deutsch (max 3 Sätze)."""
             system_message="Du bist ein freundlicher Mathe-Tutor für Schüler."
         ).with_model("openai", "gpt-4o-mini")
         
-        response = await chat.send_message(UserMessage(text=prompt))
+        response = await llm_breaker.call(chat.send_message(UserMessage(text=prompt)), LLM_TIMEOUT_SECONDS)
         
         return {"recommendation": response}
     except Exception as e:
@@ -700,10 +1716,21 @@ async def get_admin_stats(admin: dict = Depends(get_admin_user)):
 async def get_all_students(admin: dict = Depends(get_admin_user)):
     students = await db.users.find({"role": "student"}, {"_id": 0, "password_hash": 0}).to_list(1000)
     
+    # Answer counts for all students in one aggregation
+    pipeline = [
+        {"$match": {"user_id": {"$in": [s["id"] for s in students]}}},
+        {"$group": {
+            "_id": "$user_id",
+            "total": {"$sum": 1},
+            "correct": {"$sum": {"$cond": ["$is_correct", 1, 0]}}
+        }}
+    ]
+    counts = {c["_id"]: c for c in await db.results.aggregate(pipeline).to_list(None)}
+    
     student_list = []
     for student in students:
-        total = await db.results.count_documents({"user_id": student["id"]})
-        correct = await db.results.count_documents({"user_id": student["id"], "is_correct": True})
+        total = counts.get(student["id"], {}).get("total", 0)
+        correct = counts.get(student["id"], {}).get("correct", 0)
         student_list.append({
             **student,
             "tasks_completed": total,
@@ -737,35 +1764,102 @@ async def get_student_detail(student_id: str, admin: dict = Depends(get_admin_us
         ]
     }
 
-@api_router.post("/admin/tasks", response_model=TaskResponse)
+def template_task_fields(fields: dict) -> dict:
+    """Task fields with is_template set; a template task's text becomes its
+    seed-0 instance. Raises ValueError for an invalid template."""
+    fields["is_template"] = fields.get("template") is not None
+    if fields["is_template"]:
+        validate_task_template(fields)
+        fields.update(template_example(fields))
+    return fields
+
+def with_template_example(fields: dict) -> dict:
+    """template_task_fields with an invalid template as a 400"""
+    try:
+        return template_task_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.post("/admin/tasks", response_model=AdminTaskResponse)
 async def create_task(task: TaskCreate, admin: dict = Depends(get_admin_user)):
+    fields = with_template_example(task.model_dump())
     task_doc = {
         "id": str(uuid.uuid4()),
-        **task.model_dump(),
+        **fields,
+        **task_fingerprints(fields),
         "created_at": datetime.now(timezone.utc).isoformat(),
-        "created_by": admin["id"]
+        "created_by": admin["id"],
+        "version": 1
     }
-    await db.tasks.insert_one(task_doc)
-    return TaskResponse(**task_doc)
+    task_doc["near_duplicate_of"] = (await find_near_duplicates([task_doc]))[0]
+    await insert_task_version(task_doc)
+    await db.tasks.insert_one(task_snapshot(task_doc))
+    invalidate_task_catalog()
+    return AdminTaskResponse(**task_doc)
 
-@api_router.put("/admin/tasks/{task_id}", response_model=TaskResponse)
+@api_router.put("/admin/tasks/{task_id}", response_model=AdminTaskResponse)
 async def update_task(task_id: str, task: TaskCreate, admin: dict = Depends(get_admin_user)):
-    existing = await db.tasks.find_one({"id": task_id})
+    """Write the edit as the task's next version"""
+    existing = await db.tasks.find_one({"id": task_id}, {"_id": 0})
     if not existing:
         raise HTTPException(status_code=404, detail="Aufgabe nicht gefunden")
     
-    await db.tasks.update_one({"id": task_id}, {"$set": task.model_dump()})
-    updated = await db.tasks.find_one({"id": task_id}, {"_id": 0})
-    return TaskResponse(**updated)
+    fields = task.model_dump()
+    if "template" not in task.model_fields_set:
+        # Clients that do not know about templates must not drop them
+        fields["template"] = existing.get("template")
+    fields = with_template_example(fields)
+    updated = {
+        **existing,
+        **fields,
+        **task_fingerprints(fields),
+        "version": existing.get("version", 1) + 1,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "updated_by": admin["id"]
+    }
+    if existing.get("content_id"):
+        # Pack upgrades no longer overwrite this task
+        updated["diverged"] = True
+    updated["near_duplicate_of"] = (await find_near_duplicates([updated]))[0]
+    await insert_task_version(updated)
+    # The version filter loses against a delete that ran in between
+    result = await db.tasks.replace_one({"id": task_id, "version": existing.get("version")}, task_snapshot(updated))
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Aufgabe nicht gefunden")
+    invalidate_task_catalog()
+    return AdminTaskResponse(**updated)
 
 @api_router.delete("/admin/tasks/{task_id}")
 async def delete_task(task_id: str, admin: dict = Depends(get_admin_user)):
-    result = await db.tasks.delete_one({"id": task_id})
-    if result.deleted_count == 0:
+    """Remove the task from the catalog; its versions stay, ended by a tombstone"""
+    existing = await db.tasks.find_one_and_delete({"id": task_id}, projection={"_id": 0, "id": 1, "version": 1})
+    if not existing:
         raise HTTPException(status_code=404, detail="Aufgabe nicht gefunden")
+    tombstone = task_tombstone(existing, admin["id"])
+    # Replaces the version an edit racing this delete may have written but not published
+    await db.task_versions.replace_one({"id": task_id, "version": tombstone["version"]}, tombstone, upsert=True)
+    invalidate_task_catalog()
     return {"message": "Aufgabe gelöscht"}
 
-@api_router.get("/admin/tasks", response_model=List[TaskResponse])
+@api_router.get("/admin/tasks/{task_id}/versions", response_model=List[TaskVersionResponse])
+async def get_task_versions(task_id: str, admin: dict = Depends(get_admin_user)):
+    """The versions of a task, newest first, including the tombstone of a deleted task"""
+    versions = await db.task_versions.find({"id": task_id}, {"_id": 0}).sort("version", -1).to_list(TASK_VERSION_HISTORY_LIMIT)
+    if not versions:
+        raise HTTPException(status_code=404, detail="Aufgabe nicht gefunden")
+    return [
+        TaskVersionResponse(
+            id=task_id,
+            version=version["version"],
+            deleted=version.get("deleted", False),
+            written_at=version.get("deleted_at") or version.get("updated_at") or version.get("created_at"),
+            written_by=version.get("deleted_by") or version.get("updated_by") or version.get("created_by"),
+            task=None if version.get("deleted") else AdminTaskResponse(**version)
+        )
+        for version in versions
+    ]
+
+@api_router.get("/admin/tasks", response_model=List[AdminTaskResponse])
 async def get_all_tasks(grade: Optional[int] = None, topic: Optional[str] = None, admin: dict = Depends(get_admin_user)):
     query = {}
     if grade:
@@ -773,60 +1867,675 @@ async def get_all_tasks(grade: Optional[int] = None, topic: Optional[str] = None
     if topic:
         query["topic"] = topic
     tasks = await db.tasks.find(query, {"_id": 0}).to_list(1000)
-    return [TaskResponse(**t) for t in tasks]
+    return [AdminTaskResponse(**t) for t in tasks]
+
+# CSV import: the spooled upload is parsed and validated in the threadpool one
+# batch at a time, so memory stays flat and the event loop keeps serving.
+# Rows whose content hash matches an existing task or an earlier row are skipped;
+# near-duplicates are imported and flagged, or skipped with near_duplicates=reject.
+# The template column holds a template task's template as JSON.
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_REPORTED_ERRORS = 500
+CSV_TASK_COLUMNS = ["grade", "topic", "question", "task_type", "options", "correct_answer", "explanation", "xp_reward", "difficulty", "template"]
+
+def task_content_hash(task: dict) -> str:
+    """Identity of a task's content, independent of whitespace and case"""
+    key = "\x1f".join(
+        " ".join(str(task.get(field) or "").split()).lower()
+        for field in ("grade", "topic", "question", "correct_answer")
+    )
+    return hashlib.sha256(key.encode()).hexdigest()
+
+# Near-duplicate detection: questions are shingled into word bigrams (plus the
+# answer), summarised by a MinHash signature and split into LSH bands. Tasks
+# sharing a band are candidates; only those are compared exactly, so a lookup
+# is one indexed $in query on minhash_bands instead of a catalog scan.
+NEAR_DUPLICATE_THRESHOLD = 0.8
+MINHASH_BANDS = 16
+MINHASH_ROWS = 4
+MINHASH_PRIME = (1 << 61) - 1
+_minhash_rng = random.Random(0x4D48)
+MINHASH_PERMUTATIONS = [
+    (_minhash_rng.randrange(1, MINHASH_PRIME), _minhash_rng.randrange(MINHASH_PRIME))
+    for _ in range(MINHASH_BANDS * MINHASH_ROWS)
+]
+SHINGLE_TOKEN_PATTERN = re.compile(r"\w+|[+\-−×÷*/:=<>%^]")
+
+def task_shingles(task: dict) -> Set[str]:
+    tokens = SHINGLE_TOKEN_PATTERN.findall(str(task.get("question") or "").lower())
+    shingles = {" ".join(pair) for pair in zip(tokens, tokens[1:])} or set(tokens)
+    shingles.add("=" + " ".join(str(task.get("correct_answer") or "").split()).lower())
+    return shingles
+
+def minhash_bands(shingles: Set[str]) -> List[str]:
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") for s in shingles]
+    signature = [min((a * h + b) % MINHASH_PRIME for h in hashes) for a, b in MINHASH_PERMUTATIONS]
+    return [
+        f"{band}:" + hashlib.blake2b(repr(signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS]).encode(), digest_size=6).hexdigest()
+        for band in range(MINHASH_BANDS)
+    ]
+
+def task_fingerprints(task: dict) -> dict:
+    """Stored fields derived from a task's content: duplicate detection, the
+    canonical answer and the lowercased question for prefix search"""
+    return {
+        "question_lower": str(task.get("question") or "").lower(),
+        "content_hash": task_content_hash(task),
+        "minhash_bands": minhash_bands(task_shingles(task)),
+        "answer_canonical": canonical_answer(str(task.get("correct_answer") or ""))
+    }
+
+def add_fingerprints(tasks: List[dict]) -> List[dict]:
+    for task in tasks:
+        task.update(task_fingerprints(task))
+    return tasks
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+def match_near_duplicates(tasks: List[dict], known: List[dict]) -> List[Optional[str]]:
+    """For each task, the id of a near-duplicate among the known tasks or the
+    tasks before it in the list; None if it has none"""
+    buckets = defaultdict(list)
+    
+    def add(task: dict, shingles: Set[str]):
+        for band in task["minhash_bands"]:
+            buckets[band].append((task["id"], shingles))
+    
+    for task in known:
+        add(task, task_shingles(task))
+    matches = []
+    for task in tasks:
+        shingles = task_shingles(task)
+        compared = {task["id"]}
+        match = None
+        for band in task["minhash_bands"]:
+            for other_id, other_shingles in buckets[band]:
+                if other_id in compared:
+                    continue
+                compared.add(other_id)
+                if jaccard(shingles, other_shingles) >= NEAR_DUPLICATE_THRESHOLD:
+                    match = other_id
+                    break
+            if match:
+                break
+        matches.append(match)
+        add(task, shingles)
+    return matches
+
+async def find_near_duplicates(tasks: List[dict]) -> List[Optional[str]]:
+    """match_near_duplicates against the catalog; tasks need id and minhash_bands"""
+    bands = list({band for task in tasks for band in task["minhash_bands"]})
+    known = await db.tasks.find(
+        {"minhash_bands": {"$in": bands}},
+        {"_id": 0, "id": 1, "question": 1, "correct_answer": 1, "minhash_bands": 1}
+    ).to_list(None) if bands else []
+    return await run_in_threadpool(match_near_duplicates, tasks, known)
+
+def near_duplicate_clusters(buckets: List[List[str]], tasks: List[dict]) -> List[List[dict]]:
+    """Group tasks into clusters of near-duplicates, given the ids sharing each band"""
+    by_id = {task["id"]: task for task in tasks}
+    shingles = {task_id: task_shingles(task) for task_id, task in by_id.items()}
+    parent = {task_id: task_id for task_id in by_id}
+    
+    def root(task_id: str) -> str:
+        while parent[task_id] != task_id:
+            parent[task_id] = parent[parent[task_id]]
+            task_id = parent[task_id]
+        return task_id
+    
+    compared = set()
+    for ids in buckets:
+        ids = [task_id for task_id in ids if task_id in by_id]
+        for i, a in enumerate(ids):
+            for b in ids[i + 1:]:
+                pair = (a, b) if a < b else (b, a)
+                if pair in compared or root(a) == root(b):
+                    continue
+                compared.add(pair)
+                if jaccard(shingles[a], shingles[b]) >= NEAR_DUPLICATE_THRESHOLD:
+                    parent[root(a)] = root(b)
+    
+    clusters = defaultdict(list)
+    for task_id, task in by_id.items():
+        clusters[root(task_id)].append(task)
+    return sorted(
+        (sorted(cluster, key=lambda t: (t["grade"], t["topic"], t["id"])) for cluster in clusters.values() if len(cluster) > 1),
+        key=len, reverse=True
+    )
+
+def parse_task_row(row: dict) -> TaskCreate:
+    """One CSV row as TaskCreate; optional columns may be missing or empty"""
+    if None in row:
+        raise ValueError("Zu viele Spalten")
+    values = {k: v.strip() for k, v in row.items() if k and v is not None and v.strip() != ""}
+    values.setdefault("task_type", "free_text")
+    values.setdefault("explanation", "")
+    if "options" in values:
+        values["options"] = values["options"].split("|")
+    if "template" in values:
+        try:
+            values["template"] = json.loads(values["template"])
+        except json.JSONDecodeError:
+            raise ValueError("template ist kein gültiges JSON")
+    return TaskCreate.model_validate(values)
+
+def read_import_batch(reader: csv.DictReader, batch_size: int, start_row: int) -> Tuple[List[Tuple[int, int, dict]], List[dict]]:
+    """Parse up to batch_size rows: ([(row, line, task_fields)], errors)"""
+    valid, errors = [], []
+    row_number = start_row
+    for row in reader:
+        row_number += 1
+        try:
+            valid.append((row_number, reader.line_num, template_task_fields(parse_task_row(row).model_dump())))
+        except ValidationError as e:
+            errors.append({
+                "row": row_number,
+                "line": reader.line_num,
+                "errors": [{"field": ".".join(str(p) for p in err["loc"]), "message": err["msg"]} for err in e.errors()]
+            })
+        except ValueError as e:
+            errors.append({"row": row_number, "line": reader.line_num, "errors": [{"field": None, "message": str(e)}]})
+        if len(valid) + len(errors) >= batch_size:
+            break
+    return valid, errors
+
+def split_import_duplicates(
+    valid: List[Tuple[int, int, dict]], existing: Dict[str, str], seen_hashes: Dict[str, int]
+) -> Tuple[List[Tuple[int, int, dict]], List[dict]]:
+    """Rows of a batch that are new, and the report of those that are exact
+    duplicates of a catalog task (existing: content hash -> id) or of an
+    earlier row (seen_hashes: content hash -> row, updated in place)"""
+    new, duplicates = [], []
+    for row, line, fields in valid:
+        content_hash = task_content_hash(fields)
+        duplicate_of = existing.get(content_hash) or (f"Zeile {seen_hashes[content_hash]}" if content_hash in seen_hashes else None)
+        if duplicate_of:
+            duplicates.append({"row": row, "line": line, "duplicate_of": duplicate_of})
+            continue
+        seen_hashes[content_hash] = row
+        new.append((row, line, fields))
+    return new, duplicates
+
+# Paged catalog for the admin task list: keyset pagination on (grade, topic, id)
+# and facet counts for the filtered set, both from one aggregation.
+TASK_PAGE_DEFAULT_LIMIT = 50
+TASK_PAGE_MAX_LIMIT = 200
+
+class TaskFacetCount(BaseModel):
+    value: Any
+    count: int
+
+class TaskPage(BaseModel):
+    items: List[AdminTaskResponse]
+    next_cursor: Optional[str] = None
+    total: int
+    facets: Dict[str, List[TaskFacetCount]]
+
+def encode_task_cursor(task: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps([task["grade"], task["topic"], task["id"]]).encode()).decode()
+
+def decode_task_cursor(cursor: str) -> dict:
+    try:
+        grade, topic, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Ungültiger Cursor")
+    return {"$or": [
+        {"grade": {"$gt": grade}},
+        {"grade": grade, "topic": {"$gt": topic}},
+        {"grade": grade, "topic": topic, "id": {"$gt": task_id}}
+    ]}
+
+@api_router.get("/admin/tasks/page", response_model=TaskPage)
+async def get_tasks_page(
+    grade: Optional[int] = None,
+    topic: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    task_type: Optional[str] = None,
+    q: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = TASK_PAGE_DEFAULT_LIMIT,
+    admin: dict = Depends(get_admin_user)
+):
+    """Admin: one page of the catalog plus facet counts per grade, topic and difficulty"""
+    limit = min(max(limit, 1), TASK_PAGE_MAX_LIMIT)
+    query = {}
+    if grade:
+        query["grade"] = grade
+    if topic:
+        query["topic"] = topic
+    if difficulty:
+        query["difficulty"] = difficulty
+    if task_type:
+        query["task_type"] = task_type
+    if q and q.strip():
+        # Case-sensitive anchored regex on the lowercased copy, so it is a
+        # range scan on the question_lower index
+        query["question_lower"] = {"$regex": f"^{re.escape(q.strip().lower())}"}
+    
+    # The page is sorted and limited on its own so it can walk the
+    # (grade, topic, id) index; stages inside $facet never use an index
+    page_query = {"$and": [query, decode_task_cursor(cursor)]} if cursor else query
+    facet_stages = lambda field: [{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}, {"$sort": {"_id": 1}}]
+    page, [result] = await asyncio.gather(
+        db.tasks.find(page_query, {"_id": 0}).sort([("grade", 1), ("topic", 1), ("id", 1)]).limit(limit + 1).to_list(limit + 1),
+        db.tasks.aggregate([
+            {"$match": query},
+            {"$facet": {
+                "grade": facet_stages("grade"),
+                "topic": facet_stages("topic"),
+                "difficulty": facet_stages("difficulty"),
+                "total": [{"$count": "count"}]
+            }}
+        ]).to_list(1)
+    )
+    
+    items = page[:limit]
+    return TaskPage(
+        items=[AdminTaskResponse(**t) for t in items],
+        next_cursor=encode_task_cursor(items[-1]) if len(page) > limit else None,
+        total=result["total"][0]["count"] if result["total"] else 0,
+        facets={
+            field: [TaskFacetCount(value=f["_id"], count=f["count"]) for f in result[field]]
+            for field in ("grade", "topic", "difficulty")
+        }
+    )
+
+@api_router.get("/admin/tasks/duplicates")
+async def get_duplicate_clusters(admin: dict = Depends(get_admin_user)):
+    """Admin: clusters of near-duplicate tasks in the catalog"""
+    buckets = await db.tasks.aggregate([
+        {"$project": {"_id": 0, "id": 1, "minhash_bands": 1}},
+        {"$unwind": "$minhash_bands"},
+        {"$group": {"_id": "$minhash_bands", "ids": {"$addToSet": "$id"}}},
+        {"$match": {"ids.1": {"$exists": True}}},
+        {"$project": {"_id": 0, "ids": 1}}
+    ]).to_list(None)
+    candidate_ids = list({task_id for bucket in buckets for task_id in bucket["ids"]})
+    tasks = await db.tasks.find(
+        {"id": {"$in": candidate_ids}},
+        {"_id": 0, "id": 1, "grade": 1, "topic": 1, "question": 1, "correct_answer": 1, "created_at": 1}
+    ).to_list(None) if candidate_ids else []
+    clusters = await run_in_threadpool(near_duplicate_clusters, [bucket["ids"] for bucket in buckets], tasks)
+    return {
+        "threshold": NEAR_DUPLICATE_THRESHOLD,
+        "duplicate_tasks": sum(len(cluster) - 1 for cluster in clusters),
+        "clusters": [{"size": len(cluster), "tasks": cluster} for cluster in clusters]
+    }
+
+# Full-text search over question, topic and explanation, backed by the German
+# text index on tasks. Highlights are word offsets per field, so the client
+# can mark them without rendering server-made HTML.
+TASK_SEARCH_DEFAULT_LIMIT = 20
+TASK_SEARCH_MAX_LIMIT = 100
+TASK_SEARCH_FIELDS = ("question", "topic", "explanation")
+GERMAN_SUFFIXES = ("ern", "em", "en", "er", "es", "e", "n", "s")
+WORD_PATTERN = re.compile(r"\w+")
+UMLAUTS = str.maketrans({"ä": "a", "ö": "o", "ü": "u", "ß": "ss"})
+
+class TaskSearchHit(AdminTaskResponse):
+    score: float
+    highlights: Dict[str, List[Tuple[int, int]]]
+
+class TaskSearchPage(BaseModel):
+    items: List[TaskSearchHit]
+    total: int
+    page: int
+    pages: int
+
+def search_stem(word: str) -> str:
+    """Rough German stem, close enough to the index stemmer to find the matched words"""
+    word = word.lower().translate(UMLAUTS)
+    stripped = True
+    while stripped:
+        stripped = False
+        for suffix in GERMAN_SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                word, stripped = word[:-len(suffix)], True
+                break
+    return word
+
+def search_terms(q: str) -> Set[str]:
+    """Stems of the positive terms of a $text query; negated terms are skipped"""
+    return {search_stem(word) for token in q.split() if not token.startswith("-") for word in WORD_PATTERN.findall(token)}
+
+def highlight_spans(text: Optional[str], stems: Set[str]) -> List[Tuple[int, int]]:
+    return [(m.start(), m.end()) for m in WORD_PATTERN.finditer(text or "") if search_stem(m.group()) in stems]
+
+@api_router.get("/admin/tasks/search", response_model=TaskSearchPage)
+async def search_tasks(
+    q: str,
+    grade: Optional[int] = None,
+    page: int = 1,
+    limit: int = TASK_SEARCH_DEFAULT_LIMIT,
+    admin: dict = Depends(get_admin_user)
+):
+    """Admin: ranked full-text search over the task catalog"""
+    stems = search_terms(q)
+    if not stems:
+        raise HTTPException(status_code=400, detail="Suchbegriff fehlt")
+    limit = min(max(limit, 1), TASK_SEARCH_MAX_LIMIT)
+    page = max(page, 1)
+    query = {"$text": {"$search": q}}
+    if grade:
+        query["grade"] = grade
+    
+    result = (await db.tasks.aggregate([
+        {"$match": query},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+        {"$facet": {
+            "items": [
+                {"$sort": {"score": -1, "id": 1}},
+                {"$skip": (page - 1) * limit},
+                {"$limit": limit},
+                {"$project": {"_id": 0}}
+            ],
+            "total": [{"$count": "count"}]
+        }}
+    ]).to_list(1))[0]
+    
+    total = result["total"][0]["count"] if result["total"] else 0
+    return TaskSearchPage(
+        items=[
+            TaskSearchHit(**task, highlights={
+                field: spans for field in TASK_SEARCH_FIELDS if (spans := highlight_spans(task.get(field), stems))
+            })
+            for task in result["items"]
+        ],
+        total=total,
+        page=page,
+        pages=-(-total // limit)
+    )
 
 @api_router.post("/admin/tasks/import-csv")
-async def import_tasks_csv(file: UploadFile = File(...), admin: dict = Depends(get_admin_user)):
+async def import_tasks_csv(
+    file: UploadFile = File(...),
+    batch_size: int = IMPORT_BATCH_SIZE,
+    near_duplicates: str = "flag",
+    admin: dict = Depends(get_admin_user)
+):
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Nur CSV-Dateien erlaubt")
+    if near_duplicates not in ("flag", "reject"):
+        raise HTTPException(status_code=400, detail="near_duplicates muss flag oder reject sein")
+    batch_size = min(max(batch_size, 1), 10000)
     
-    content = await file.read()
-    decoded = content.decode('utf-8')
-    reader = csv.DictReader(io.StringIO(decoded))
-    
+    reader = csv.DictReader(io.TextIOWrapper(file.file, encoding="utf-8-sig", newline=""))
     imported_count = 0
+    failed_count = 0
+    duplicate_count = 0
     errors = []
+    duplicates = []
+    near_duplicate_count = 0
+    near_duplicate_rows = []
+    seen_hashes: Dict[str, int] = {}
+    rows_read = 0
     
-    for row in reader:
+    while True:
         try:
-            task_doc = {
-                "id": str(uuid.uuid4()),
-                "grade": int(row["grade"]),
-                "topic": row["topic"],
-                "question": row["question"],
-                "task_type": row.get("task_type", "free_text"),
-                "options": row.get("options", "").split("|") if row.get("options") else None,
-                "correct_answer": row["correct_answer"],
-                "explanation": row.get("explanation", ""),
-                "xp_reward": int(row.get("xp_reward", 10)),
-                "difficulty": row.get("difficulty", "mittel"),
-                "created_at": datetime.now(timezone.utc).isoformat(),
-                "created_by": admin["id"]
-            }
-            await db.tasks.insert_one(task_doc)
-            imported_count += 1
-        except Exception as e:
-            errors.append(f"Zeile {imported_count + len(errors) + 1}: {str(e)}")
-    
-    return {"imported": imported_count, "errors": errors}
+            valid, batch_errors = await run_in_threadpool(read_import_batch, reader, batch_size, rows_read)
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise HTTPException(status_code=400, detail=f"CSV nach Zeile {rows_read + 1} nicht lesbar: {e}")
+        if not valid and not batch_errors:
+            break
+        rows_read += len(valid) + len(batch_errors)
+        failed_count += len(batch_errors)
+        errors.extend(batch_errors[:max(0, IMPORT_MAX_REPORTED_ERRORS - len(errors))])
+        
+        hashes = list({task_content_hash(fields) for _, _, fields in valid})
+        existing = {
+            doc["content_hash"]: doc["id"]
+            for doc in await db.tasks.find(
+                {"content_hash": {"$in": hashes}}, {"_id": 0, "id": 1, "content_hash": 1}
+            ).to_list(None)
+        } if valid else {}
+        new, batch_duplicates = split_import_duplicates(valid, existing, seen_hashes)
+        duplicate_count += len(batch_duplicates)
+        duplicates.extend(batch_duplicates[:max(0, IMPORT_MAX_REPORTED_ERRORS - len(duplicates))])
+        
+        now = datetime.now(timezone.utc).isoformat()
+        doc_rows = [(row, line) for row, line, _ in new]
+        docs = [
+            {"id": str(uuid.uuid4()), **fields, "created_at": now, "created_by": admin["id"], "version": 1}
+            for _, _, fields in new
+        ]
+        
+        if docs:
+            await run_in_threadpool(add_fingerprints, docs)
+            matches = await find_near_duplicates(docs)
+            kept = []
+            for doc, (row, line), match in zip(docs, doc_rows, matches):
+                if match:
+                    near_duplicate_count += 1
+                    if len(near_duplicate_rows) < IMPORT_MAX_REPORTED_ERRORS:
+                        near_duplicate_rows.append({"row": row, "line": line, "near_duplicate_of": match})
+                    if near_duplicates == "reject":
+                        continue
+                doc["near_duplicate_of"] = match
+                kept.append(doc)
+            docs = kept
+        if docs:
+            await db.task_versions.insert_many([task_snapshot(doc) for doc in docs], ordered=False)
+            await db.tasks.insert_many(docs, ordered=False)
+            imported_count += len(docs)
+    
+    if imported_count:
+        invalidate_task_catalog()
+    return {
+        "imported": imported_count,
+        "failed": failed_count,
+        "duplicates": duplicate_count,
+        "near_duplicates": near_duplicate_count,
+        "rows": rows_read,
+        "errors": errors,
+        "duplicate_rows": duplicates,
+        "near_duplicate_rows": near_duplicate_rows
+    }
+
+# Export streams straight from the cursor; the CSV uses the import columns
+# (plus id, which the import ignores), template included, so an export can be
+# imported again without loss.
+EXPORT_BATCH_SIZE = 500
+
+def task_csv_row(task: dict) -> List[Any]:
+    values = {
+        **task,
+        "options": "|".join(task.get("options") or []),
+        "template": json.dumps(task["template"], ensure_ascii=False) if task.get("template") else "",
+    }
+    return [task["id"]] + [values.get(column, "") for column in CSV_TASK_COLUMNS]
+
+async def stream_tasks_export(query: dict, export_format: str):
+    cursor = db.tasks.find(query, {"_id": 0}).sort("id", 1).batch_size(EXPORT_BATCH_SIZE)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        writer.writerow(["id"] + CSV_TASK_COLUMNS)
+    rows = 0
+    async for task in cursor:
+        if export_format == "csv":
+            writer.writerow(task_csv_row(task))
+        else:
+            buffer.write(json.dumps(task, ensure_ascii=False) + "\n")
+        rows += 1
+        if rows % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+@api_router.get("/admin/tasks/export")
+async def export_tasks(
+    format: str = "csv",
+    grade: Optional[int] = None,
+    topic: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    admin: dict = Depends(get_admin_user)
+):
+    if format not in ("csv", "jsonl"):
+        raise HTTPException(status_code=400, detail="Format muss csv oder jsonl sein")
+    query = {}
+    if grade:
+        query["grade"] = grade
+    if topic:
+        query["topic"] = topic
+    if difficulty:
+        query["difficulty"] = difficulty
+    
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    filename = f"aufgaben-{datetime.now(timezone.utc).strftime('%Y%m%d')}.{format}"
+    return StreamingResponse(
+        stream_tasks_export(query, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 # ================== SEED DATA ==================
 
+# Seed content ships as versioned, gzip-compressed JSON packs in content_packs/
+# (maintained with content_packs/manage.py) and is only read when applied.
+# Tasks are keyed by a stable content_id: applying a newer pack version writes
+# a new task version for changed tasks and inserts new ones, unchanged tasks
+# are not written. An upgrade replaces the task's content with the pack's, so
+# fields dropped from the pack are dropped from the task; pack tasks an admin
+# has edited are marked diverged and left alone.
+CONTENT_PACK_DIR = ROOT_DIR / "content_packs"
+CONTENT_PACKS = ("core", "additional", "nrw-hauptschule")
+
+def load_content_pack(name: str) -> dict:
+    """{"name", "version", "tasks"}; read from disk on every call"""
+    with gzip.open(CONTENT_PACK_DIR / f"{name}.json.gz", "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+def pack_task_hash(task: dict) -> str:
+    return hashlib.sha256(json.dumps(task, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+def prepare_pack_tasks(pack: dict) -> List[dict]:
+    """Pack tasks with the stored fields derived from them. Template tasks
+    whose template is invalid are logged and left out."""
+    tasks = []
+    for task in pack["tasks"]:
+        fields = {**task, "is_template": "template" in task}
+        if fields["is_template"]:
+            try:
+                validate_task_template(fields)
+                fields.update(template_example(fields))
+            except ValueError as e:
+                logger.warning(f"Skipping template task {task.get('content_id')} of pack {pack['name']}: {e}")
+                continue
+        tasks.append({**fields, **task_fingerprints(fields), "pack_hash": pack_task_hash(task), "content_pack": f"{pack['name']}@{pack['version']}"})
+    return tasks
+
+async def apply_content_pack(name: str) -> dict:
+    """Bring the catalog up to the pack's version; returns what was written"""
+    pack = await run_in_threadpool(load_content_pack, name)
+    applied = await db.content_packs.find_one({"name": name}, {"_id": 0, "version": 1})
+    if applied and applied["version"] >= pack["version"]:
+        return {"pack": name, "version": applied["version"], "inserted": 0, "updated": 0, "diverged": 0, "unchanged": len(pack["tasks"])}
+    
+    tasks = await run_in_threadpool(prepare_pack_tasks, pack)
+    # Tasks seeded before content packs have no content_id; they are adopted
+    # by content hash instead of being inserted a second time
+    existing = await db.tasks.find(
+        {"$or": [
+            {"content_id": {"$in": [t["content_id"] for t in tasks]}},
+            {"content_id": {"$exists": False}, "created_by": "system", "content_hash": {"$in": [t["content_hash"] for t in tasks]}}
+        ]},
+        {"_id": 0}
+    ).to_list(None)
+    by_content_id = {doc["content_id"]: doc for doc in existing if doc.get("content_id")}
+    legacy = {}
+    for doc in existing:
+        if not doc.get("content_id"):
+            legacy.setdefault(doc["content_hash"], doc)
+    
+    now = datetime.now(timezone.utc).isoformat()
+    replacements = []
+    insertions = []
+    diverged = 0
+    for task in tasks:
+        current = by_content_id.get(task["content_id"])
+        if current and current.get("pack_hash") == task["pack_hash"]:
+            continue
+        if current and current.get("diverged"):
+            diverged += 1
+            continue
+        if not current:
+            current = legacy.pop(task["content_hash"], None)
+        if current:
+            kept = {field: current[field] for field in ("id", "created_at", "created_by") if field in current}
+            doc = {**kept, **task, "version": current.get("version", 1) + 1, "updated_at": now, "updated_by": "system"}
+            replacements.append((current.get("version"), doc))
+        else:
+            insertions.append({"id": str(uuid.uuid4()), **task, "created_at": now, "created_by": "system", "version": 1})
+    
+    # New pack tasks get the same near-duplicate check as created and imported tasks
+    if insertions:
+        for doc, match in zip(insertions, await find_near_duplicates(insertions)):
+            doc["near_duplicate_of"] = match
+    
+    # Tasks are written before their versions, so no version row exists for a
+    # task write that failed
+    written = []
+    if insertions:
+        # A concurrent apply that inserted the task first wins
+        result = await db.tasks.bulk_write(
+            [UpdateOne({"content_id": doc["content_id"]}, {"$setOnInsert": doc}, upsert=True) for doc in insertions], ordered=False
+        )
+        written += [doc for i, doc in enumerate(insertions) if i in result.upserted_ids]
+    inserted = len(written)
+    complete = True
+    if replacements:
+        result = await db.tasks.bulk_write(
+            [ReplaceOne({"id": doc["id"], "version": version}, doc) for version, doc in replacements], ordered=False
+        )
+        if result.matched_count == len(replacements):
+            written += [doc for _, doc in replacements]
+        else:
+            # A task changed since it was read; the pack stays at its old
+            # version so the next apply retries it
+            complete = False
+            stored = {
+                doc["id"]: doc for doc in await db.tasks.find(
+                    {"id": {"$in": [doc["id"] for _, doc in replacements]}}, {"_id": 0, "id": 1, "version": 1, "pack_hash": 1}
+                ).to_list(None)
+            }
+            written += [
+                doc for _, doc in replacements
+                if stored.get(doc["id"], {}).get("version") == doc["version"] and stored[doc["id"]].get("pack_hash") == doc["pack_hash"]
+            ]
+            logger.warning(f"Content pack {name}: {len(replacements) - result.matched_count} tasks changed during the upgrade, not applying v{pack['version']}")
+    if written:
+        await db.task_versions.bulk_write(
+            [UpdateOne({"id": doc["id"], "version": doc["version"]}, {"$setOnInsert": task_snapshot(doc)}, upsert=True) for doc in written],
+            ordered=False
+        )
+    if insertions or replacements:
+        invalidate_task_catalog()
+    
+    updated = len(written) - inserted
+    if complete:
+        await db.content_packs.update_one(
+            {"name": name},
+            {"$set": {"version": pack["version"], "task_count": len(tasks), "applied_at": now}},
+            upsert=True
+        )
+        logger.info(f"Applied content pack {name} v{pack['version']}: {inserted} inserted, {updated} updated, {diverged} diverged")
+    return {
+        "pack": name, "version": pack["version"] if complete else (applied["version"] if applied else 0),
+        "inserted": inserted, "updated": updated, "diverged": diverged,
+        "unchanged": len(tasks) - len(insertions) - len(replacements) - diverged
+    }
+
+async def task_counts_by_grade() -> Dict[str, int]:
+    counts = {f"grade_{grade}": 0 for grade in range(5, 11)}
+    async for row in db.tasks.aggregate([{"$group": {"_id": "$grade", "count": {"$sum": 1}}}]):
+        counts[f"grade_{row['_id']}"] = row["count"]
+    return counts
+
 @api_router.post("/seed")
 async def seed_database():
-    # Check if already seeded
-    task_count = await db.tasks.count_documents({})
-    if task_count > 0:
-        return {"message": "Datenbank bereits mit Seed-Daten gefüllt", "task_count": task_count}
-    
-    seed_tasks = get_seed_tasks()
-    
-    for task in seed_tasks:
-        task["id"] = str(uuid.uuid4())
-        task["created_at"] = datetime.now(timezone.utc).isoformat()
-        task["created_by"] = "system"
-    
-    await db.tasks.insert_many(seed_tasks)
+    result = await apply_content_pack("core")
     
     # Create admin user if not exists
     admin_exists = await db.users.find_one({"email": "admin@mathevilla.de"})
@@ -834,7 +2543,7 @@ async def seed_database():
         admin_doc = {
             "id": str(uuid.uuid4()),
             "email": "admin@mathevilla.de",
-            "password_hash": hash_password("admin123"),
+            "password_hash": await hash_password_async("admin123"),
             "name": "Administrator",
             "role": "admin",
             "grade": None,
@@ -845,226 +2554,30 @@ async def seed_database():
         }
         await db.users.insert_one(admin_doc)
     
-    return {"message": "Seed-Daten erfolgreich eingefügt", "task_count": len(seed_tasks)}
+    message = "Seed-Daten erfolgreich eingefügt" if result["inserted"] or result["updated"] else "Datenbank bereits mit Seed-Daten gefüllt"
+    return {"message": message, "task_count": result["inserted"] + result["updated"] + result["unchanged"], **result}
 
 @api_router.post("/seed/additional")
 async def seed_additional_tasks():
     """Add more tasks to reach 20-25 per grade"""
-    additional_tasks = get_additional_tasks()
-    
-    for task in additional_tasks:
-        task["id"] = str(uuid.uuid4())
-        task["created_at"] = datetime.now(timezone.utc).isoformat()
-        task["created_by"] = "system"
-    
-    await db.tasks.insert_many(additional_tasks)
-    
-    # Count tasks per grade
-    counts = {}
-    for grade in range(5, 11):
-        counts[f"grade_{grade}"] = await db.tasks.count_documents({"grade": grade})
-    
-    return {"message": "Zusätzliche Aufgaben eingefügt", "added": len(additional_tasks), "counts": counts}
-
-def get_additional_tasks():
-    """Additional tasks to bring each grade to 20-25 tasks"""
-    tasks = []
-    
-    # Additional Klasse 5 tasks
-    tasks.extend([
-        {"grade": 5, "topic": "Grundrechenarten", "question": "Was ergibt 234 + 567?", "task_type": "free_text", "options": None, "correct_answer": "801", "explanation": "234 + 567 = 801", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Grundrechenarten", "question": "Was ergibt 1000 - 456?", "task_type": "free_text", "options": None, "correct_answer": "544", "explanation": "1000 - 456 = 544", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Grundrechenarten", "question": "Was ergibt 15 × 6?", "task_type": "multiple_choice", "options": ["80", "90", "85", "95"], "correct_answer": "90", "explanation": "15 × 6 = 90", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Grundrechenarten", "question": "Was ergibt 72 ÷ 8?", "task_type": "free_text", "options": None, "correct_answer": "9", "explanation": "72 ÷ 8 = 9", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Brüche einführen", "question": "Was ist 1/2 von 50?", "task_type": "free_text", "options": None, "correct_answer": "25", "explanation": "1/2 von 50 = 50 ÷ 2 = 25", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Brüche einführen", "question": "Erweitere 2/3 mit 4.", "task_type": "free_text", "options": None, "correct_answer": "8/12", "explanation": "2/3 × 4/4 = 8/12", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 5, "topic": "Dezimalzahlen", "question": "Was ergibt 3,5 - 1,2?", "task_type": "free_text", "options": None, "correct_answer": "2,3", "explanation": "3,5 - 1,2 = 2,3", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Geometrie Grundlagen", "question": "Berechne die Fläche eines Quadrats mit a = 5 cm.", "task_type": "free_text", "options": None, "correct_answer": "25", "explanation": "A = a² = 5² = 25 cm²", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Größen und Einheiten", "question": "Wie viele Minuten sind 2,5 Stunden?", "task_type": "free_text", "options": None, "correct_answer": "150", "explanation": "2,5 × 60 = 150 Minuten", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Diagramme", "question": "In einem Balkendiagramm zeigt ein Balken 30. Der andere ist doppelt so lang. Welchen Wert zeigt er?", "task_type": "free_text", "options": None, "correct_answer": "60", "explanation": "30 × 2 = 60", "xp_reward": 10, "difficulty": "leicht"},
-    ])
-    
-    # Additional Klasse 6 tasks
-    tasks.extend([
-        {"grade": 6, "topic": "Bruchrechnung", "question": "Was ergibt 1/2 + 1/4?", "task_type": "multiple_choice", "options": ["2/6", "3/4", "1/3", "2/4"], "correct_answer": "3/4", "explanation": "1/2 = 2/4, also 2/4 + 1/4 = 3/4", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 6, "topic": "Bruchrechnung", "question": "Berechne 2/5 × 3/4.", "task_type": "free_text", "options": None, "correct_answer": "6/20", "explanation": "2/5 × 3/4 = 6/20 = 3/10", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 6, "topic": "Dezimalzahlen erweitert", "question": "Was ergibt 4,2 ÷ 0,7?", "task_type": "free_text", "options": None, "correct_answer": "6", "explanation": "4,2 ÷ 0,7 = 42 ÷ 7 = 6", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 6, "topic": "Prozentrechnung Einführung", "question": "Was sind 50% von 120?", "task_type": "free_text", "options": None, "correct_answer": "60", "explanation": "50% = 1/2, also 120 ÷ 2 = 60", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 6, "topic": "Prozentrechnung Einführung", "question": "Was sind 10% von 250?", "task_type": "free_text", "options": None, "correct_answer": "25", "explanation": "10% = 1/10, also 250 ÷ 10 = 25", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 6, "topic": "Winkel", "question": "Wie groß ist ein gestreckter Winkel?", "task_type": "multiple_choice", "options": ["90°", "180°", "270°", "360°"], "correct_answer": "180°", "explanation": "Ein gestreckter Winkel hat 180°", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 6, "topic": "Flächen", "question": "Berechne den Umfang eines Rechtecks mit a = 6 cm und b = 4 cm.", "task_type": "free_text", "options": None, "correct_answer": "20", "explanation": "U = 2(a + b) = 2(6 + 4) = 20 cm", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 6, "topic": "Teilbarkeit", "question": "Ist 245 durch 5 teilbar?", "task_type": "multiple_choice", "options": ["Ja", "Nein"], "correct_answer": "Ja", "explanation": "245 endet auf 5, also ist es durch 5 teilbar", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 6, "topic": "Teilbarkeit", "question": "Was ist das kgV von 4 und 6?", "task_type": "free_text", "options": None, "correct_answer": "12", "explanation": "kgV(4,6) = 12", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 6, "topic": "Bruchrechnung", "question": "Wandle 7/4 in eine gemischte Zahl um.", "task_type": "free_text", "options": None, "correct_answer": "1 3/4", "explanation": "7/4 = 1 + 3/4 = 1 3/4", "xp_reward": 15, "difficulty": "mittel"},
-    ])
-    
-    # Additional Klasse 7 tasks
-    tasks.extend([
-        {"grade": 7, "topic": "Rationale Zahlen", "question": "Was ergibt (-8) - (-3)?", "task_type": "free_text", "options": None, "correct_answer": "-5", "explanation": "(-8) - (-3) = -8 + 3 = -5", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 7, "topic": "Rationale Zahlen", "question": "Was ergibt (-12) ÷ 4?", "task_type": "free_text", "options": None, "correct_answer": "-3", "explanation": "(-12) ÷ 4 = -3", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 7, "topic": "Terme und Gleichungen", "question": "Löse: 2x + 3 = 11", "task_type": "free_text", "options": None, "correct_answer": "4", "explanation": "2x + 3 = 11 → 2x = 8 → x = 4", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 7, "topic": "Terme und Gleichungen", "question": "Vereinfache: 4a + 2b - a + 3b", "task_type": "free_text", "options": None, "correct_answer": "3a + 5b", "explanation": "4a - a = 3a, 2b + 3b = 5b", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 7, "topic": "Proportionalität", "question": "5 Arbeiter brauchen 8 Tage. Wie lange brauchen 4 Arbeiter?", "task_type": "free_text", "options": None, "correct_answer": "10", "explanation": "Antiproportional: 5 × 8 = 4 × x → x = 10", "xp_reward": 20, "difficulty": "schwer"},
-        {"grade": 7, "topic": "Dreiecke", "question": "Welches Dreieck hat drei gleich lange Seiten?", "task_type": "multiple_choice", "options": ["Gleichschenkliges", "Gleichseitiges", "Rechtwinkliges"], "correct_answer": "Gleichseitiges", "explanation": "Ein gleichseitiges Dreieck hat drei gleich lange Seiten", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 7, "topic": "Prozentrechnung", "question": "Ein Preis steigt von 50€ auf 60€. Um wie viel Prozent?", "task_type": "free_text", "options": None, "correct_answer": "20", "explanation": "Erhöhung: 10€. 10/50 = 0,2 = 20%", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 7, "topic": "Statistik", "question": "Berechne den Median von: 3, 7, 2, 9, 5", "task_type": "free_text", "options": None, "correct_answer": "5", "explanation": "Sortiert: 2, 3, 5, 7, 9. Median ist der mittlere Wert: 5", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 7, "topic": "Statistik", "question": "Was ist die Spannweite von: 12, 5, 8, 15, 3?", "task_type": "free_text", "options": None, "correct_answer": "12", "explanation": "Spannweite = Maximum - Minimum = 15 - 3 = 12", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 7, "topic": "Rationale Zahlen", "question": "Berechne: |−7| + |3|", "task_type": "free_text", "options": None, "correct_answer": "10", "explanation": "|−7| = 7 und |3| = 3, also 7 + 3 = 10", "xp_reward": 10, "difficulty": "leicht"},
-    ])
-    
-    # Additional Klasse 8 tasks
-    tasks.extend([
-        {"grade": 8, "topic": "Lineare Funktionen", "question": "Wo schneidet y = 3x - 6 die x-Achse?", "task_type": "free_text", "options": None, "correct_answer": "2", "explanation": "0 = 3x - 6 → x = 2", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 8, "topic": "Lineare Funktionen", "question": "Sind y = 2x + 1 und y = 2x - 3 parallel?", "task_type": "multiple_choice", "options": ["Ja", "Nein"], "correct_answer": "Ja", "explanation": "Beide haben Steigung m = 2, also sind sie parallel", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 8, "topic": "Lineare Gleichungssysteme", "question": "Löse: x + y = 10 und x - y = 4. Was ist x?", "task_type": "free_text", "options": None, "correct_answer": "7", "explanation": "Addiere: 2x = 14 → x = 7", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 8, "topic": "Lineare Gleichungssysteme", "question": "Löse: 2x + y = 8 und x + y = 5. Was ist y?", "task_type": "free_text", "options": None, "correct_answer": "2", "explanation": "Subtrahiere: x = 3. Einsetzen: y = 2", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 8, "topic": "Vierecke", "question": "Was ist die Diagonale eines Quadrats mit a = 4 cm? (Antwort als √)", "task_type": "free_text", "options": None, "correct_answer": "4√2", "explanation": "d = a√2 = 4√2", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 8, "topic": "Kreis", "question": "Was ist der Durchmesser eines Kreises mit r = 5 cm?", "task_type": "free_text", "options": None, "correct_answer": "10", "explanation": "d = 2r = 2 × 5 = 10 cm", "xp_reward": 5, "difficulty": "leicht"},
-        {"grade": 8, "topic": "Wahrscheinlichkeit", "question": "Wie groß ist P(gerade Zahl) beim Würfeln?", "task_type": "free_text", "options": None, "correct_answer": "1/2", "explanation": "3 gerade Zahlen (2,4,6) von 6. P = 3/6 = 1/2", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 8, "topic": "Wahrscheinlichkeit", "question": "Eine Münze wird 3-mal geworfen. P(3× Kopf)?", "task_type": "free_text", "options": None, "correct_answer": "1/8", "explanation": "P = (1/2)³ = 1/8", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 8, "topic": "Potenzen", "question": "Was ergibt 5⁰?", "task_type": "free_text", "options": None, "correct_answer": "1", "explanation": "Jede Zahl hoch 0 ist 1", "xp_reward": 5, "difficulty": "leicht"},
-        {"grade": 8, "topic": "Potenzen", "question": "Was ergibt 2⁴ ÷ 2²?", "task_type": "free_text", "options": None, "correct_answer": "4", "explanation": "2⁴ ÷ 2² = 2² = 4", "xp_reward": 10, "difficulty": "leicht"},
-    ])
-    
-    # Additional Klasse 9 tasks
-    tasks.extend([
-        {"grade": 9, "topic": "Quadratische Funktionen", "question": "Was ist der Scheitelpunkt von y = x² - 4x + 4?", "task_type": "free_text", "options": None, "correct_answer": "(2,0)", "explanation": "y = (x-2)², Scheitelpunkt bei (2, 0)", "xp_reward": 20, "difficulty": "mittel"},
-        {"grade": 9, "topic": "Quadratische Funktionen", "question": "Ist die Parabel y = -x² + 3 nach oben oder unten geöffnet?", "task_type": "multiple_choice", "options": ["Nach oben", "Nach unten"], "correct_answer": "Nach unten", "explanation": "a = -1 < 0, also nach unten geöffnet", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 9, "topic": "Quadratische Gleichungen", "question": "Löse: x² - 9 = 0", "task_type": "free_text", "options": None, "correct_answer": "±3", "explanation": "x² = 9 → x = ±3", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 9, "topic": "Quadratische Gleichungen", "question": "Löse: x² + 2x - 8 = 0", "task_type": "multiple_choice", "options": ["x = 2 oder x = -4", "x = -2 oder x = 4", "x = 1 oder x = -8"], "correct_answer": "x = 2 oder x = -4", "explanation": "(x-2)(x+4) = 0", "xp_reward": 20, "difficulty": "mittel"},
-        {"grade": 9, "topic": "Satz des Pythagoras", "question": "Ist ein Dreieck mit a=6, b=8, c=10 rechtwinklig?", "task_type": "multiple_choice", "options": ["Ja", "Nein"], "correct_answer": "Ja", "explanation": "6² + 8² = 36 + 64 = 100 = 10²", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 9, "topic": "Satz des Pythagoras", "question": "Berechne die Diagonale d in einem Rechteck mit a=3 und b=4.", "task_type": "free_text", "options": None, "correct_answer": "5", "explanation": "d² = 3² + 4² = 25, d = 5", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 9, "topic": "Wurzeln", "question": "Was ist √64?", "task_type": "free_text", "options": None, "correct_answer": "8", "explanation": "8 × 8 = 64", "xp_reward": 5, "difficulty": "leicht"},
-        {"grade": 9, "topic": "Wurzeln", "question": "Vereinfache √72.", "task_type": "free_text", "options": None, "correct_answer": "6√2", "explanation": "√72 = √(36×2) = 6√2", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 9, "topic": "Ähnlichkeit", "question": "Zwei ähnliche Dreiecke haben Verhältnis 1:3. Wenn die kleine Fläche 4 cm² ist, wie groß ist die große?", "task_type": "free_text", "options": None, "correct_answer": "36", "explanation": "Flächenverhältnis = 1²:3² = 1:9. 4 × 9 = 36 cm²", "xp_reward": 20, "difficulty": "schwer"},
-        {"grade": 9, "topic": "Trigonometrie", "question": "Was ist sin(90°)?", "task_type": "free_text", "options": None, "correct_answer": "1", "explanation": "sin(90°) = 1", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 9, "topic": "Trigonometrie", "question": "Was ist cos(0°)?", "task_type": "free_text", "options": None, "correct_answer": "1", "explanation": "cos(0°) = 1", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 9, "topic": "Trigonometrie", "question": "tan(45°) = ?", "task_type": "free_text", "options": None, "correct_answer": "1", "explanation": "tan(45°) = sin(45°)/cos(45°) = 1", "xp_reward": 15, "difficulty": "mittel"},
-    ])
-    
-    # Additional Klasse 10 tasks
-    tasks.extend([
-        {"grade": 10, "topic": "Exponentialfunktionen", "question": "Was ist 3⁻²?", "task_type": "free_text", "options": None, "correct_answer": "1/9", "explanation": "3⁻² = 1/3² = 1/9", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 10, "topic": "Exponentialfunktionen", "question": "Löse: 3^x = 81", "task_type": "free_text", "options": None, "correct_answer": "4", "explanation": "3⁴ = 81, also x = 4", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 10, "topic": "Logarithmen", "question": "Was ist log₁₀(1000)?", "task_type": "free_text", "options": None, "correct_answer": "3", "explanation": "10³ = 1000", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 10, "topic": "Logarithmen", "question": "Was ist ln(e)?", "task_type": "free_text", "options": None, "correct_answer": "1", "explanation": "ln(e) = 1", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 10, "topic": "Körperberechnungen", "question": "Volumen eines Zylinders mit r=3 cm und h=5 cm? (π ≈ 3,14)", "task_type": "free_text", "options": None, "correct_answer": "141,3", "explanation": "V = πr²h = 3,14 × 9 × 5 = 141,3 cm³", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 10, "topic": "Körperberechnungen", "question": "Oberfläche eines Würfels mit a = 4 cm?", "task_type": "free_text", "options": None, "correct_answer": "96", "explanation": "O = 6a² = 6 × 16 = 96 cm²", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 10, "topic": "Stochastik", "question": "Was ist der Erwartungswert bei n=10 und p=0,3?", "task_type": "free_text", "options": None, "correct_answer": "3", "explanation": "E(X) = n × p = 10 × 0,3 = 3", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 10, "topic": "Stochastik", "question": "Was ist die Standardabweichung wenn Varianz = 16?", "task_type": "free_text", "options": None, "correct_answer": "4", "explanation": "σ = √16 = 4", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 10, "topic": "Wachstum", "question": "K₀ = 500€ wächst mit 4% pro Jahr. K nach 1 Jahr?", "task_type": "free_text", "options": None, "correct_answer": "520", "explanation": "K = 500 × 1,04 = 520€", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 10, "topic": "Wachstum", "question": "Halbwertszeit: Nach wie vielen HWZ ist 1/8 übrig?", "task_type": "free_text", "options": None, "correct_answer": "3", "explanation": "1/2³ = 1/8, also 3 Halbwertszeiten", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 10, "topic": "Vektorrechnung", "question": "Berechne: 3 × (2, 4)", "task_type": "free_text", "options": None, "correct_answer": "(6,12)", "explanation": "3 × (2,4) = (6, 12)", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 10, "topic": "Vektorrechnung", "question": "Was ist der Betrag von (6, 8)?", "task_type": "free_text", "options": None, "correct_answer": "10", "explanation": "|v| = √(36+64) = √100 = 10", "xp_reward": 15, "difficulty": "mittel"},
-    ])
-    
-    return tasks
-
-def get_seed_tasks():
-    tasks = []
-    
-    # Klasse 5
-    tasks.extend([
-        {"grade": 5, "topic": "Grundrechenarten", "question": "Was ergibt 125 + 378?", "task_type": "free_text", "options": None, "correct_answer": "503", "explanation": "125 + 378 = 503. Addiere zuerst die Einer, dann die Zehner, dann die Hunderter.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Grundrechenarten", "question": "Was ergibt 456 - 189?", "task_type": "free_text", "options": None, "correct_answer": "267", "explanation": "456 - 189 = 267. Bei der Subtraktion muss manchmal übertragen werden.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Grundrechenarten", "question": "Was ergibt 12 × 8?", "task_type": "multiple_choice", "options": ["86", "96", "106", "92"], "correct_answer": "96", "explanation": "12 × 8 = 96. Das ist ein Ergebnis aus dem kleinen Einmaleins.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Grundrechenarten", "question": "Was ergibt 144 ÷ 12?", "task_type": "free_text", "options": None, "correct_answer": "12", "explanation": "144 ÷ 12 = 12. Division ist die Umkehrung der Multiplikation.", "xp_reward": 10, "difficulty": "mittel"},
-        {"grade": 5, "topic": "Grundrechenarten", "question": "Berechne: (15 + 25) × 3", "task_type": "free_text", "options": None, "correct_answer": "120", "explanation": "Klammer zuerst: 15 + 25 = 40, dann 40 × 3 = 120.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 5, "topic": "Brüche einführen", "question": "Welcher Bruch ist größer: 1/2 oder 1/4?", "task_type": "multiple_choice", "options": ["1/2", "1/4", "Beide gleich"], "correct_answer": "1/2", "explanation": "1/2 ist größer als 1/4. Je kleiner der Nenner, desto größer der Anteil.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Brüche einführen", "question": "Was ist 1/4 von 20?", "task_type": "free_text", "options": None, "correct_answer": "5", "explanation": "1/4 von 20 = 20 ÷ 4 = 5.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Brüche einführen", "question": "Kürze den Bruch 6/12 so weit wie möglich.", "task_type": "free_text", "options": None, "correct_answer": "1/2", "explanation": "6/12 = 1/2. Teile Zähler und Nenner durch 6.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 5, "topic": "Dezimalzahlen", "question": "Schreibe 0,75 als Bruch.", "task_type": "multiple_choice", "options": ["3/4", "7/5", "1/2", "2/3"], "correct_answer": "3/4", "explanation": "0,75 = 75/100 = 3/4.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 5, "topic": "Dezimalzahlen", "question": "Was ergibt 2,5 + 1,75?", "task_type": "free_text", "options": None, "correct_answer": "4,25", "explanation": "2,5 + 1,75 = 4,25. Achte auf die Kommastellen.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Geometrie Grundlagen", "question": "Wie viele Ecken hat ein Rechteck?", "task_type": "free_text", "options": None, "correct_answer": "4", "explanation": "Ein Rechteck hat 4 Ecken, 4 Seiten und 4 rechte Winkel.", "xp_reward": 5, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Geometrie Grundlagen", "question": "Berechne den Umfang eines Quadrats mit Seitenlänge 7 cm.", "task_type": "free_text", "options": None, "correct_answer": "28", "explanation": "Umfang = 4 × Seitenlänge = 4 × 7 = 28 cm.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Größen und Einheiten", "question": "Wie viele Zentimeter sind 2,5 Meter?", "task_type": "free_text", "options": None, "correct_answer": "250", "explanation": "1 m = 100 cm, also 2,5 m = 250 cm.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Größen und Einheiten", "question": "Wie viele Gramm sind 3 kg?", "task_type": "free_text", "options": None, "correct_answer": "3000", "explanation": "1 kg = 1000 g, also 3 kg = 3000 g.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Diagramme", "question": "In einem Säulendiagramm zeigt eine Säule den Wert 45. Die nächste Säule ist halb so hoch. Welchen Wert zeigt sie?", "task_type": "free_text", "options": None, "correct_answer": "22,5", "explanation": "Die Hälfte von 45 ist 22,5.", "xp_reward": 10, "difficulty": "mittel"},
-    ])
-    
-    # Klasse 6
-    tasks.extend([
-        {"grade": 6, "topic": "Bruchrechnung", "question": "Was ergibt 2/3 + 1/6?", "task_type": "multiple_choice", "options": ["5/6", "3/9", "1/2", "4/6"], "correct_answer": "5/6", "explanation": "2/3 = 4/6, also 4/6 + 1/6 = 5/6.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 6, "topic": "Bruchrechnung", "question": "Berechne 3/4 × 2/5.", "task_type": "free_text", "options": None, "correct_answer": "6/20", "explanation": "3/4 × 2/5 = 6/20 = 3/10.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 6, "topic": "Bruchrechnung", "question": "Was ergibt 5/6 - 1/3?", "task_type": "free_text", "options": None, "correct_answer": "1/2", "explanation": "1/3 = 2/6, also 5/6 - 2/6 = 3/6 = 1/2.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 6, "topic": "Bruchrechnung", "question": "Berechne 3/4 ÷ 1/2.", "task_type": "free_text", "options": None, "correct_answer": "3/2", "explanation": "Division durch einen Bruch = Multiplikation mit dem Kehrwert: 3/4 × 2/1 = 6/4 = 3/2.", "xp_reward": 20, "difficulty": "schwer"},
-        {"grade": 6, "topic": "Dezimalzahlen erweitert", "question": "Was ergibt 3,6 × 0,5?", "task_type": "free_text", "options": None, "correct_answer": "1,8", "explanation": "3,6 × 0,5 = 1,8. Multiplizieren mit 0,5 ist wie durch 2 teilen.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 6, "topic": "Dezimalzahlen erweitert", "question": "Runde 3,456 auf zwei Dezimalstellen.", "task_type": "free_text", "options": None, "correct_answer": "3,46", "explanation": "Die dritte Dezimalstelle ist 6, also wird aufgerundet: 3,46.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 6, "topic": "Prozentrechnung Einführung", "question": "Was sind 25% von 80?", "task_type": "free_text", "options": None, "correct_answer": "20", "explanation": "25% = 1/4, also 80 ÷ 4 = 20.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 6, "topic": "Prozentrechnung Einführung", "question": "Schreibe 0,35 als Prozentzahl.", "task_type": "free_text", "options": None, "correct_answer": "35", "explanation": "0,35 × 100 = 35%.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 6, "topic": "Winkel", "question": "Wie groß ist ein rechter Winkel?", "task_type": "multiple_choice", "options": ["45°", "90°", "180°", "360°"], "correct_answer": "90°", "explanation": "Ein rechter Winkel hat genau 90°.", "xp_reward": 5, "difficulty": "leicht"},
-        {"grade": 6, "topic": "Winkel", "question": "Zwei Winkel ergänzen sich zu 180°. Einer ist 65°. Wie groß ist der andere?", "task_type": "free_text", "options": None, "correct_answer": "115", "explanation": "180° - 65° = 115°. Diese Winkel heißen Supplementwinkel.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 6, "topic": "Flächen", "question": "Berechne die Fläche eines Rechtecks mit a = 8 cm und b = 5 cm.", "task_type": "free_text", "options": None, "correct_answer": "40", "explanation": "Fläche = a × b = 8 × 5 = 40 cm².", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 6, "topic": "Flächen", "question": "Berechne die Fläche eines Dreiecks mit g = 10 cm und h = 6 cm.", "task_type": "free_text", "options": None, "correct_answer": "30", "explanation": "Fläche = (g × h) ÷ 2 = (10 × 6) ÷ 2 = 30 cm².", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 6, "topic": "Teilbarkeit", "question": "Ist 126 durch 3 teilbar?", "task_type": "multiple_choice", "options": ["Ja", "Nein"], "correct_answer": "Ja", "explanation": "Quersumme: 1+2+6=9, und 9 ist durch 3 teilbar, also ist 126 durch 3 teilbar.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 6, "topic": "Teilbarkeit", "question": "Was ist der ggT von 24 und 36?", "task_type": "free_text", "options": None, "correct_answer": "12", "explanation": "24 = 2³ × 3, 36 = 2² × 3². Der ggT ist 2² × 3 = 12.", "xp_reward": 20, "difficulty": "schwer"},
-    ])
-    
-    # Klasse 7
-    tasks.extend([
-        {"grade": 7, "topic": "Rationale Zahlen", "question": "Was ergibt (-5) + 8?", "task_type": "free_text", "options": None, "correct_answer": "3", "explanation": "(-5) + 8 = 3. Von -5 aus 8 Schritte nach rechts.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 7, "topic": "Rationale Zahlen", "question": "Was ergibt (-3) × (-4)?", "task_type": "free_text", "options": None, "correct_answer": "12", "explanation": "Minus mal Minus ergibt Plus: (-3) × (-4) = 12.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 7, "topic": "Rationale Zahlen", "question": "Ordne: -2,5; 0; -3; 1,5 von klein nach groß.", "task_type": "multiple_choice", "options": ["-3; -2,5; 0; 1,5", "-2,5; -3; 0; 1,5", "0; -2,5; -3; 1,5"], "correct_answer": "-3; -2,5; 0; 1,5", "explanation": "Negative Zahlen sind kleiner als 0. -3 < -2,5 < 0 < 1,5.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 7, "topic": "Terme und Gleichungen", "question": "Löse: x + 7 = 15", "task_type": "free_text", "options": None, "correct_answer": "8", "explanation": "x + 7 = 15 → x = 15 - 7 = 8.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 7, "topic": "Terme und Gleichungen", "question": "Löse: 3x - 5 = 16", "task_type": "free_text", "options": None, "correct_answer": "7", "explanation": "3x - 5 = 16 → 3x = 21 → x = 7.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 7, "topic": "Terme und Gleichungen", "question": "Vereinfache: 5x + 3 - 2x + 7", "task_type": "free_text", "options": None, "correct_answer": "3x + 10", "explanation": "5x - 2x = 3x und 3 + 7 = 10, also 3x + 10.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 7, "topic": "Proportionalität", "question": "3 Äpfel kosten 1,50€. Wie viel kosten 7 Äpfel?", "task_type": "free_text", "options": None, "correct_answer": "3,50", "explanation": "Ein Apfel kostet 0,50€. 7 × 0,50€ = 3,50€.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 7, "topic": "Proportionalität", "question": "y ist proportional zu x. Wenn x = 4, ist y = 12. Was ist y, wenn x = 7?", "task_type": "free_text", "options": None, "correct_answer": "21", "explanation": "y = k × x. k = 12/4 = 3. Bei x = 7: y = 3 × 7 = 21.", "xp_reward": 20, "difficulty": "schwer"},
-        {"grade": 7, "topic": "Dreiecke", "question": "Die Winkelsumme in einem Dreieck beträgt immer...", "task_type": "multiple_choice", "options": ["90°", "180°", "270°", "360°"], "correct_answer": "180°", "explanation": "Die Summe aller Winkel in einem Dreieck ist immer 180°.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 7, "topic": "Dreiecke", "question": "Zwei Winkel eines Dreiecks sind 45° und 75°. Wie groß ist der dritte?", "task_type": "free_text", "options": None, "correct_answer": "60", "explanation": "180° - 45° - 75° = 60°.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 7, "topic": "Prozentrechnung", "question": "Ein Artikel kostet 80€ und wird um 20% reduziert. Was ist der neue Preis?", "task_type": "free_text", "options": None, "correct_answer": "64", "explanation": "20% von 80€ = 16€. Neuer Preis: 80€ - 16€ = 64€.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 7, "topic": "Prozentrechnung", "question": "Von 50 Schülern sind 30 Mädchen. Wie viel Prozent?", "task_type": "free_text", "options": None, "correct_answer": "60", "explanation": "30/50 = 0,6 = 60%.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 7, "topic": "Statistik", "question": "Der Mittelwert von 4, 7, 10, 3 ist...", "task_type": "free_text", "options": None, "correct_answer": "6", "explanation": "(4+7+10+3)/4 = 24/4 = 6.", "xp_reward": 15, "difficulty": "mittel"},
-    ])
-    
-    # Klasse 8
-    tasks.extend([
-        {"grade": 8, "topic": "Lineare Funktionen", "question": "Welche Steigung hat die Gerade y = 3x - 2?", "task_type": "free_text", "options": None, "correct_answer": "3", "explanation": "In y = mx + b ist m die Steigung. Hier ist m = 3.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 8, "topic": "Lineare Funktionen", "question": "Wo schneidet y = 2x + 4 die y-Achse?", "task_type": "free_text", "options": None, "correct_answer": "4", "explanation": "Der y-Achsenabschnitt ist b = 4. Die Gerade schneidet bei (0, 4).", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 8, "topic": "Lineare Funktionen", "question": "Bestimme die Gleichung einer Geraden durch (0,1) mit Steigung 2.", "task_type": "multiple_choice", "options": ["y = 2x + 1", "y = x + 2", "y = 2x - 1"], "correct_answer": "y = 2x + 1", "explanation": "y = mx + b mit m = 2 und b = 1 ergibt y = 2x + 1.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 8, "topic": "Lineare Gleichungssysteme", "question": "Löse: x + y = 5 und x - y = 1. Was ist x?", "task_type": "free_text", "options": None, "correct_answer": "3", "explanation": "Addiere beide: 2x = 6 → x = 3.", "xp_reward": 20, "difficulty": "mittel"},
-        {"grade": 8, "topic": "Lineare Gleichungssysteme", "question": "Löse: x + y = 5 und x - y = 1. Was ist y?", "task_type": "free_text", "options": None, "correct_answer": "2", "explanation": "Mit x = 3: 3 + y = 5 → y = 2.", "xp_reward": 20, "difficulty": "mittel"},
-        {"grade": 8, "topic": "Vierecke", "question": "Was ist die Flächenformel eines Parallelogramms?", "task_type": "multiple_choice", "options": ["A = a × b", "A = a × h", "A = (a × b)/2"], "correct_answer": "A = a × h", "explanation": "Fläche Parallelogramm = Grundseite × Höhe.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 8, "topic": "Vierecke", "question": "Ein Parallelogramm hat a = 8 cm und h = 5 cm. Berechne die Fläche.", "task_type": "free_text", "options": None, "correct_answer": "40", "explanation": "A = a × h = 8 × 5 = 40 cm².", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 8, "topic": "Kreis", "question": "Was ist der Umfang eines Kreises mit r = 7 cm? (π ≈ 3,14)", "task_type": "free_text", "options": None, "correct_answer": "43,96", "explanation": "U = 2πr = 2 × 3,14 × 7 = 43,96 cm.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 8, "topic": "Kreis", "question": "Berechne die Fläche eines Kreises mit r = 5 cm. (π ≈ 3,14)", "task_type": "free_text", "options": None, "correct_answer": "78,5", "explanation": "A = πr² = 3,14 × 25 = 78,5 cm².", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 8, "topic": "Wahrscheinlichkeit", "question": "Ein Würfel wird geworfen. Wie groß ist die Wahrscheinlichkeit für eine 6?", "task_type": "free_text", "options": None, "correct_answer": "1/6", "explanation": "Es gibt 6 mögliche Ergebnisse, davon ist eines die 6. P = 1/6.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 8, "topic": "Wahrscheinlichkeit", "question": "Zwei Münzen werden geworfen. Wie groß ist P(2× Kopf)?", "task_type": "free_text", "options": None, "correct_answer": "1/4", "explanation": "Mögliche Ergebnisse: KK, KZ, ZK, ZZ. Nur KK passt. P = 1/4.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 8, "topic": "Potenzen", "question": "Was ergibt 2³ × 2²?", "task_type": "free_text", "options": None, "correct_answer": "32", "explanation": "2³ × 2² = 2^(3+2) = 2⁵ = 32.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 8, "topic": "Potenzen", "question": "Vereinfache: (x³)²", "task_type": "free_text", "options": None, "correct_answer": "x^6", "explanation": "(x³)² = x^(3×2) = x⁶.", "xp_reward": 15, "difficulty": "mittel"},
-    ])
-    
-    # Klasse 9
-    tasks.extend([
-        {"grade": 9, "topic": "Quadratische Funktionen", "question": "Wo hat y = x² - 4 ihre Nullstellen?", "task_type": "multiple_choice", "options": ["x = ±2", "x = ±4", "x = 2", "x = 0"], "correct_answer": "x = ±2", "explanation": "x² - 4 = 0 → x² = 4 → x = ±2.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 9, "topic": "Quadratische Funktionen", "question": "Wo ist der Scheitelpunkt von y = (x-3)² + 2?", "task_type": "free_text", "options": None, "correct_answer": "(3,2)", "explanation": "Scheitelpunktform: y = (x-d)² + e hat Scheitelpunkt (d, e) = (3, 2).", "xp_reward": 20, "difficulty": "mittel"},
-        {"grade": 9, "topic": "Quadratische Gleichungen", "question": "Löse: x² = 49", "task_type": "free_text", "options": None, "correct_answer": "±7", "explanation": "x² = 49 → x = ±7.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 9, "topic": "Quadratische Gleichungen", "question": "Löse mit pq-Formel: x² - 5x + 6 = 0", "task_type": "multiple_choice", "options": ["x = 2 oder x = 3", "x = -2 oder x = -3", "x = 1 oder x = 6"], "correct_answer": "x = 2 oder x = 3", "explanation": "p = -5, q = 6. x = 2,5 ± √(6,25-6) = 2,5 ± 0,5. Also x = 2 oder x = 3.", "xp_reward": 25, "difficulty": "schwer"},
-        {"grade": 9, "topic": "Satz des Pythagoras", "question": "In einem rechtwinkligen Dreieck sind a = 3 und b = 4. Wie lang ist c?", "task_type": "free_text", "options": None, "correct_answer": "5", "explanation": "c² = a² + b² = 9 + 16 = 25 → c = 5.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 9, "topic": "Satz des Pythagoras", "question": "In einem rechtwinkligen Dreieck sind a = 5 und c = 13. Wie lang ist b?", "task_type": "free_text", "options": None, "correct_answer": "12", "explanation": "b² = c² - a² = 169 - 25 = 144 → b = 12.", "xp_reward": 20, "difficulty": "mittel"},
-        {"grade": 9, "topic": "Wurzeln", "question": "Was ist √144?", "task_type": "free_text", "options": None, "correct_answer": "12", "explanation": "12 × 12 = 144, also √144 = 12.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 9, "topic": "Wurzeln", "question": "Vereinfache: √50", "task_type": "free_text", "options": None, "correct_answer": "5√2", "explanation": "√50 = √(25×2) = 5√2.", "xp_reward": 20, "difficulty": "mittel"},
-        {"grade": 9, "topic": "Ähnlichkeit", "question": "Zwei ähnliche Dreiecke haben Seitenverhältnis 2:3. Die kleinere Seite ist 8 cm. Wie lang ist die größere?", "task_type": "free_text", "options": None, "correct_answer": "12", "explanation": "8 × (3/2) = 12 cm.", "xp_reward": 20, "difficulty": "mittel"},
-        {"grade": 9, "topic": "Trigonometrie", "question": "In einem rechtwinkligen Dreieck ist α = 30° und die Hypotenuse c = 10. Wie lang ist die Gegenkathete?", "task_type": "free_text", "options": None, "correct_answer": "5", "explanation": "sin(30°) = Gegenkathete/Hypotenuse = a/10. sin(30°) = 0,5, also a = 5.", "xp_reward": 25, "difficulty": "schwer"},
-    ])
-    
-    # Klasse 10
-    tasks.extend([
-        {"grade": 10, "topic": "Exponentialfunktionen", "question": "Was ist 2⁰?", "task_type": "free_text", "options": None, "correct_answer": "1", "explanation": "Jede Zahl (außer 0) hoch 0 ist 1.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 10, "topic": "Exponentialfunktionen", "question": "Löse: 2^x = 16", "task_type": "free_text", "options": None, "correct_answer": "4", "explanation": "2⁴ = 16, also x = 4.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 10, "topic": "Logarithmen", "question": "Was ist log₂(8)?", "task_type": "free_text", "options": None, "correct_answer": "3", "explanation": "2³ = 8, also log₂(8) = 3.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 10, "topic": "Logarithmen", "question": "Was ist lg(100)?", "task_type": "free_text", "options": None, "correct_answer": "2", "explanation": "10² = 100, also lg(100) = 2.", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 10, "topic": "Körperberechnungen", "question": "Berechne das Volumen eines Würfels mit a = 5 cm.", "task_type": "free_text", "options": None, "correct_answer": "125", "explanation": "V = a³ = 5³ = 125 cm³.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 10, "topic": "Körperberechnungen", "question": "Berechne das Volumen einer Kugel mit r = 3 cm. (π ≈ 3,14)", "task_type": "free_text", "options": None, "correct_answer": "113,04", "explanation": "V = (4/3)πr³ = (4/3) × 3,14 × 27 ≈ 113,04 cm³.", "xp_reward": 25, "difficulty": "schwer"},
-        {"grade": 10, "topic": "Stochastik", "question": "Bei einem Binomialexperiment ist n = 4 und p = 0,5. Wie groß ist P(X = 2)?", "task_type": "multiple_choice", "options": ["0,25", "0,375", "0,5"], "correct_answer": "0,375", "explanation": "P(X=2) = C(4,2) × 0,5² × 0,5² = 6 × 0,0625 = 0,375.", "xp_reward": 30, "difficulty": "schwer"},
-        {"grade": 10, "topic": "Stochastik", "question": "Der Erwartungswert eines fairen Würfels ist...", "task_type": "free_text", "options": None, "correct_answer": "3,5", "explanation": "E(X) = (1+2+3+4+5+6)/6 = 21/6 = 3,5.", "xp_reward": 20, "difficulty": "mittel"},
-        {"grade": 10, "topic": "Wachstum", "question": "Ein Kapital von 1000€ wächst mit 5% jährlich. Wie viel ist es nach 2 Jahren?", "task_type": "free_text", "options": None, "correct_answer": "1102,5", "explanation": "K = 1000 × 1,05² = 1000 × 1,1025 = 1102,5€.", "xp_reward": 20, "difficulty": "mittel"},
-        {"grade": 10, "topic": "Wachstum", "question": "Eine Bakterienkultur verdoppelt sich alle 3 Stunden. Nach wie vielen Stunden ist sie 8-mal so groß?", "task_type": "free_text", "options": None, "correct_answer": "9", "explanation": "8 = 2³, also 3 Verdopplungen = 3 × 3 = 9 Stunden.", "xp_reward": 25, "difficulty": "schwer"},
-        {"grade": 10, "topic": "Vektorrechnung", "question": "Addiere die Vektoren: (2,3) + (4,1)", "task_type": "free_text", "options": None, "correct_answer": "(6,4)", "explanation": "(2+4, 3+1) = (6, 4).", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 10, "topic": "Vektorrechnung", "question": "Berechne den Betrag von (3,4).", "task_type": "free_text", "options": None, "correct_answer": "5", "explanation": "|v| = √(3² + 4²) = √25 = 5.", "xp_reward": 20, "difficulty": "mittel"},
-    ])
-    
-    return tasks
+    result = await apply_content_pack("additional")
+    return {"message": "Zusätzliche Aufgaben eingefügt", "added": result["inserted"], **result, "counts": await task_counts_by_grade()}
+
+@api_router.get("/admin/content-packs")
+async def get_content_packs(admin: dict = Depends(get_admin_user)):
+    """Admin: shipped pack versions next to the versions applied to this database"""
+    applied = {doc["name"]: doc for doc in await db.content_packs.find({}, {"_id": 0}).to_list(None)}
+    packs = []
+    for name in CONTENT_PACKS:
+        pack = await run_in_threadpool(load_content_pack, name)
+        packs.append({
+            "name": name,
+            "version": pack["version"],
+            "tasks": len(pack["tasks"]),
+            "applied_version": applied.get(name, {}).get("version"),
+            "applied_at": applied.get(name, {}).get("applied_at")
+        })
+    return {"packs": packs}
 
 # ================== FEATURE FLAGS ==================
 
@@ -1110,6 +2623,7 @@ async def update_user_features(user_id: str, features: FeatureFlagsModel, admin:
 class ExplainMistakeRequest(BaseModel):
     task_id: str
     student_answer: str
+    task_version: Optional[int] = Field(None, ge=1)
 
 class ExplainMistakeResponse(BaseModel):
     explanation: str
@@ -1119,9 +2633,7 @@ class ExplainMistakeResponse(BaseModel):
 @api_router.post("/ai/explain-mistake", response_model=ExplainMistakeResponse)
 async def explain_mistake(request: ExplainMistakeRequest, current_user: dict = Depends(get_current_user)):
     """AI explains why the answer is wrong - DSGVO compliant (no personal data sent)"""
-    task = await db.tasks.find_one({"id": request.task_id}, {"_id": 0})
-    if not task:
-        raise HTTPException(status_code=404, detail="Aufgabe nicht gefunden")
+    task = await get_graded_task(request.task_id, request.task_version)
     
     grade = current_user.get("grade", 7)
     
@@ -1147,10 +2659,9 @@ Antworte im JSON-Format:
             model="gpt-4o-mini",
             session_id=f"explain_{current_user['id']}_{request.task_id}"
         )
-        response = await chat.send_message_async(UserMessage(text=prompt))
+        response = await llm_breaker.call(chat.send_message_async(UserMessage(text=prompt)), LLM_TIMEOUT_SECONDS)
         
         # Parse JSON response
-        import json
         result = json.loads(response.text.strip().replace("```json", "").replace("```", ""))
         return ExplainMistakeResponse(**result)
     except Exception as e:
@@ -1179,11 +2690,16 @@ async def get_adaptive_recommendations(current_user: dict = Depends(get_current_
     answers = await db.answers.find({"user_id": user_id}).sort("created_at", -1).limit(50).to_list(50)
     
     # Calculate performance per topic
+    answered_tasks = await db.tasks.find(
+        {"id": {"$in": list({a["task_id"] for a in answers})}},
+        {"_id": 0, "id": 1, "topic": 1}
+    ).to_list(None)
+    topic_by_task = {t["id"]: t["topic"] for t in answered_tasks}
+    
     topic_performance = {}
     for answer in answers:
-        task = await db.tasks.find_one({"id": answer["task_id"]}, {"_id": 0})
-        if task:
-            topic = task["topic"]
+        topic = topic_by_task.get(answer["task_id"])
+        if topic:
             if topic not in topic_performance:
                 topic_performance[topic] = {"correct": 0, "total": 0}
             topic_performance[topic]["total"] += 1
@@ -1193,36 +2709,42 @@ async def get_adaptive_recommendations(current_user: dict = Depends(get_current_
     recommendations = []
     
     # Rule-based logic (no AI needed for simple cases)
+    targets = {}
     for topic, perf in topic_performance.items():
         if perf["total"] > 0:
             success_rate = perf["correct"] / perf["total"]
             
             if success_rate < 0.5:
                 # Struggling - recommend easier tasks
-                difficulty = "leicht"
-                reason = f"Du brauchst mehr Übung bei '{topic}'"
+                targets[topic] = ("leicht", f"Du brauchst mehr Übung bei '{topic}'")
             elif success_rate < 0.8:
                 # Medium - recommend similar tasks
-                difficulty = "mittel"
-                reason = f"Weiter üben bei '{topic}'"
+                targets[topic] = ("mittel", f"Weiter üben bei '{topic}'")
             else:
                 # Mastered - recommend harder tasks
-                difficulty = "schwer"
-                reason = f"Super! Probier schwierigere Aufgaben bei '{topic}'"
-            
-            tasks = await db.tasks.find(
-                {"grade": grade, "topic": topic, "difficulty": difficulty},
-                {"_id": 0}
-            ).limit(3).to_list(3)
-            
-            for task in tasks:
-                if task["id"] not in [a["task_id"] for a in answers[-10:]]:
-                    recommendations.append(AdaptiveRecommendation(
-                        task_id=task["id"],
-                        topic=topic,
-                        difficulty=difficulty,
-                        reason=reason
-                    ))
+                targets[topic] = ("schwer", f"Super! Probier schwierigere Aufgaben bei '{topic}'")
+    
+    # Up to 3 candidate tasks per topic, fetched in one aggregation
+    tasks_by_topic = {}
+    if targets:
+        pipeline = [
+            {"$match": {"grade": grade, "$or": [
+                {"topic": topic, "difficulty": difficulty} for topic, (difficulty, _) in targets.items()
+            ]}},
+            {"$group": {"_id": "$topic", "task_ids": {"$push": "$id"}}},
+            {"$project": {"task_ids": {"$slice": ["$task_ids", 3]}}}
+        ]
+        tasks_by_topic = {t["_id"]: t["task_ids"] for t in await db.tasks.aggregate(pipeline).to_list(None)}
+    
+    for topic, (difficulty, reason) in targets.items():
+        for task_id in tasks_by_topic.get(topic, []):
+            if task_id not in [a["task_id"] for a in answers[-10:]]:
+                recommendations.append(AdaptiveRecommendation(
+                    task_id=task_id,
+                    topic=topic,
+                    difficulty=difficulty,
+                    reason=reason
+                ))
     
     # If no recommendations, get random tasks for weak topics
     if not recommendations:
@@ -1242,21 +2764,33 @@ async def get_adaptive_recommendations(current_user: dict = Depends(get_current_
 class PracticeModeAnswer(BaseModel):
     task_id: str
     answer: str
+    seed: Optional[int] = Field(None, ge=0, lt=TEMPLATE_SEED_LIMIT)
+    task_version: Optional[int] = Field(None, ge=1)
 
 @api_router.post("/practice/submit")
-async def submit_practice_answer(data: PracticeModeAnswer, current_user: dict = Depends(get_current_user)):
+async def submit_practice_answer(
+    data: PracticeModeAnswer,
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Submit answer in practice mode - no XP, no pressure"""
-    task = await db.tasks.find_one({"id": data.task_id}, {"_id": 0})
-    if not task:
-        raise HTTPException(status_code=404, detail="Aufgabe nicht gefunden")
-    
-    is_correct = data.answer.strip().lower() == task["correct_answer"].strip().lower()
+    return await run_idempotent(
+        idempotency_key, current_user["id"], "practice/submit", data.model_dump(),
+        lambda: record_practice_answer(data, current_user)
+    )
+
+async def record_practice_answer(data: PracticeModeAnswer, current_user: dict) -> dict:
+    task = await get_graded_task(data.task_id, data.task_version)
+    task = task_for_seed(task, data.seed)
+    is_correct = await grade_answer_async(task, data.answer)
     
     # Record for statistics but no XP
     await db.practice_answers.insert_one({
         "id": str(uuid.uuid4()),
         "user_id": current_user["id"],
         "task_id": data.task_id,
+        "task_version": task.get("version", 1),
+        "seed": data.seed,
         "submitted_answer": data.answer,
         "is_correct": is_correct,
         "created_at": datetime.now(timezone.utc).isoformat()
@@ -1362,23 +2896,8 @@ async def check_and_award_badges(current_user: dict = Depends(get_current_user))
     topic_counts = await db.answers.aggregate(pipeline).to_list(100)
     topic_dict = {t["_id"]: t["count"] for t in topic_counts}
     
-    # Total correct answers
-    total_correct = sum(topic_dict.values())
-    
-    # Check badges
-    badge_checks = [
-        ("bruche_starter", any("Bruch" in t for t in topic_dict) and sum(topic_dict.get(t, 0) for t in topic_dict if "Bruch" in t) >= 5),
-        ("bruche_profi", any("Bruch" in t for t in topic_dict) and sum(topic_dict.get(t, 0) for t in topic_dict if "Bruch" in t) >= 20),
-        ("geometrie_starter", any("Geometrie" in t or "Fläche" in t for t in topic_dict) and sum(topic_dict.get(t, 0) for t in topic_dict if "Geometrie" in t or "Fläche" in t) >= 5),
-        ("geometrie_profi", any("Geometrie" in t or "Fläche" in t for t in topic_dict) and sum(topic_dict.get(t, 0) for t in topic_dict if "Geometrie" in t or "Fläche" in t) >= 20),
-        ("prozent_meister", sum(topic_dict.get(t, 0) for t in topic_dict if "Prozent" in t) >= 15),
-        ("gleichungs_held", sum(topic_dict.get(t, 0) for t in topic_dict if "Gleichung" in t) >= 10),
-        ("fleissige_biene", total_correct >= 50),
-        ("mathe_marathon", total_correct >= 100),
-    ]
-    
-    for badge_id, earned in badge_checks:
-        if earned and badge_id not in current_badges:
+    for badge_id in earned_educational_badges(topic_dict):
+        if badge_id not in current_badges:
             new_badges.append(badge_id)
             current_badges.append(badge_id)
     
@@ -1394,121 +2913,177 @@ async def check_and_award_badges(current_user: dict = Depends(get_current_user))
         "badge_details": {b: EDUCATIONAL_BADGES[b] for b in current_badges if b in EDUCATIONAL_BADGES}
     }
 
+def earned_educational_badges(topic_dict: Dict[str, int]) -> List[str]:
+    """Educational badges earned with these correct-answer counts per topic"""
+    # Total correct answers
+    total_correct = sum(topic_dict.values())
+    
+    # Check badges
+    badge_checks = [
+        ("bruche_starter", any("Bruch" in t for t in topic_dict) and sum(topic_dict.get(t, 0) for t in topic_dict if "Bruch" in t) >= 5),
+        ("bruche_profi", any("Bruch" in t for t in topic_dict) and sum(topic_dict.get(t, 0) for t in topic_dict if "Bruch" in t) >= 20),
+        ("geometrie_starter", any("Geometrie" in t or "Fläche" in t for t in topic_dict) and sum(topic_dict.get(t, 0) for t in topic_dict if "Geometrie" in t or "Fläche" in t) >= 5),
+        ("geometrie_profi", any("Geometrie" in t or "Fläche" in t for t in topic_dict) and sum(topic_dict.get(t, 0) for t in topic_dict if "Geometrie" in t or "Fläche" in t) >= 20),
+        ("prozent_meister", sum(topic_dict.get(t, 0) for t in topic_dict if "Prozent" in t) >= 15),
+        ("gleichungs_held", sum(topic_dict.get(t, 0) for t in topic_dict if "Gleichung" in t) >= 10),
+        ("fleissige_biene", total_correct >= 50),
+        ("mathe_marathon", total_correct >= 100),
+    ]
+    return [badge_id for badge_id, earned in badge_checks if earned]
+
 # ================== WEEKLY CHALLENGE ==================
 
+# One shared template per (grade, week_id); per-user progress lives in a small
+# weekly_progress document that is only created on the first correct answer.
+WEEKLY_CHALLENGE_SIZE = 5
+WEEKLY_BONUS_XP = 100
+WEEKLY_TEMPLATE_NAMESPACE = uuid.UUID("0b7d4c7e-3f55-4a9f-8d0a-6a2e51c9f3b2")
+_weekly_templates: Dict[Any, Dict[str, Any]] = {}
+
+def current_week_id() -> str:
+    today = datetime.now(timezone.utc)
+    week_start = today - timedelta(days=today.weekday())
+    return week_start.strftime("%Y-W%W")
+
+async def get_weekly_template(grade: int, week_id: str) -> dict:
+    """Get the shared weekly challenge for a grade, creating it once per week"""
+    key = (grade, week_id)
+    if key in _weekly_templates:
+        return _weekly_templates[key]
+    
+    template = await db.weekly_templates.find_one({"grade": grade, "week_id": week_id}, {"_id": 0})
+    if not template:
+        task_ids = await get_catalog_task_ids(grade, "mittel")
+        if len(task_ids) < WEEKLY_CHALLENGE_SIZE:
+            task_ids = task_ids + [t for t in await get_catalog_task_ids(grade) if t not in task_ids][:10]
+        
+        seed = int.from_bytes(hashlib.sha256(f"{grade}:{week_id}".encode()).digest()[:8], "big")
+        template = {
+            "id": str(uuid.uuid5(WEEKLY_TEMPLATE_NAMESPACE, f"{grade}:{week_id}")),
+            "grade": grade,
+            "week_id": week_id,
+            "task_ids": random.Random(seed).sample(task_ids, min(WEEKLY_CHALLENGE_SIZE, len(task_ids))),
+            "bonus_xp": WEEKLY_BONUS_XP,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+        # Another worker may have created it first - keep whichever was stored
+        await db.weekly_templates.update_one(
+            {"grade": grade, "week_id": week_id},
+            {"$setOnInsert": template},
+            upsert=True
+        )
+        template = await db.weekly_templates.find_one({"grade": grade, "week_id": week_id}, {"_id": 0})
+    
+    # Templates of past weeks are never requested again
+    for cached_key in [k for k in _weekly_templates if k[1] != week_id]:
+        del _weekly_templates[cached_key]
+    _weekly_templates[key] = template
+    return template
+
 @api_router.get("/challenges/weekly")
 async def get_weekly_challenge(current_user: dict = Depends(get_current_user)):
-    """Get weekly challenge - 5 medium difficulty tasks"""
+    """Get weekly challenge - 5 medium difficulty tasks, shared by the whole grade"""
     grade = current_user.get("grade", 7)
     user_id = current_user["id"]
+    week_id = current_week_id()
     
-    # Get current week
-    today = datetime.now(timezone.utc)
-    week_start = today - timedelta(days=today.weekday())
-    week_id = week_start.strftime("%Y-W%W")
-    
-    # Check if challenge exists
-    existing = await db.weekly_challenges.find_one({
-        "user_id": user_id,
-        "week_id": week_id
-    }, {"_id": 0})
-    
-    if existing:
-        # Get task details
-        tasks = []
-        for task_id in existing["task_ids"]:
-            task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
-            if task:
-                tasks.append(task)
-        existing["tasks"] = tasks
-        return existing
-    
-    # Create new weekly challenge
-    medium_tasks = await db.tasks.find(
-        {"grade": grade, "difficulty": "mittel"},
-        {"_id": 0}
-    ).to_list(100)
-    
-    if len(medium_tasks) < 5:
-        medium_tasks.extend(await db.tasks.find({"grade": grade}, {"_id": 0}).limit(10).to_list(10))
+    template = await get_weekly_template(grade, week_id)
+    progress = await db.weekly_progress.find_one(
+        {"user_id": user_id, "week_id": week_id},
+        {"_id": 0, "completed_task_ids": 1, "completed": 1}
+    ) or {}
     
-    selected_tasks = random.sample(medium_tasks, min(5, len(medium_tasks)))
+    tasks, missing_task_ids = await get_tasks_by_ids(template["task_ids"])
     
-    challenge = {
-        "id": str(uuid.uuid4()),
+    return {
+        "id": template["id"],
         "user_id": user_id,
+        "grade": grade,
         "week_id": week_id,
-        "task_ids": [t["id"] for t in selected_tasks],
-        "completed_task_ids": [],
-        "completed": False,
-        "bonus_xp": 100,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "task_ids": template["task_ids"],
+        "completed_task_ids": [t for t in progress.get("completed_task_ids", []) if t in template["task_ids"]],
+        "completed": progress.get("completed", False),
+        "bonus_xp": template["bonus_xp"],
+        "created_at": template["created_at"],
+        "tasks": tasks,
+        "missing_task_ids": missing_task_ids
     }
-    
-    await db.weekly_challenges.insert_one(challenge)
-    challenge["tasks"] = selected_tasks
-    if "_id" in challenge:
-        del challenge["_id"]
-    
-    return challenge
 
 @api_router.post("/challenges/weekly/submit")
-async def submit_weekly_challenge_answer(data: AnswerSubmit, current_user: dict = Depends(get_current_user)):
+async def submit_weekly_challenge_answer(
+    data: AnswerSubmit,
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Submit answer for weekly challenge"""
+    return await run_idempotent(
+        idempotency_key, current_user["id"], "challenges/weekly/submit", data.model_dump(),
+        lambda: record_weekly_challenge_answer(data, current_user)
+    )
+
+async def record_weekly_challenge_answer(data: AnswerSubmit, current_user: dict) -> dict:
     user_id = current_user["id"]
-    today = datetime.now(timezone.utc)
-    week_start = today - timedelta(days=today.weekday())
-    week_id = week_start.strftime("%Y-W%W")
+    week_id = current_week_id()
     
-    challenge = await db.weekly_challenges.find_one({
-        "user_id": user_id,
-        "week_id": week_id
-    })
+    template = await get_weekly_template(current_user.get("grade", 7), week_id)
+    if data.task_id not in template["task_ids"]:
+        raise HTTPException(status_code=400, detail="Aufgabe gehört nicht zur Weekly Challenge")
     
-    if not challenge:
-        raise HTTPException(status_code=404, detail="Keine Weekly Challenge gefunden")
+    progress = await db.weekly_progress.find_one({"user_id": user_id, "week_id": week_id}, {"_id": 0}) or {
+        "completed_task_ids": [],
+        "completed": False
+    }
     
-    if challenge["completed"]:
+    if progress["completed"]:
         raise HTTPException(status_code=400, detail="Weekly Challenge bereits abgeschlossen")
     
-    task = await db.tasks.find_one({"id": data.task_id}, {"_id": 0})
-    if not task:
-        raise HTTPException(status_code=404, detail="Aufgabe nicht gefunden")
+    task = await get_graded_task(data.task_id, data.task_version)
+    task = task_for_seed(task, data.seed)
+    is_correct = await grade_answer_async(task, data.answer)
+    completed_task_ids = [t for t in progress["completed_task_ids"] if t in template["task_ids"]]
     
-    is_correct = data.answer.strip().lower() == task["correct_answer"].strip().lower()
+    # Tasks deleted after the template was created are not required
+    live_task_ids = await get_live_task_ids()
+    required_task_ids = [t for t in template["task_ids"] if t in live_task_ids]
     
-    if is_correct and data.task_id not in challenge["completed_task_ids"]:
-        challenge["completed_task_ids"].append(data.task_id)
+    if is_correct and data.task_id not in completed_task_ids:
+        # The $ne filter makes a repeated answer miss the document; the upsert
+        # then collides with the unique (user_id, week_id) index and is a no-op
+        try:
+            progress = await db.weekly_progress.find_one_and_update(
+                {"user_id": user_id, "week_id": week_id, "completed_task_ids": {"$ne": data.task_id}},
+                {
+                    "$addToSet": {"completed_task_ids": data.task_id},
+                    "$set": {"template_id": template["id"]},
+                    "$setOnInsert": {"completed": False}
+                },
+                projection={"_id": 0},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            completed_task_ids = [t for t in progress["completed_task_ids"] if t in template["task_ids"]]
+        except DuplicateKeyError:
+            completed_task_ids.append(data.task_id)
         
         # Check if all tasks completed
-        all_completed = len(challenge["completed_task_ids"]) == len(challenge["task_ids"])
-        
-        update = {"completed_task_ids": challenge["completed_task_ids"]}
-        if all_completed:
-            update["completed"] = True
-            # Award bonus XP
-            await db.users.update_one(
-                {"id": user_id},
-                {"$inc": {"xp": challenge["bonus_xp"]}}
+        if all(t in completed_task_ids for t in required_task_ids):
+            # Exactly one request flips the flag and awards bonus XP and badge
+            flipped = await db.weekly_progress.update_one(
+                {"user_id": user_id, "week_id": week_id, "completed": False},
+                {"$set": {"completed": True}}
             )
-            # Award badge
-            if "wochen_champion" not in current_user.get("badges", []):
+            if flipped.modified_count:
                 await db.users.update_one(
                     {"id": user_id},
-                    {"$push": {"badges": "wochen_champion"}}
+                    {"$inc": {"xp": template["bonus_xp"]}, "$addToSet": {"badges": "wochen_champion"}}
                 )
-        
-        await db.weekly_challenges.update_one(
-            {"id": challenge["id"]},
-            {"$set": update}
-        )
     
     return {
         "is_correct": is_correct,
         "correct_answer": task["correct_answer"],
         "explanation": task["explanation"],
-        "progress": f"{len(challenge['completed_task_ids'])}/{len(challenge['task_ids'])}",
-        "challenge_completed": len(challenge["completed_task_ids"]) == len(challenge["task_ids"]) if is_correct else False
+        "progress": f"{len(completed_task_ids)}/{len(required_task_ids)}",
+        "challenge_completed": all(t in completed_task_ids for t in required_task_ids) if is_correct else False
     }
 
 # ================== PARENT REPORT ==================
@@ -1535,11 +3110,16 @@ async def get_parent_report(student_id: str, current_user: dict = Depends(get_cu
     correct_answers = sum(1 for a in recent_answers if a.get("is_correct", False))
     
     # Topic breakdown
+    answered_tasks = await db.tasks.find(
+        {"id": {"$in": list({a["task_id"] for a in recent_answers})}},
+        {"_id": 0, "id": 1, "topic": 1}
+    ).to_list(None)
+    topic_by_task = {t["id"]: t["topic"] for t in answered_tasks}
+    
     topic_stats = {}
     for answer in recent_answers:
-        task = await db.tasks.find_one({"id": answer["task_id"]}, {"_id": 0})
-        if task:
-            topic = task["topic"]
+        topic = topic_by_task.get(answer["task_id"])
+        if topic:
             if topic not in topic_stats:
                 topic_stats[topic] = {"total": 0, "correct": 0}
             topic_stats[topic]["total"] += 1
@@ -1621,176 +3201,842 @@ async def get_my_assignments(current_user: dict = Depends(get_current_user)):
 @api_router.post("/seed/nrw-hauptschule")
 async def seed_nrw_hauptschule_tasks():
     """Add curriculum-aligned tasks for NRW Hauptschule grades 5-10"""
-    tasks = get_nrw_hauptschule_tasks()
-    
-    for task in tasks:
-        task["id"] = str(uuid.uuid4())
-        task["created_at"] = datetime.now(timezone.utc).isoformat()
-        task["created_by"] = "system"
-        task["curriculum"] = "NRW-Hauptschule"
-    
+    result = await apply_content_pack("nrw-hauptschule")
+    return {"message": "NRW Hauptschule Aufgaben hinzugefügt", "added": result["inserted"], **result, "counts": await task_counts_by_grade()}
+
+# ================== DATABASE INDEXES ==================
+
+# Declarative index registry, applied at startup
+INDEXES = {
+    "users": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("role", ASCENDING)]),
+    ],
+    "tasks": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("grade", ASCENDING), ("topic", ASCENDING), ("difficulty", ASCENDING)]),
+        IndexModel([("grade", ASCENDING), ("difficulty", ASCENDING)]),
+        IndexModel([("content_hash", ASCENDING)]),
+        IndexModel([("minhash_bands", ASCENDING)]),
+        IndexModel([("content_id", ASCENDING)], unique=True, sparse=True),
+        IndexModel([("grade", ASCENDING), ("topic", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("question_lower", ASCENDING)]),
+        IndexModel(
+            [("question", TEXT), ("topic", TEXT), ("explanation", TEXT)],
+            name="tasks_text_de", default_language="german",
+            weights={"question": 10, "topic": 5, "explanation": 1}
+        ),
+    ],
+    "task_versions": [
+        IndexModel([("id", ASCENDING), ("version", ASCENDING)], unique=True),
+    ],
+    "results": [
+        IndexModel([("user_id", ASCENDING), ("topic", ASCENDING), ("is_correct", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("is_correct", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("grade", ASCENDING), ("topic", ASCENDING)]),
+    ],
+    "answers": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "practice_answers": [
+        IndexModel([("user_id", ASCENDING)]),
+    ],
+    "daily_challenges": [
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], unique=True),
+        IndexModel([("id", ASCENDING)]),
+    ],
+    "weekly_templates": [
+        IndexModel([("grade", ASCENDING), ("week_id", ASCENDING)], unique=True),
+    ],
+    "weekly_progress": [
+        IndexModel([("user_id", ASCENDING), ("week_id", ASCENDING)], unique=True),
+    ],
+    "idempotency_keys": [
+        IndexModel([("user_id", ASCENDING), ("key", ASCENDING)], unique=True),
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS),
+    ],
+    "password_resets": [
+        IndexModel([("token", ASCENDING)], unique=True),
+        IndexModel([("expire_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "content_packs": [
+        IndexModel([("name", ASCENDING)], unique=True),
+    ],
+    "class_assignments": [
+        IndexModel([("student_ids", ASCENDING)]),
+        IndexModel([("created_by", ASCENDING)]),
+    ],
+}
+
+# Collections whose unique index was added after documents could already be
+# duplicated, with the key fields to merge duplicates on before it is built
+DEDUPE_BEFORE_INDEXING = {
+    "daily_challenges": ("user_id", "date"),
+    "weekly_progress": ("user_id", "week_id"),
+}
+
+async def dedupe_progress_documents():
+    """Merge progress documents that share a unique key into the one that got
+    furthest, so the unique index on the key can be built"""
+    for collection, fields in DEDUPE_BEFORE_INDEXING.items():
+        groups = await db[collection].aggregate([
+            {"$group": {"_id": {field: f"${field}" for field in fields}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}}
+        ]).to_list(None)
+        for group in groups:
+            docs = await db[collection].find(group["_id"]).to_list(None)
+            docs.sort(key=lambda d: (not d.get("completed", False), -len(d.get("completed_task_ids", [])), d.get("created_at", "")))
+            keep, duplicates = docs[0], docs[1:]
+            completed_task_ids = list(dict.fromkeys(t for d in docs for t in d.get("completed_task_ids", [])))
+            await db[collection].update_one(
+                {"_id": keep["_id"]},
+                {"$set": {"completed_task_ids": completed_task_ids, "completed": any(d.get("completed", False) for d in docs)}}
+            )
+            await db[collection].delete_many({"_id": {"$in": [d["_id"] for d in duplicates]}})
+        if groups:
+            logger.info(f"Merged duplicate documents for {len(groups)} keys in {collection}")
+
+async def apply_indexes():
+    """Create all registered indexes; a failing collection is logged, not fatal"""
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            logger.error(f"Index creation failed for {collection}: {e}")
+
+async def backfill_fingerprints():
+    """Tasks written before a derived field existed, or with a canonical answer
+    from an older parser, get their fingerprints recomputed"""
+    tasks = await db.tasks.find(
+        {"$or": [
+            {"content_hash": {"$exists": False}},
+            {"minhash_bands": {"$exists": False}},
+            {"question_lower": {"$exists": False}},
+            {"answer_canonical.v": {"$ne": ANSWER_CANONICAL_VERSION}}
+        ]},
+        {"_id": 0, "id": 1, "grade": 1, "topic": 1, "question": 1, "correct_answer": 1}
+    ).to_list(None)
     if tasks:
-        await db.tasks.insert_many(tasks)
+        await run_in_threadpool(add_fingerprints, tasks)
+        await db.tasks.bulk_write([
+            UpdateOne({"id": task["id"]}, {"$set": {field: task[field] for field in ("question_lower", "content_hash", "minhash_bands", "answer_canonical")}})
+            for task in tasks
+        ], ordered=False)
+        logger.info(f"Backfilled fingerprints for {len(tasks)} tasks")
+
+async def backfill_task_versions():
+    """Tasks written before versioning become version 1 of their history"""
+    tasks = await db.tasks.find({"version": {"$exists": False}}, {"_id": 0}).to_list(None)
+    if tasks:
+        await db.task_versions.bulk_write([
+            UpdateOne({"id": task["id"], "version": 1}, {"$setOnInsert": {**task, "version": 1}}, upsert=True)
+            for task in tasks
+        ], ordered=False)
+        await db.tasks.update_many({"id": {"$in": [task["id"] for task in tasks]}}, {"$set": {"version": 1}})
+        logger.info(f"Backfilled versions for {len(tasks)} tasks")
+
+def content_pack_query_shapes(name: str) -> List[dict]:
+    """Reads of apply_content_pack: the applied version, the pack's tasks, the
+    near-duplicate check and the re-read after a conflicting upgrade"""
+    return [
+        {"collection": "content_packs", "filter": {"name": name}},
+        {"collection": "tasks", "filter": {"$or": [
+            {"content_id": {"$in": [f"{name}-0001"]}},
+            {"content_id": {"$exists": False}, "created_by": "system", "content_hash": {"$in": ["x"]}}
+        ]}},
+        {"collection": "tasks", "filter": {"minhash_bands": {"$in": ["0:x", "1:y"]}}},
+        {"collection": "tasks", "filter": {"id": {"$in": ["x", "y"]}}},
+    ]
+
+# Query shapes per route, checked by the index advisor. Every API route must be
+# listed; routes without database access map to an empty list. Shapes that
+# scan a whole collection on purpose set "allow_collscan".
+QUERY_SHAPES = {
+    "POST /api/auth/register": [{"collection": "users", "filter": {"email": "x@example.de"}}],
+    "POST /api/auth/login": [{"collection": "users", "filter": {"email": "x@example.de"}}],
+    "GET /api/auth/me": [{"collection": "users", "filter": {"id": "x"}}],
+    "PUT /api/auth/grade": [{"collection": "users", "filter": {"id": "x"}}],
+    "POST /api/auth/password-reset-request": [{"collection": "users", "filter": {"email": "x@example.de"}}],
+    "POST /api/auth/password-reset-confirm": [{"collection": "password_resets", "filter": {"token": "x", "used": False}}],
+    "PUT /api/auth/change-password": [{"collection": "users", "filter": {"id": "x"}}],
+    "GET /api/tasks/grades": [],
+    "GET /api/tasks/topics/{grade}": [],
+    "GET /api/tasks/{grade}/{topic}": [{"collection": "tasks", "filter": {"grade": 5, "topic": "x"}}],
+    "GET /api/tasks/single/{task_id}/instances": [{"collection": "tasks", "filter": {"id": "x"}}],
+    "GET /api/tasks/single/{task_id}": [{"collection": "tasks", "filter": {"id": "x"}}],
+    "POST /api/tasks/submit": [
+        {"collection": "idempotency_keys", "filter": {"user_id": "x", "key": "x"}},
+        {"collection": "tasks", "filter": {"id": "x"}},
+        {"collection": "task_versions", "filter": {"id": "x", "version": 1}},
+        {"collection": "results", "filter": {"user_id": "x", "is_correct": True}},
+    ],
+    "GET /api/progress/overview": [
+        {"collection": "tasks", "filter": {"grade": 5, "topic": {"$in": ["x", "y"]}}},
+        {"collection": "results", "filter": {"user_id": "x", "grade": 5, "topic": {"$in": ["x", "y"]}}},
+    ],
+    "GET /api/progress/stats": [
+        {"collection": "results", "filter": {"user_id": "x"}},
+        {"collection": "results", "filter": {"user_id": "x", "is_correct": True}},
+    ],
+    "GET /api/challenges/daily": [
+        {"collection": "daily_challenges", "filter": {"user_id": "x", "date": "2025-01-01"}},
+        {"collection": "tasks", "filter": {"grade": 5}, "sort": {"id": 1}},
+        {"collection": "tasks", "filter": {"id": {"$in": ["x", "y"]}}},
+    ],
+    "POST /api/challenges/submit/{challenge_id}": [
+        {"collection": "daily_challenges", "filter": {"user_id": "x", "date": "2025-01-01"}},
+        {"collection": "daily_challenges", "filter": {"id": "x", "user_id": "x", "task_ids": "x"}},
+        {"collection": "tasks", "filter": {"id": "x"}},
+        {"collection": "task_versions", "filter": {"id": "x", "version": 1}},
+    ],
+    "GET /api/recommendations": [
+        {"collection": "results", "filter": {"user_id": "x"}},
+        {"collection": "tasks", "filter": {"grade": 5, "topic": "x"}},
+    ],
+    "GET /api/recommendations/ai": [{"collection": "results", "filter": {"user_id": "x"}}],
+    "GET /api/admin/stats": [
+        {"collection": "users", "filter": {"role": "student"}},
+        {"collection": "results", "filter": {}, "allow_collscan": True},
+    ],
+    "GET /api/admin/students": [
+        {"collection": "users", "filter": {"role": "student"}},
+        {"collection": "results", "filter": {"user_id": {"$in": ["x", "y"]}}},
+    ],
+    "GET /api/admin/students/{student_id}": [
+        {"collection": "users", "filter": {"id": "x", "role": "student"}},
+        {"collection": "results", "filter": {"user_id": "x"}},
+    ],
+    "POST /api/admin/tasks": [{"collection": "tasks", "filter": {"minhash_bands": {"$in": ["0:x", "1:y"]}}}],
+    "PUT /api/admin/tasks/{task_id}": [
+        {"collection": "tasks", "filter": {"id": "x"}},
+        {"collection": "tasks", "filter": {"minhash_bands": {"$in": ["0:x", "1:y"]}}},
+        {"collection": "tasks", "filter": {"id": "x", "version": 1}},
+    ],
+    "DELETE /api/admin/tasks/{task_id}": [
+        {"collection": "tasks", "filter": {"id": "x"}},
+        {"collection": "task_versions", "filter": {"id": "x", "version": 1}},
+    ],
+    "GET /api/admin/tasks/{task_id}/versions": [{"collection": "task_versions", "filter": {"id": "x"}, "sort": {"version": -1}}],
+    "GET /api/admin/tasks": [{"collection": "tasks", "filter": {"grade": 5, "topic": "x"}}],
+    "POST /api/admin/tasks/import-csv": [
+        {"collection": "tasks", "filter": {"content_hash": {"$in": ["x"]}}},
+        {"collection": "tasks", "filter": {"minhash_bands": {"$in": ["0:x", "1:y"]}}},
+    ],
+    # Groups the band index of the whole catalog; the second query is by id
+    "GET /api/admin/tasks/duplicates": [
+        {"collection": "tasks", "filter": {}, "allow_collscan": True},
+        {"collection": "tasks", "filter": {"id": {"$in": ["x", "y"]}}},
+    ],
+    "GET /api/admin/tasks/page": [
+        {"collection": "tasks", "filter": {"grade": 7, "topic": "x"}, "sort": {"grade": 1, "topic": 1, "id": 1}},
+        {"collection": "tasks", "filter": {"question_lower": {"$regex": "^was"}}, "sort": {"grade": 1, "topic": 1, "id": 1}},
+        # The unfiltered first page groups the whole catalog for its facets
+        {"collection": "tasks", "filter": {}, "sort": {"grade": 1, "topic": 1, "id": 1}, "allow_collscan": True},
+    ],
+    "GET /api/admin/tasks/search": [{"collection": "tasks", "filter": {"$text": {"$search": "Zylinder Volumen"}}}],
+    "GET /api/admin/tasks/export": [
+        {"collection": "tasks", "filter": {"grade": 7, "topic": "x", "difficulty": "mittel"}, "sort": {"id": 1}},
+        # Unfiltered export reads the whole catalog on purpose
+        {"collection": "tasks", "filter": {}, "sort": {"id": 1}, "allow_collscan": True},
+    ],
+    "POST /api/seed": [
+        *content_pack_query_shapes("core"),
+        {"collection": "users", "filter": {"email": "admin@mathevilla.de"}},
+    ],
+    # Task counts per grade group the whole catalog
+    "POST /api/seed/additional": [
+        *content_pack_query_shapes("additional"),
+        {"collection": "tasks", "filter": {}, "allow_collscan": True},
+    ],
+    "POST /api/seed/nrw-hauptschule": [
+        *content_pack_query_shapes("nrw-hauptschule"),
+        {"collection": "tasks", "filter": {}, "allow_collscan": True},
+    ],
+    # A handful of documents, one per pack
+    "GET /api/admin/content-packs": [{"collection": "content_packs", "filter": {}, "allow_collscan": True}],
+    "GET /api/features": [],
+    "PUT /api/admin/features/{user_id}": [{"collection": "users", "filter": {"id": "x"}}],
+    "POST /api/ai/explain-mistake": [{"collection": "tasks", "filter": {"id": "x"}}, {"collection": "task_versions", "filter": {"id": "x", "version": 1}}],
+    "GET /api/recommendations/adaptive": [
+        {"collection": "answers", "filter": {"user_id": "x"}, "sort": {"created_at": -1}},
+        {"collection": "tasks", "filter": {"id": {"$in": ["x", "y"]}}},
+        {"collection": "tasks", "filter": {"grade": 5, "$or": [{"topic": "x", "difficulty": "leicht"}, {"topic": "y", "difficulty": "mittel"}]}},
+        {"collection": "tasks", "filter": {"grade": 5, "difficulty": "leicht"}},
+    ],
+    "POST /api/practice/submit": [{"collection": "tasks", "filter": {"id": "x"}}, {"collection": "task_versions", "filter": {"id": "x", "version": 1}}],
+    "GET /api/readiness/{topic}": [
+        {"collection": "tasks", "filter": {"grade": 5, "topic": "x"}},
+        {"collection": "answers", "filter": {"user_id": "x", "task_id": {"$in": ["x", "y"]}}},
+    ],
+    "GET /api/badges/available": [],
+    "GET /api/badges/check": [{"collection": "answers", "filter": {"user_id": "x", "is_correct": True}}],
+    "GET /api/challenges/weekly": [
+        {"collection": "weekly_templates", "filter": {"grade": 5, "week_id": "2025-W01"}},
+        {"collection": "weekly_progress", "filter": {"user_id": "x", "week_id": "2025-W01"}},
+        {"collection": "tasks", "filter": {"grade": 5, "difficulty": "mittel"}, "sort": {"id": 1}},
+    ],
+    "POST /api/challenges/weekly/submit": [
+        {"collection": "weekly_progress", "filter": {"user_id": "x", "week_id": "2025-W01"}},
+        {"collection": "tasks", "filter": {"id": "x"}},
+        {"collection": "task_versions", "filter": {"id": "x", "version": 1}},
+    ],
+    "GET /api/reports/parent/{student_id}": [
+        {"collection": "users", "filter": {"id": "x"}},
+        {"collection": "answers", "filter": {"user_id": "x", "created_at": {"$gte": "2025-01-01"}}},
+        {"collection": "tasks", "filter": {"id": {"$in": ["x", "y"]}}},
+    ],
+    "POST /api/class/assign": [],
+    "GET /api/class/assignments": [
+        {"collection": "class_assignments", "filter": {"created_by": "x"}},
+        {"collection": "class_assignments", "filter": {"student_ids": "x"}},
+    ],
+    "GET /api/admin/index-advisor": [],
+    "GET /api/metrics": [],
+    "GET /api/admin/loop-lag": [],
+    "GET /api/health/live": [],
+    "GET /api/health/ready": [],
+    # Capped collection of bounded size, scanned newest first
+    "GET /api/admin/profiles": [{"collection": "request_profiles", "filter": {"route": "GET /api/"}, "allow_collscan": True}],
+    "PUT /api/admin/profiling": [],
+    "GET /api/": [],
+}
+
+def _plan_stages(plan: Any) -> List[str]:
+    """Collect all stage names of an explain plan"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+@api_router.get("/admin/index-advisor")
+async def get_index_advisor(admin: dict = Depends(get_admin_user)):
+    """Admin: explain every registered query shape and report collection scans"""
+    registered_routes = {
+        f"{method} {route.path}"
+        for route in app.routes if getattr(route, "path", "").startswith("/api")
+        for method in getattr(route, "methods", [])
+    }
     
-    # Count tasks per grade
-    counts = {}
-    for grade in range(5, 11):
-        counts[f"grade_{grade}"] = await db.tasks.count_documents({"grade": grade})
+    report = []
+    for route_key, shapes in QUERY_SHAPES.items():
+        for shape in shapes:
+            find = {"find": shape["collection"], "filter": shape["filter"]}
+            if shape.get("sort"):
+                find["sort"] = shape["sort"]
+            explained = await db.command({"explain": find, "verbosity": "queryPlanner"})
+            stages = _plan_stages(explained.get("queryPlanner", {}).get("winningPlan", {}))
+            report.append({
+                "route": route_key,
+                "collection": shape["collection"],
+                "filter": shape["filter"],
+                "sort": shape.get("sort"),
+                "stages": stages,
+                "collscan": "COLLSCAN" in stages,
+                "allowed": shape.get("allow_collscan", False)
+            })
     
-    return {"message": "NRW Hauptschule Aufgaben hinzugefügt", "added": len(tasks), "counts": counts}
+    return {
+        "collscans": [r for r in report if r["collscan"] and not r["allowed"]],
+        "undeclared_routes": sorted(registered_routes - set(QUERY_SHAPES)),
+        "shapes": report
+    }
 
-def get_nrw_hauptschule_tasks():
-    """NRW Hauptschule curriculum-aligned practical tasks"""
-    tasks = []
+# ================== REQUEST METRICS ==================
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+# (method, route) -> aggregated counters; route is the path template
+_route_metrics: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_status_counts: Dict[Tuple[str, str, int], int] = {}
+
+def record_request_metrics(method: str, route: str, status_code: int, duration: float, stats: dict):
+    metrics = _route_metrics.get((method, route))
+    if metrics is None:
+        metrics = _route_metrics[(method, route)] = {
+            "count": 0,
+            "duration_sum": 0.0,
+            "duration_buckets": [0] * len(LATENCY_BUCKETS),
+            "query_buckets": [0] * len(QUERY_COUNT_BUCKETS),
+            "queries": 0,
+            "db_time": 0.0,
+            "documents": 0
+        }
+    metrics["count"] += 1
+    metrics["duration_sum"] += duration
+    metrics["queries"] += stats["queries"]
+    metrics["db_time"] += stats["db_time"]
+    metrics["documents"] += stats["documents"]
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if duration <= bound:
+            metrics["duration_buckets"][i] += 1
+    for i, bound in enumerate(QUERY_COUNT_BUCKETS):
+        if stats["queries"] <= bound:
+            metrics["query_buckets"][i] += 1
+    _status_counts[(method, route, status_code)] = _status_counts.get((method, route, status_code), 0) + 1
+
+# Upper bounds per request: MongoDB round trips and documents returned. They
+# are the costs measured by tests/test_query_budgets.py against the seeded
+# catalog plus a small margin, asserted there and logged when exceeded in
+# production. Submissions with an Idempotency-Key cost two more round trips.
+QUERY_BUDGETS = {
+    "POST /api/auth/register": {"queries": 2, "documents": 1},
+    "POST /api/auth/login": {"queries": 1, "documents": 1},
+    "GET /api/auth/me": {"queries": 1, "documents": 1},
+    "PUT /api/auth/grade": {"queries": 2, "documents": 1},
+    "POST /api/auth/password-reset-request": {"queries": 2, "documents": 1},
+    "POST /api/auth/password-reset-confirm": {"queries": 3, "documents": 1},
+    "PUT /api/auth/change-password": {"queries": 3, "documents": 2},
+    "GET /api/tasks/grades": {"queries": 0, "documents": 0},
+    "GET /api/tasks/topics/{grade}": {"queries": 0, "documents": 0},
+    "GET /api/tasks/{grade}/{topic}": {"queries": 2, "documents": 6},
+    "GET /api/tasks/single/{task_id}": {"queries": 2, "documents": 2},
+    "GET /api/tasks/single/{task_id}/instances": {"queries": 2, "documents": 2},
+    "POST /api/tasks/submit": {"queries": 6, "documents": 4},
+    "GET /api/progress/overview": {"queries": 3, "documents": 16},
+    "GET /api/progress/stats": {"queries": 4, "documents": 12},
+    "GET /api/challenges/daily": {"queries": 5, "documents": 125},
+    "POST /api/challenges/submit/{challenge_id}": {"queries": 11, "documents": 7},
+    "GET /api/recommendations": {"queries": 4, "documents": 10},
+    "GET /api/recommendations/ai": {"queries": 4, "documents": 12},
+    "GET /api/admin/stats": {"queries": 6, "documents": 10},
+    "GET /api/admin/students": {"queries": 3, "documents": 50},
+    "GET /api/admin/students/{student_id}": {"queries": 3, "documents": 10},
+    "POST /api/admin/tasks": {"queries": 4, "documents": 5},
+    "PUT /api/admin/tasks/{task_id}": {"queries": 5, "documents": 5},
+    "DELETE /api/admin/tasks/{task_id}": {"queries": 3, "documents": 2},
+    "GET /api/admin/tasks/{task_id}/versions": {"queries": 2, "documents": 5},
+    "GET /api/admin/tasks": {"queries": 2, "documents": 100},
+    "POST /api/admin/tasks/import-csv": {"queries": 5, "documents": 5},
+    "GET /api/admin/tasks/duplicates": {"queries": 3, "documents": 15},
+    "GET /api/admin/tasks/page": {"queries": 3, "documents": 23},
+    "GET /api/admin/tasks/search": {"queries": 2, "documents": 1},
+    "GET /api/admin/tasks/export": {"queries": 3, "documents": 100},
+    "POST /api/seed": {"queries": 7, "documents": 10},
+    "POST /api/seed/additional": {"queries": 7, "documents": 15},
+    "POST /api/seed/nrw-hauptschule": {"queries": 7, "documents": 20},
+    "GET /api/admin/content-packs": {"queries": 2, "documents": 5},
+    "GET /api/features": {"queries": 1, "documents": 1},
+    "PUT /api/admin/features/{user_id}": {"queries": 2, "documents": 1},
+    "POST /api/ai/explain-mistake": {"queries": 2, "documents": 2},
+    "GET /api/recommendations/adaptive": {"queries": 5, "documents": 75},
+    "POST /api/practice/submit": {"queries": 3, "documents": 2},
+    "GET /api/readiness/{topic}": {"queries": 3, "documents": 16},
+    "GET /api/badges/available": {"queries": 0, "documents": 0},
+    "GET /api/badges/check": {"queries": 3, "documents": 10},
+    "GET /api/challenges/weekly": {"queries": 8, "documents": 20},
+    "POST /api/challenges/weekly/submit": {"queries": 5, "documents": 100},
+    "GET /api/reports/parent/{student_id}": {"queries": 4, "documents": 70},
+    "POST /api/class/assign": {"queries": 2, "documents": 1},
+    "GET /api/class/assignments": {"queries": 2, "documents": 5},
+    "GET /api/admin/index-advisor": {"queries": 1 + sum(len(shapes) for shapes in QUERY_SHAPES.values()), "documents": 1},
+    "GET /api/metrics": {"queries": 0, "documents": 0},
+    "GET /api/admin/loop-lag": {"queries": 1, "documents": 1},
+    "GET /api/health/live": {"queries": 0, "documents": 0},
+    "GET /api/health/ready": {"queries": 1, "documents": 0},
+    "GET /api/admin/profiles": {"queries": 2, "documents": 5},
+    "PUT /api/admin/profiling": {"queries": 1, "documents": 1},
+    "GET /api/": {"queries": 0, "documents": 0},
+}
+
+def check_query_budget(route_key: str, stats: dict):
+    budget = QUERY_BUDGETS.get(route_key)
+    if budget and (stats["queries"] > budget["queries"] or stats["documents"] > budget["documents"]):
+        logger.warning(
+            f"Query budget exceeded for {route_key}: {stats['queries']} queries "
+            f"(budget {budget['queries']}), {stats['documents']} documents (budget {budget['documents']})"
+        )
+
+class RequestMetricsMiddleware:
+    """Time each request and attribute its MongoDB commands to the matched route"""
     
-    # ===== KLASSE 5 - Grundlagen =====
-    tasks.extend([
-        # Grundrechenarten - Alltagsbezug
-        {"grade": 5, "topic": "Grundrechenarten", "question": "Du kaufst 3 Hefte für je 2,50 €. Wie viel bezahlst du?", "task_type": "free_text", "options": None, "correct_answer": "7,50", "explanation": "3 × 2,50 € = 7,50 €", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Grundrechenarten", "question": "Du hast 20 € und kaufst etwas für 13,75 €. Wie viel Wechselgeld bekommst du?", "task_type": "free_text", "options": None, "correct_answer": "6,25", "explanation": "20 € - 13,75 € = 6,25 €", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Grundrechenarten", "question": "Eine Klasse mit 24 Schülern wird in 4 gleiche Gruppen geteilt. Wie viele Schüler sind in jeder Gruppe?", "task_type": "free_text", "options": None, "correct_answer": "6", "explanation": "24 ÷ 4 = 6 Schüler pro Gruppe", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Grundrechenarten", "question": "Runde 4.567 auf Hunderter.", "task_type": "free_text", "options": None, "correct_answer": "4600", "explanation": "4.567 → 4.600 (67 wird aufgerundet)", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Grundrechenarten", "question": "Was ist 125 × 8?", "task_type": "free_text", "options": None, "correct_answer": "1000", "explanation": "125 × 8 = 1000", "xp_reward": 10, "difficulty": "mittel"},
-        
-        # Einheiten und Umrechnungen
-        {"grade": 5, "topic": "Einheiten", "question": "Wie viele Zentimeter sind 2,5 Meter?", "task_type": "free_text", "options": None, "correct_answer": "250", "explanation": "2,5 m × 100 = 250 cm", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Einheiten", "question": "Wie viele Gramm sind 3 kg?", "task_type": "free_text", "options": None, "correct_answer": "3000", "explanation": "3 kg × 1000 = 3000 g", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Einheiten", "question": "Wie viele Minuten sind 2 Stunden und 15 Minuten?", "task_type": "free_text", "options": None, "correct_answer": "135", "explanation": "2 × 60 + 15 = 135 Minuten", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Einheiten", "question": "Wandle 4500 m in km um.", "task_type": "free_text", "options": None, "correct_answer": "4,5", "explanation": "4500 m ÷ 1000 = 4,5 km", "xp_reward": 10, "difficulty": "mittel"},
-        {"grade": 5, "topic": "Einheiten", "question": "Ein Film dauert 95 Minuten. Wie viele Stunden und Minuten sind das?", "task_type": "multiple_choice", "options": ["1 Stunde 25 Minuten", "1 Stunde 35 Minuten", "1 Stunde 45 Minuten", "2 Stunden 5 Minuten"], "correct_answer": "1 Stunde 35 Minuten", "explanation": "95 ÷ 60 = 1 Rest 35", "xp_reward": 10, "difficulty": "mittel"},
-        
-        # Geometrie Grundlagen
-        {"grade": 5, "topic": "Geometrie Grundlagen", "question": "Berechne den Umfang eines Quadrats mit Seitenlänge 7 cm.", "task_type": "free_text", "options": None, "correct_answer": "28", "explanation": "U = 4 × a = 4 × 7 = 28 cm", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Geometrie Grundlagen", "question": "Ein Rechteck hat die Seiten 5 cm und 3 cm. Wie groß ist die Fläche?", "task_type": "free_text", "options": None, "correct_answer": "15", "explanation": "A = a × b = 5 × 3 = 15 cm²", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Geometrie Grundlagen", "question": "Wie viele Ecken hat ein Dreieck?", "task_type": "multiple_choice", "options": ["2", "3", "4", "5"], "correct_answer": "3", "explanation": "Ein Dreieck hat 3 Ecken.", "xp_reward": 5, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Geometrie Grundlagen", "question": "Berechne den Umfang eines Rechtecks mit a = 8 cm und b = 5 cm.", "task_type": "free_text", "options": None, "correct_answer": "26", "explanation": "U = 2 × (a + b) = 2 × (8 + 5) = 26 cm", "xp_reward": 10, "difficulty": "leicht"},
-        
-        # Brüche einführen
-        {"grade": 5, "topic": "Brüche einführen", "question": "Wie viel ist 1/4 von 20?", "task_type": "free_text", "options": None, "correct_answer": "5", "explanation": "20 ÷ 4 = 5", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Brüche einführen", "question": "Welcher Bruch ist größer: 1/2 oder 1/3?", "task_type": "multiple_choice", "options": ["1/2", "1/3", "Beide gleich"], "correct_answer": "1/2", "explanation": "1/2 = 0,5 und 1/3 ≈ 0,33. Also ist 1/2 größer.", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Brüche einführen", "question": "Ein Pizza wird in 8 Stücke geteilt. Du isst 3 Stücke. Welchen Bruchteil hast du gegessen?", "task_type": "free_text", "options": None, "correct_answer": "3/8", "explanation": "3 von 8 Stücken = 3/8", "xp_reward": 10, "difficulty": "leicht"},
-        
-        # Dezimalzahlen
-        {"grade": 5, "topic": "Dezimalzahlen", "question": "Was ergibt 2,4 + 1,8?", "task_type": "free_text", "options": None, "correct_answer": "4,2", "explanation": "2,4 + 1,8 = 4,2", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 5, "topic": "Dezimalzahlen", "question": "Ordne: 0,5 ; 0,35 ; 0,8. Welche Zahl ist am kleinsten?", "task_type": "multiple_choice", "options": ["0,5", "0,35", "0,8"], "correct_answer": "0,35", "explanation": "0,35 < 0,5 < 0,8", "xp_reward": 10, "difficulty": "leicht"},
-    ])
-    
-    # ===== KLASSE 6 - Vertiefung =====
-    tasks.extend([
-        # Bruchrechnung
-        {"grade": 6, "topic": "Bruchrechnung", "question": "Was ergibt 2/3 + 1/6?", "task_type": "free_text", "options": None, "correct_answer": "5/6", "explanation": "2/3 = 4/6, also 4/6 + 1/6 = 5/6", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 6, "topic": "Bruchrechnung", "question": "Was ergibt 3/4 - 1/2?", "task_type": "free_text", "options": None, "correct_answer": "1/4", "explanation": "3/4 - 2/4 = 1/4", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 6, "topic": "Bruchrechnung", "question": "Berechne 2/5 × 10.", "task_type": "free_text", "options": None, "correct_answer": "4", "explanation": "2/5 × 10 = 20/5 = 4", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 6, "topic": "Bruchrechnung", "question": "Was ergibt 3/4 ÷ 2?", "task_type": "free_text", "options": None, "correct_answer": "3/8", "explanation": "3/4 ÷ 2 = 3/4 × 1/2 = 3/8", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 6, "topic": "Bruchrechnung", "question": "Kürze den Bruch 12/18.", "task_type": "free_text", "options": None, "correct_answer": "2/3", "explanation": "12/18 ÷ 6/6 = 2/3", "xp_reward": 10, "difficulty": "leicht"},
-        
-        # Prozentrechnung Einführung
-        {"grade": 6, "topic": "Prozentrechnung", "question": "Was sind 25% von 80?", "task_type": "free_text", "options": None, "correct_answer": "20", "explanation": "25% = 1/4, also 80 ÷ 4 = 20", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 6, "topic": "Prozentrechnung", "question": "Ein Pullover kostet 40 €. Im Sale gibt es 20% Rabatt. Wie viel sparst du?", "task_type": "free_text", "options": None, "correct_answer": "8", "explanation": "20% von 40 € = 8 €", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 6, "topic": "Prozentrechnung", "question": "Was sind 10% von 350?", "task_type": "free_text", "options": None, "correct_answer": "35", "explanation": "350 ÷ 10 = 35", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 6, "topic": "Prozentrechnung", "question": "Du hast 15 von 20 Aufgaben richtig. Wie viel Prozent ist das?", "task_type": "free_text", "options": None, "correct_answer": "75", "explanation": "15/20 = 0,75 = 75%", "xp_reward": 15, "difficulty": "mittel"},
-        
-        # Geometrie - Flächen
-        {"grade": 6, "topic": "Flächen und Umfang", "question": "Berechne die Fläche eines Dreiecks mit Grundseite 8 cm und Höhe 6 cm.", "task_type": "free_text", "options": None, "correct_answer": "24", "explanation": "A = (g × h) / 2 = (8 × 6) / 2 = 24 cm²", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 6, "topic": "Flächen und Umfang", "question": "Ein Parallelogramm hat die Grundseite 10 cm und die Höhe 4 cm. Wie groß ist die Fläche?", "task_type": "free_text", "options": None, "correct_answer": "40", "explanation": "A = g × h = 10 × 4 = 40 cm²", "xp_reward": 15, "difficulty": "mittel"},
-        
-        # Negative Zahlen Einführung
-        {"grade": 6, "topic": "Negative Zahlen", "question": "Was ergibt 5 - 8?", "task_type": "free_text", "options": None, "correct_answer": "-3", "explanation": "5 - 8 = -3", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 6, "topic": "Negative Zahlen", "question": "Die Temperatur ist -5°C. Sie steigt um 12°C. Wie warm ist es jetzt?", "task_type": "free_text", "options": None, "correct_answer": "7", "explanation": "-5 + 12 = 7°C", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 6, "topic": "Negative Zahlen", "question": "Was ergibt (-4) + (-6)?", "task_type": "free_text", "options": None, "correct_answer": "-10", "explanation": "Zwei negative Zahlen addieren: -4 + (-6) = -10", "xp_reward": 10, "difficulty": "leicht"},
-    ])
-    
-    # ===== KLASSE 7 - Rationale Zahlen & Gleichungen =====
-    tasks.extend([
-        # Rationale Zahlen
-        {"grade": 7, "topic": "Rationale Zahlen", "question": "Was ergibt (-3) × (-4)?", "task_type": "free_text", "options": None, "correct_answer": "12", "explanation": "Minus mal Minus = Plus: -3 × -4 = 12", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 7, "topic": "Rationale Zahlen", "question": "Was ergibt (-20) ÷ 5?", "task_type": "free_text", "options": None, "correct_answer": "-4", "explanation": "-20 ÷ 5 = -4", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 7, "topic": "Rationale Zahlen", "question": "Was ergibt (-7) × 3?", "task_type": "free_text", "options": None, "correct_answer": "-21", "explanation": "-7 × 3 = -21", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 7, "topic": "Rationale Zahlen", "question": "Ordne: -5, 2, -1, 0. Von klein nach groß:", "task_type": "multiple_choice", "options": ["-5, -1, 0, 2", "-1, -5, 0, 2", "0, -1, -5, 2", "2, 0, -1, -5"], "correct_answer": "-5, -1, 0, 2", "explanation": "-5 < -1 < 0 < 2", "xp_reward": 10, "difficulty": "leicht"},
-        
-        # Einfache Gleichungen
-        {"grade": 7, "topic": "Gleichungen", "question": "Löse: x + 7 = 15", "task_type": "free_text", "options": None, "correct_answer": "8", "explanation": "x = 15 - 7 = 8", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 7, "topic": "Gleichungen", "question": "Löse: 3x = 21", "task_type": "free_text", "options": None, "correct_answer": "7", "explanation": "x = 21 ÷ 3 = 7", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 7, "topic": "Gleichungen", "question": "Löse: 2x + 5 = 17", "task_type": "free_text", "options": None, "correct_answer": "6", "explanation": "2x = 12, x = 6", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 7, "topic": "Gleichungen", "question": "Löse: x/4 = 8", "task_type": "free_text", "options": None, "correct_answer": "32", "explanation": "x = 8 × 4 = 32", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 7, "topic": "Gleichungen", "question": "Löse: 5x - 3 = 22", "task_type": "free_text", "options": None, "correct_answer": "5", "explanation": "5x = 25, x = 5", "xp_reward": 15, "difficulty": "mittel"},
-        
-        # Proportionalität
-        {"grade": 7, "topic": "Proportionalität", "question": "3 Äpfel kosten 1,50 €. Was kosten 9 Äpfel?", "task_type": "free_text", "options": None, "correct_answer": "4,50", "explanation": "9 ist 3× so viel wie 3, also 3 × 1,50 = 4,50 €", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 7, "topic": "Proportionalität", "question": "Ein Auto fährt 60 km in 1 Stunde. Wie weit fährt es in 2,5 Stunden?", "task_type": "free_text", "options": None, "correct_answer": "150", "explanation": "60 × 2,5 = 150 km", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 7, "topic": "Proportionalität", "question": "5 Arbeiter brauchen 10 Tage. Wie lange brauchen 10 Arbeiter?", "task_type": "free_text", "options": None, "correct_answer": "5", "explanation": "Antiproportional: doppelte Arbeiter = halbe Zeit: 10 ÷ 2 = 5 Tage", "xp_reward": 15, "difficulty": "mittel"},
-        
-        # Prozentrechnung erweitert
-        {"grade": 7, "topic": "Prozentrechnung", "question": "Ein Fahrrad kostet 250 €. Es wird um 20% teurer. Was ist der neue Preis?", "task_type": "free_text", "options": None, "correct_answer": "300", "explanation": "20% von 250 = 50, also 250 + 50 = 300 €", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 7, "topic": "Prozentrechnung", "question": "Von 500 € Gehalt werden 19% Steuern abgezogen. Wie viel bleibt übrig?", "task_type": "free_text", "options": None, "correct_answer": "405", "explanation": "19% von 500 = 95, also 500 - 95 = 405 €", "xp_reward": 15, "difficulty": "mittel"},
-    ])
-    
-    # ===== KLASSE 8 - Terme & Geometrie =====
-    tasks.extend([
-        # Terme
-        {"grade": 8, "topic": "Terme", "question": "Vereinfache: 3a + 5a", "task_type": "free_text", "options": None, "correct_answer": "8a", "explanation": "3a + 5a = 8a (gleiche Variablen addieren)", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 8, "topic": "Terme", "question": "Vereinfache: 4x - 2x + 5", "task_type": "free_text", "options": None, "correct_answer": "2x + 5", "explanation": "4x - 2x = 2x, also 2x + 5", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 8, "topic": "Terme", "question": "Multipliziere aus: 3(x + 4)", "task_type": "free_text", "options": None, "correct_answer": "3x + 12", "explanation": "3 × x + 3 × 4 = 3x + 12", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 8, "topic": "Terme", "question": "Klammer aus: 6x + 12", "task_type": "free_text", "options": None, "correct_answer": "6(x + 2)", "explanation": "GGT ist 6: 6x + 12 = 6(x + 2)", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 8, "topic": "Terme", "question": "Was ist (2x)²?", "task_type": "free_text", "options": None, "correct_answer": "4x²", "explanation": "(2x)² = 2² × x² = 4x²", "xp_reward": 15, "difficulty": "mittel"},
-        
-        # Lineare Gleichungen
-        {"grade": 8, "topic": "Lineare Gleichungen", "question": "Löse: 3x + 2 = 5x - 4", "task_type": "free_text", "options": None, "correct_answer": "3", "explanation": "3x - 5x = -4 - 2, also -2x = -6, x = 3", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 8, "topic": "Lineare Gleichungen", "question": "Löse: 2(x - 3) = 10", "task_type": "free_text", "options": None, "correct_answer": "8", "explanation": "2x - 6 = 10, 2x = 16, x = 8", "xp_reward": 15, "difficulty": "mittel"},
-        
-        # Kreis
-        {"grade": 8, "topic": "Kreis", "question": "Berechne den Umfang eines Kreises mit r = 7 cm. (π ≈ 3,14)", "task_type": "free_text", "options": None, "correct_answer": "43,96", "explanation": "U = 2πr = 2 × 3,14 × 7 = 43,96 cm", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 8, "topic": "Kreis", "question": "Berechne die Fläche eines Kreises mit r = 5 cm. (π ≈ 3,14)", "task_type": "free_text", "options": None, "correct_answer": "78,5", "explanation": "A = πr² = 3,14 × 25 = 78,5 cm²", "xp_reward": 15, "difficulty": "mittel"},
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Pythagoras
-        {"grade": 8, "topic": "Satz des Pythagoras", "question": "Ein rechtwinkliges Dreieck hat die Katheten a=3cm und b=4cm. Wie lang ist die Hypotenuse c?", "task_type": "free_text", "options": None, "correct_answer": "5", "explanation": "c² = a² + b² = 9 + 16 = 25, c = 5 cm", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 8, "topic": "Satz des Pythagoras", "question": "Die Hypotenuse ist 13 cm, eine Kathete ist 5 cm. Wie lang ist die andere Kathete?", "task_type": "free_text", "options": None, "correct_answer": "12", "explanation": "b² = c² - a² = 169 - 25 = 144, b = 12 cm", "xp_reward": 20, "difficulty": "schwer"},
-    ])
-    
-    # ===== KLASSE 9 - Funktionen & Prozent =====
-    tasks.extend([
-        # Lineare Funktionen
-        {"grade": 9, "topic": "Lineare Funktionen", "question": "f(x) = 2x + 3. Was ist f(4)?", "task_type": "free_text", "options": None, "correct_answer": "11", "explanation": "f(4) = 2×4 + 3 = 8 + 3 = 11", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 9, "topic": "Lineare Funktionen", "question": "Welche Steigung hat die Gerade y = 3x - 2?", "task_type": "free_text", "options": None, "correct_answer": "3", "explanation": "Bei y = mx + n ist m die Steigung. Hier m = 3", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 9, "topic": "Lineare Funktionen", "question": "Wo schneidet y = 2x + 6 die y-Achse?", "task_type": "free_text", "options": None, "correct_answer": "6", "explanation": "y-Achsenabschnitt ist der Wert für x=0: y = 6", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 9, "topic": "Lineare Funktionen", "question": "Bestimme die Nullstelle von f(x) = 4x - 8", "task_type": "free_text", "options": None, "correct_answer": "2", "explanation": "0 = 4x - 8, 4x = 8, x = 2", "xp_reward": 15, "difficulty": "mittel"},
+        stats = {"queries": 0, "db_time": 0.0, "documents": 0}
+        token = _request_stats.set(stats)
+        status_code = 500
+        start = time.perf_counter()
         
-        # Zinsrechnung
-        {"grade": 9, "topic": "Zinsrechnung", "question": "Du legst 1000 € für 1 Jahr zu 3% Zinsen an. Wie viel Zinsen bekommst du?", "task_type": "free_text", "options": None, "correct_answer": "30", "explanation": "Z = K × p / 100 = 1000 × 3 / 100 = 30 €", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 9, "topic": "Zinsrechnung", "question": "Du legst 500 € für 6 Monate zu 4% Zinsen an. Wie viel Zinsen bekommst du?", "task_type": "free_text", "options": None, "correct_answer": "10", "explanation": "Z = 500 × 4 × 6 / (100 × 12) = 10 €", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 9, "topic": "Zinsrechnung", "question": "2000 € werden zu 2,5% verzinst. Wie viel hast du nach 1 Jahr?", "task_type": "free_text", "options": None, "correct_answer": "2050", "explanation": "Zinsen: 2000 × 2,5 / 100 = 50 €. Gesamt: 2050 €", "xp_reward": 15, "difficulty": "mittel"},
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
         
-        # Quadratische Gleichungen (einfach)
-        {"grade": 9, "topic": "Quadratische Gleichungen", "question": "Löse: x² = 25", "task_type": "multiple_choice", "options": ["x = 5", "x = -5", "x = 5 oder x = -5", "x = 25"], "correct_answer": "x = 5 oder x = -5", "explanation": "√25 = ±5, also x = 5 oder x = -5", "xp_reward": 15, "difficulty": "mittel"},
-        {"grade": 9, "topic": "Quadratische Gleichungen", "question": "Löse: x² - 9 = 0", "task_type": "multiple_choice", "options": ["x = 3", "x = -3", "x = 3 oder x = -3", "x = 9"], "correct_answer": "x = 3 oder x = -3", "explanation": "x² = 9, also x = ±3", "xp_reward": 15, "difficulty": "mittel"},
+        task = asyncio.current_task()
+        _inflight_scopes[task] = scope
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _inflight_scopes.pop(task, None)
+            _request_stats.reset(token)
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            record_request_metrics(scope["method"], route_path, status_code, time.perf_counter() - start, stats)
+            check_query_budget(f"{scope['method']} {route_path}", stats)
+
+def _labels(**labels) -> str:
+    return ",".join(f'{k}="{str(v)}"' for k, v in labels.items())
+
+def _histogram_lines(name: str, labels: str, bounds: tuple, counts: List[int], total: float, count: int) -> List[str]:
+    lines = [f'{name}_bucket{{{labels},le="{bound}"}} {n}' for bound, n in zip(bounds, counts)]
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+    lines.append(f"{name}_sum{{{labels}}} {total}")
+    lines.append(f"{name}_count{{{labels}}} {count}")
+    return lines
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Request and database metrics per route in Prometheus text format"""
+    lines = [
+        "# HELP mathevilla_http_requests_total HTTP requests by route and status.",
+        "# TYPE mathevilla_http_requests_total counter",
+    ]
+    for (method, route, status_code), n in sorted(_status_counts.items()):
+        lines.append(f"mathevilla_http_requests_total{{{_labels(method=method, route=route, status=status_code)}}} {n}")
+    
+    lines += [
+        "# HELP mathevilla_http_request_duration_seconds Request latency by route.",
+        "# TYPE mathevilla_http_request_duration_seconds histogram",
+    ]
+    for (method, route), m in sorted(_route_metrics.items()):
+        lines += _histogram_lines(
+            "mathevilla_http_request_duration_seconds", _labels(method=method, route=route),
+            LATENCY_BUCKETS, m["duration_buckets"], m["duration_sum"], m["count"]
+        )
+    
+    lines += [
+        "# HELP mathevilla_db_queries_per_request MongoDB commands issued per request.",
+        "# TYPE mathevilla_db_queries_per_request histogram",
+    ]
+    for (method, route), m in sorted(_route_metrics.items()):
+        lines += _histogram_lines(
+            "mathevilla_db_queries_per_request", _labels(method=method, route=route),
+            QUERY_COUNT_BUCKETS, m["query_buckets"], m["queries"], m["count"]
+        )
+    
+    for name, key, help_text in [
+        ("mathevilla_db_queries_total", "queries", "MongoDB commands issued by route."),
+        ("mathevilla_db_time_seconds_total", "db_time", "Time spent in MongoDB commands by route."),
+        ("mathevilla_db_documents_returned_total", "documents", "Documents returned by MongoDB by route."),
+    ]:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for (method, route), m in sorted(_route_metrics.items()):
+            lines.append(f"{name}{{{_labels(method=method, route=route)}}} {m[key]}")
+    
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+# ================== EVENT LOOP LAG MONITOR ==================
+
+# A sampler coroutine measures how late the loop wakes it up. A watchdog thread
+# notices when the sampler stops running and captures the stack of the loop
+# thread while it is still blocked, together with the route being served.
+LOOP_LAG_INTERVAL = float(os.environ.get('LOOP_LAG_INTERVAL_MS', 100)) / 1000
+LOOP_LAG_THRESHOLD = float(os.environ.get('LOOP_LAG_THRESHOLD_MS', 100)) / 1000
+
+_loop_lag_samples: deque = deque(maxlen=3000)
+_loop_stalls: deque = deque(maxlen=50)
+_inflight_scopes: Dict[Any, dict] = {}
+_loop_monitor: Dict[str, Any] = {"heartbeat": 0.0, "loop": None, "thread_id": None, "stop": None}
+
+async def sample_loop_lag():
+    loop = asyncio.get_running_loop()
+    while True:
+        _loop_monitor["heartbeat"] = time.monotonic()
+        started = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        _loop_lag_samples.append(max(0.0, loop.time() - started - LOOP_LAG_INTERVAL))
+
+def _capture_stall(blocked_for: float):
+    loop = _loop_monitor["loop"]
+    frame = sys._current_frames().get(_loop_monitor["thread_id"])
+    task = asyncio.current_task(loop) if loop else None
+    scope = _inflight_scopes.get(task, {})
+    route = scope.get("route")
+    stall = {
+        "detected_at": datetime.now(timezone.utc).isoformat(),
+        "blocked_ms": round(blocked_for * 1000, 1),
+        "route": f"{scope.get('method')} {route.path if route is not None else scope.get('path')}" if scope else None,
+        "task": task.get_name() if task else None,
+        "stack": traceback.format_stack(frame) if frame else []
+    }
+    _loop_stalls.append(stall)
+    logger.warning(
+        f"Event loop blocked for {stall['blocked_ms']}ms in {stall['route'] or 'background task'}:\n"
+        + "".join(stall["stack"][-8:])
+    )
+
+def watch_loop_lag(stop: threading.Event):
+    reported = False
+    while not stop.wait(LOOP_LAG_INTERVAL / 2):
+        blocked_for = time.monotonic() - _loop_monitor["heartbeat"] - LOOP_LAG_INTERVAL
+        if blocked_for > LOOP_LAG_THRESHOLD:
+            if not reported:
+                _capture_stall(blocked_for)
+                reported = True
+        else:
+            reported = False
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct))]
+
+def loop_lag_snapshot() -> dict:
+    samples = sorted(_loop_lag_samples)
+    return {
+        "samples": len(samples),
+        "p50_ms": round(_percentile(samples, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(samples, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(samples, 0.99) * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2) if samples else 0.0,
+        "threshold_ms": LOOP_LAG_THRESHOLD * 1000
+    }
+
+@api_router.get("/admin/loop-lag")
+async def get_loop_lag(admin: dict = Depends(get_admin_user)):
+    """Admin: event loop delay percentiles and the most recent stalls"""
+    return {**loop_lag_snapshot(), "stalls": list(_loop_stalls)[::-1]}
+
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    _loop_monitor["loop"] = asyncio.get_running_loop()
+    _loop_monitor["thread_id"] = threading.get_ident()
+    _loop_monitor["heartbeat"] = time.monotonic()
+    _loop_monitor["sampler"] = asyncio.create_task(sample_loop_lag())
+    _loop_monitor["stop"] = threading.Event()
+    threading.Thread(target=watch_loop_lag, args=(_loop_monitor["stop"],), name="loop-lag-watchdog", daemon=True).start()
+
+@app.on_event("shutdown")
+async def stop_loop_lag_monitor():
+    if _loop_monitor["stop"]:
+        _loop_monitor["stop"].set()
+        _loop_monitor["sampler"].cancel()
+
+# ================== REQUEST PROFILING ==================
+
+# Admins can profile a single request by sending "X-Profile: 1" with their
+# token, or sample a share of requests (optionally limited to some routes).
+# Only one request is profiled at a time: cProfile sees everything running on
+# the event loop, so overlapping profiles would be meaningless.
+PROFILE_COLLECTION_BYTES = 16 * 1024 * 1024
+PROFILE_TOP_FUNCTIONS = 25
+
+_profiling: Dict[str, Any] = {
+    "sample_rate": float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+    "routes": [],
+    "active": False
+}
+_background_writes: Set[asyncio.Task] = set()
+
+class ProfilingSettings(BaseModel):
+    sample_rate: float = Field(0.0, ge=0, le=1)
+    routes: List[str] = []  # route keys like "GET /api/progress/stats"; empty = all
+
+async def ensure_profile_collection():
+    try:
+        await db.create_collection("request_profiles", capped=True, size=PROFILE_COLLECTION_BYTES)
+    except (CollectionInvalid, OperationFailure):
+        pass  # already exists
+
+def _route_key_for(scope) -> Optional[str]:
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return f"{scope['method']} {route.path}"
+    return None
+
+async def _is_admin_token(scope) -> bool:
+    authorization = dict(scope["headers"]).get(b"authorization", b"").decode()
+    if not authorization.startswith("Bearer "):
+        return False
+    try:
+        payload = jwt.decode(authorization[7:], JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    except jwt.InvalidTokenError:
+        return False
+    user = await db.users.find_one({"id": payload.get("sub")}, {"_id": 0, "role": 1})
+    return bool(user) and user.get("role") == "admin"
+
+async def _profile_trigger(scope) -> Optional[str]:
+    if dict(scope["headers"]).get(b"x-profile") == b"1" and await _is_admin_token(scope):
+        return "header"
+    routes = _profiling["routes"]
+    if random.random() < _profiling["sample_rate"] and (not routes or _route_key_for(scope) in routes):
+        return "sample"
+    return None
+
+def _function_label(func: tuple) -> str:
+    filename, lineno, name = func
+    if filename == "~":
+        return name
+    filename = filename.split("site-packages/")[-1]
+    return f"{filename}:{lineno}({name})"
+
+def summarize_profile(profiler: cProfile.Profile) -> dict:
+    """Top functions by cumulative and own time, plus time spent in Pydantic"""
+    entries = pstats.Stats(profiler).stats  # func -> (primitive calls, calls, tottime, cumtime, callers)
+    rows = [
+        {"function": _function_label(func), "calls": calls, "own_ms": round(tottime * 1000, 3), "cumulative_ms": round(cumtime * 1000, 3)}
+        for func, (_, calls, tottime, cumtime, _) in entries.items()
+    ]
+    validation = sum(
+        tottime for (filename, _, name), (_, _, tottime, _, _) in entries.items()
+        if "pydantic" in filename or "pydantic" in name
+    )
+    return {
+        "top_cumulative": sorted(rows, key=lambda r: r["cumulative_ms"], reverse=True)[:PROFILE_TOP_FUNCTIONS],
+        "top_own": sorted(rows, key=lambda r: r["own_ms"], reverse=True)[:PROFILE_TOP_FUNCTIONS],
+        "pydantic_ms": round(validation * 1000, 3)
+    }
+
+def store_profile(profile: dict):
+    # Fire and forget, outside the request's query accounting
+    task = asyncio.create_task(db.request_profiles.insert_one(profile), context=contextvars.Context())
+    _background_writes.add(task)
+    task.add_done_callback(_background_writes.discard)
+
+class RequestProfilerMiddleware:
+    """Run admin-requested or sampled requests under cProfile"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _profiling["active"]:
+            await self.app(scope, receive, send)
+            return
         
-        # Sachaufgaben
-        {"grade": 9, "topic": "Sachaufgaben", "question": "Ein Handyvertrag kostet 15 € Grundgebühr plus 0,10 € pro SMS. Wie viel zahlst du bei 50 SMS?", "task_type": "free_text", "options": None, "correct_answer": "20", "explanation": "15 + 50 × 0,10 = 15 + 5 = 20 €", "xp_reward": 10, "difficulty": "leicht"},
-    ])
-    
-    # ===== KLASSE 10 - Abschluss =====
-    tasks.extend([
-        # Quadratische Funktionen
-        {"grade": 10, "topic": "Quadratische Funktionen", "question": "f(x) = x² - 4. Was ist f(3)?", "task_type": "free_text", "options": None, "correct_answer": "5", "explanation": "f(3) = 3² - 4 = 9 - 4 = 5", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 10, "topic": "Quadratische Funktionen", "question": "Wo ist der Scheitelpunkt von f(x) = x²?", "task_type": "multiple_choice", "options": ["(0,0)", "(1,1)", "(0,1)", "(1,0)"], "correct_answer": "(0,0)", "explanation": "Bei f(x) = x² ist der Scheitelpunkt bei (0,0)", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 10, "topic": "Quadratische Funktionen", "question": "Bestimme die Nullstellen von f(x) = x² - 16", "task_type": "multiple_choice", "options": ["x = 4", "x = -4", "x = 4 und x = -4", "keine"], "correct_answer": "x = 4 und x = -4", "explanation": "x² = 16, also x = ±4", "xp_reward": 15, "difficulty": "mittel"},
+        trigger = await _profile_trigger(scope)
+        if trigger is None or _profiling["active"]:
+            await self.app(scope, receive, send)
+            return
         
-        # Trigonometrie Grundlagen
-        {"grade": 10, "topic": "Trigonometrie", "question": "In einem rechtwinkligen Dreieck: sin(α) = Gegenkathete / ?", "task_type": "multiple_choice", "options": ["Ankathete", "Hypotenuse", "Gegenkathete", "Keine"], "correct_answer": "Hypotenuse", "explanation": "sin(α) = Gegenkathete / Hypotenuse", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 10, "topic": "Trigonometrie", "question": "cos(60°) = ?", "task_type": "multiple_choice", "options": ["0", "0,5", "1", "√3/2"], "correct_answer": "0,5", "explanation": "cos(60°) = 0,5", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 10, "topic": "Trigonometrie", "question": "tan(45°) = ?", "task_type": "free_text", "options": None, "correct_answer": "1", "explanation": "tan(45°) = sin(45°)/cos(45°) = 1", "xp_reward": 10, "difficulty": "leicht"},
+        stats = _request_stats.get()
+        if stats is not None:
+            stats["commands"] = {}
+        status_code = 500
         
-        # Wahrscheinlichkeitsrechnung
-        {"grade": 10, "topic": "Wahrscheinlichkeit", "question": "Ein Würfel wird geworfen. Wie groß ist die Wahrscheinlichkeit für eine 6?", "task_type": "free_text", "options": None, "correct_answer": "1/6", "explanation": "1 günstig von 6 möglich = 1/6", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 10, "topic": "Wahrscheinlichkeit", "question": "In einer Urne sind 3 rote und 7 blaue Kugeln. Wie groß ist P(rot)?", "task_type": "free_text", "options": None, "correct_answer": "0,3", "explanation": "P(rot) = 3/10 = 0,3 oder 30%", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 10, "topic": "Wahrscheinlichkeit", "question": "Eine Münze wird 2 Mal geworfen. Wie groß ist P(2× Kopf)?", "task_type": "free_text", "options": None, "correct_answer": "0,25", "explanation": "P = 0,5 × 0,5 = 0,25 oder 25%", "xp_reward": 15, "difficulty": "mittel"},
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
         
-        # Körperberechnungen
-        {"grade": 10, "topic": "Körper", "question": "Berechne das Volumen eines Quaders mit a=4cm, b=3cm, c=5cm.", "task_type": "free_text", "options": None, "correct_answer": "60", "explanation": "V = a × b × c = 4 × 3 × 5 = 60 cm³", "xp_reward": 10, "difficulty": "leicht"},
-        {"grade": 10, "topic": "Körper", "question": "Berechne das Volumen eines Zylinders mit r=3cm und h=10cm. (π≈3,14)", "task_type": "free_text", "options": None, "correct_answer": "282,6", "explanation": "V = π × r² × h = 3,14 × 9 × 10 = 282,6 cm³", "xp_reward": 15, "difficulty": "mittel"},
-    ])
-    
-    return tasks
+        _profiling["active"] = True
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - start
+            _profiling["active"] = False
+            route = scope.get("route")
+            store_profile({
+                "id": str(uuid.uuid4()),
+                "route": f"{scope['method']} {route.path if route is not None else 'unmatched'}",
+                "path": scope["path"],
+                "status_code": status_code,
+                "trigger": trigger,
+                "duration_ms": round(duration * 1000, 3),
+                "db": {
+                    "queries": stats["queries"],
+                    "time_ms": round(stats["db_time"] * 1000, 3),
+                    "documents": stats["documents"],
+                    "commands": stats["commands"]
+                } if stats is not None else None,
+                **summarize_profile(profiler),
+                "created_at": datetime.now(timezone.utc).isoformat()
+            })
+
+@api_router.get("/admin/profiles")
+async def get_profiles(route: Optional[str] = None, limit: int = 20, admin: dict = Depends(get_admin_user)):
+    """Admin: most recent request profiles, optionally for one route key"""
+    query = {"route": route} if route else {}
+    profiles = await db.request_profiles.find(query, {"_id": 0}).sort("$natural", -1).to_list(min(max(limit, 1), 100))
+    return {
+        "settings": {"sample_rate": _profiling["sample_rate"], "routes": _profiling["routes"]},
+        "profiles": profiles
+    }
+
+@api_router.put("/admin/profiling")
+async def update_profiling(settings: ProfilingSettings, admin: dict = Depends(get_admin_user)):
+    """Admin: set the sampling rate and route filter for this server process"""
+    unknown = set(settings.routes) - set(QUERY_BUDGETS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unbekannte Routen: {', '.join(sorted(unknown))}")
+    _profiling["sample_rate"] = settings.sample_rate
+    _profiling["routes"] = settings.routes
+    return {"sample_rate": _profiling["sample_rate"], "routes": _profiling["routes"]}
+
+# ================== HEALTH CHECKS ==================
+
+# Load balancers poll these often: the readiness probe result is cached for a
+# second and concurrent polls share a single probe.
+HEALTH_CACHE_SECONDS = 1.0
+HEALTH_PING_TIMEOUT = 0.5
+_health_cache: Dict[str, Any] = {"at": 0.0, "result": None}
+_health_lock = asyncio.Lock()
+
+async def probe_mongo() -> dict:
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(db.command("ping"), HEALTH_PING_TIMEOUT)
+    except Exception as e:
+        return {"status": "down", "error": str(e) or type(e).__name__}
+    return {"status": "up", "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+async def probe_readiness() -> dict:
+    mongo = await probe_mongo()
+    circuit = llm_breaker.state
+    checks = {
+        "mongo": mongo,
+        "mongo_pool": {
+            "checked_out": pool_usage.checked_out,
+            "max_size": MONGO_MAX_POOL_SIZE,
+            "saturation": round(pool_usage.checked_out / MONGO_MAX_POOL_SIZE, 3),
+            "check_out_failures": pool_usage.check_out_failures
+        },
+        "event_loop": loop_lag_snapshot(),
+        "write_behind": {"pending": len(_background_writes)},
+        "llm": {"configured": bool(LLM_KEY), "circuit": circuit}
+    }
+    if mongo["status"] != "up":
+        status_text = "unavailable"
+    elif circuit != "closed" or not LLM_KEY or checks["mongo_pool"]["saturation"] >= 0.9:
+        status_text = "degraded"
+    else:
+        status_text = "ok"
+    return {"status": status_text, "checked_at": datetime.now(timezone.utc).isoformat(), "checks": checks}
+
+@api_router.get("/health/live")
+async def health_live():
+    """Liveness: the process is up and the event loop answers"""
+    return {"status": "ok"}
+
+@api_router.get("/health/ready")
+async def health_ready():
+    """Readiness: MongoDB reachable; pool, loop lag, write-behind queue and LLM circuit reported"""
+    async with _health_lock:
+        if time.monotonic() - _health_cache["at"] >= HEALTH_CACHE_SECONDS:
+            _health_cache["result"] = await probe_readiness()
+            _health_cache["at"] = time.monotonic()
+        result = _health_cache["result"]
+    return JSONResponse(result, status_code=503 if result["status"] == "unavailable" else 200)
 
 # ================== ROOT ROUTE ==================
 
@@ -1801,6 +4047,9 @@ async def root():
 # Include router
 app.include_router(api_router)
 
+app.add_middleware(RequestProfilerMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -1809,6 +4058,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def create_indexes():
+    await dedupe_progress_documents()
+    await apply_indexes()
+    await backfill_fingerprints()
+    await backfill_task_versions()
+    await ensure_profile_collection()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
@@ -8,7 +8,8 @@ export const api = {
   getTopics: (grade) => axios.get(`${API}/tasks/topics/${grade}`),
   getTasks: (grade, topic) => axios.get(`${API}/tasks/${grade}/${encodeURIComponent(topic)}`),
   getTask: (taskId) => axios.get(`${API}/tasks/single/${taskId}`),
-  submitAnswer: (taskId, answer) => axios.post(`${API}/tasks/submit`, { task_id: taskId, answer }),
+  submitAnswer: (taskId, answer, taskVersion = null) =>
+    axios.post(`${API}/tasks/submit`, { task_id: taskId, answer, task_version: taskVersion }),
 
   // Progress
   getProgressOverview: () => axios.get(`${API}/progress/overview`),
@@ -16,13 +17,13 @@ export const api = {
 
   // Daily Challenge
   getDailyChallenge: () => axios.get(`${API}/challenges/daily`),
-  submitChallengeAnswer: (challengeId, taskId, answer) => 
-    axios.post(`${API}/challenges/submit/${challengeId}`, { task_id: taskId, answer }),
+  submitChallengeAnswer: (challengeId, taskId, answer, taskVersion = null) => 
+    axios.post(`${API}/challenges/submit/${challengeId}`, { task_id: taskId, answer, task_version: taskVersion }),
 
   // Weekly Challenge
   getWeeklyChallenge: () => axios.get(`${API}/challenges/weekly`),
-  submitWeeklyChallengeAnswer: (taskId, answer) => 
-    axios.post(`${API}/challenges/weekly/submit`, { task_id: taskId, answer }),
+  submitWeeklyChallengeAnswer: (taskId, answer, taskVersion = null) => 
+    axios.post(`${API}/challenges/weekly/submit`, { task_id: taskId, answer, task_version: taskVersion }),
 
   // Recommendations
   getRecommendations: () => axios.get(`${API}/recommendations`),
@@ -30,8 +31,10 @@ export const api = {
   getAdaptiveRecommendations: () => axios.get(`${API}/recommendations/adaptive`),
 
   // Practice Mode (No XP)
-  submitPracticeAnswer: (taskId, answer) => 
-    axios.post(`${API}/practice/submit`, { task_id: taskId, answer }),
+  submitPracticeAnswer: (taskId, answer, seed = null, taskVersion = null) => 
+    axios.post(`${API}/practice/submit`, { task_id: taskId, answer, seed, task_version: taskVersion }),
+  getTaskInstances: (taskId, seed, count) =>
+    axios.get(`${API}/tasks/single/${taskId}/instances`, { params: { seed, count } }),
 
   // Test Readiness
   getTestReadiness: (topic) => axios.get(`${API}/readiness/${encodeURIComponent(topic)}`),
@@ -41,8 +44,8 @@ export const api = {
   checkBadges: () => axios.get(`${API}/badges/check`),
 
   // AI Explain Mistake
-  explainMistake: (taskId, studentAnswer) => 
-    axios.post(`${API}/ai/explain-mistake`, { task_id: taskId, student_answer: studentAnswer }),
+  explainMistake: (taskId, studentAnswer, taskVersion = null) => 
+    axios.post(`${API}/ai/explain-mistake`, { task_id: taskId, student_answer: studentAnswer, task_version: taskVersion }),
 
   // Feature Flags
   getFeatureFlags: () => axios.get(`${API}/features`),
@@ -69,6 +72,20 @@ export const api = {
     if (params.toString()) url += `?${params.toString()}`;
     return axios.get(url);
   },
+  getTaskPage: (filters, cursor) => {
+    const params = new URLSearchParams();
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value && value !== 'all') params.append(key, value);
+    });
+    if (cursor) params.append('cursor', cursor);
+    return axios.get(`${API}/admin/tasks/page?${params.toString()}`);
+  },
+  searchTasks: (q, grade, page = 1) => {
+    const params = new URLSearchParams({ q, page });
+    if (grade) params.append('grade', grade);
+    return axios.get(`${API}/admin/tasks/search?${params.toString()}`);
+  },
+  getDuplicateClusters: () => axios.get(`${API}/admin/tasks/duplicates`),
   createTask: (task) => axios.post(`${API}/admin/tasks`, task),
   updateTask: (taskId, task) => axios.put(`${API}/admin/tasks/${taskId}`, task),
   deleteTask: (taskId) => axios.delete(`${API}/admin/tasks/${taskId}`),
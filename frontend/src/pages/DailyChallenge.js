@@ -59,7 +59,7 @@ export default function DailyChallenge() {
 
     setSubmitting(true);
     try {
-      const response = await api.submitChallengeAnswer(challenge.id, currentTask.id, submittedAnswer);
+      const response = await api.submitChallengeAnswer(challenge.id, currentTask.id, submittedAnswer, currentTask.version);
       setResult(response.data);
       setSubmitted(true);
       setCompletedTaskIds(prev => [...prev, currentTask.id]);
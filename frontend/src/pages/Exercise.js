@@ -63,7 +63,7 @@ export default function Exercise() {
 
     setSubmitting(true);
     try {
-      const response = await api.submitAnswer(currentTask.id, submittedAnswer);
+      const response = await api.submitAnswer(currentTask.id, submittedAnswer, currentTask.version);
       setResult(response.data);
       setSubmitted(true);
       setCompletedTasks(prev => prev + 1);
@@ -15,6 +15,9 @@ import {
   Lightbulb, BookOpen, RefreshCw, Brain
 } from 'lucide-react';
 
+// Template tasks are expanded into this many generated variants per session
+const INSTANCES_PER_TEMPLATE = 20;
+
 export default function PracticeMode() {
   const { grade, topic } = useParams();
   const { user } = useAuth();
@@ -37,8 +40,14 @@ export default function PracticeMode() {
   const loadTasks = async () => {
     try {
       const response = await api.getTasks(grade, decodedTopic);
+      const sessionSeed = Math.floor(Math.random() * 1e9);
+      const expanded = await Promise.all(response.data.map(async (task) => {
+        if (!task.is_template) return [task];
+        const instances = await api.getTaskInstances(task.id, sessionSeed, INSTANCES_PER_TEMPLATE);
+        return instances.data;
+      }));
       // Shuffle tasks for practice
-      const shuffled = [...response.data].sort(() => Math.random() - 0.5);
+      const shuffled = expanded.flat().sort(() => Math.random() - 0.5);
       setTasks(shuffled);
     } catch (error) {
       toast.error('Fehler beim Laden der Aufgaben');
@@ -54,7 +63,7 @@ export default function PracticeMode() {
     if (!answer.trim()) return;
 
     try {
-      const response = await api.submitPracticeAnswer(currentTask.id, answer);
+      const response = await api.submitPracticeAnswer(currentTask.id, answer, currentTask.seed ?? null, currentTask.version);
       setResult(response.data);
       
       setPracticeStats(prev => ({
@@ -77,7 +86,7 @@ export default function PracticeMode() {
     
     setLoadingExplanation(true);
     try {
-      const response = await api.explainMistake(currentTask.id, answer);
+      const response = await api.explainMistake(currentTask.id, answer, currentTask.version);
       setExplanation(response.data);
     } catch (error) {
       toast.error('KI-Erklärung nicht verfügbar');
@@ -13,7 +13,7 @@ import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from '.
 import { toast } from 'sonner';
 import { 
   Plus, Pencil, Trash2, Upload, ArrowLeft, Search, 
-  Filter, BarChart3, ClipboardList, UserCircle, LogOut
+  Filter, BarChart3, ClipboardList, UserCircle, LogOut, Copy
 } from 'lucide-react';
 
 export default function TaskManagement() {
@@ -22,11 +22,21 @@ export default function TaskManagement() {
   const [loading, setLoading] = useState(true);
   const [filterGrade, setFilterGrade] = useState('');
   const [filterTopic, setFilterTopic] = useState('');
+  const [filterDifficulty, setFilterDifficulty] = useState('');
+  const [filterType, setFilterType] = useState('');
   const [searchQuery, setSearchQuery] = useState('');
+  const [fullTextSearch, setFullTextSearch] = useState(false);
+  const [searchPage, setSearchPage] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [total, setTotal] = useState(0);
+  const [facets, setFacets] = useState({ grade: [], topic: [], difficulty: [] });
+  const [loadingMore, setLoadingMore] = useState(false);
   const [topics, setTopics] = useState([]);
   const [isDialogOpen, setIsDialogOpen] = useState(false);
   const [isDeleteDialogOpen, setIsDeleteDialogOpen] = useState(false);
   const [selectedTask, setSelectedTask] = useState(null);
+  const [isDuplicatesDialogOpen, setIsDuplicatesDialogOpen] = useState(false);
+  const [duplicates, setDuplicates] = useState(null);
   const [formData, setFormData] = useState({
     grade: '',
     topic: '',
@@ -36,12 +46,14 @@ export default function TaskManagement() {
     correct_answer: '',
     explanation: '',
     xp_reward: 10,
-    difficulty: 'mittel'
+    difficulty: 'mittel',
+    template: ''
   });
 
   useEffect(() => {
-    loadTasks();
-  }, [filterGrade, filterTopic]);
+    const timer = setTimeout(() => loadTasks(), searchQuery ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [filterGrade, filterTopic, filterDifficulty, filterType, searchQuery, fullTextSearch]);
 
   useEffect(() => {
     if (filterGrade) {
@@ -49,13 +61,29 @@ export default function TaskManagement() {
     }
   }, [filterGrade]);
 
+  const taskFilters = () => ({
+    grade: filterGrade,
+    topic: filterTopic,
+    difficulty: filterDifficulty,
+    task_type: filterType,
+    q: searchQuery.trim()
+  });
+
+  const isFullTextSearch = () => fullTextSearch && searchQuery.trim();
+
+  const searchGrade = () => (filterGrade && filterGrade !== 'all' ? filterGrade : null);
+
   const loadTasks = async () => {
+    if (isFullTextSearch()) {
+      return loadSearchResults();
+    }
+    setSearchPage(null);
     try {
-      const response = await api.getAllTasks(
-        filterGrade || null,
-        filterTopic || null
-      );
-      setTasks(response.data);
+      const response = await api.getTaskPage(taskFilters());
+      setTasks(response.data.items);
+      setNextCursor(response.data.next_cursor);
+      setTotal(response.data.total);
+      setFacets(response.data.facets);
     } catch (error) {
       console.error('Error loading tasks:', error);
       toast.error('Fehler beim Laden der Aufgaben');
@@ -64,6 +92,61 @@ export default function TaskManagement() {
     }
   };
 
+  const loadSearchResults = async () => {
+    try {
+      const response = await api.searchTasks(searchQuery.trim(), searchGrade());
+      setTasks(response.data.items);
+      setTotal(response.data.total);
+      setSearchPage({ page: response.data.page, pages: response.data.pages });
+      setNextCursor(null);
+    } catch (error) {
+      console.error('Error searching tasks:', error);
+      toast.error(error.response?.data?.detail || 'Fehler bei der Suche');
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  const loadMoreTasks = async () => {
+    setLoadingMore(true);
+    try {
+      if (searchPage) {
+        const response = await api.searchTasks(searchQuery.trim(), searchGrade(), searchPage.page + 1);
+        setTasks(prev => [...prev, ...response.data.items]);
+        setSearchPage({ page: response.data.page, pages: response.data.pages });
+        return;
+      }
+      const response = await api.getTaskPage(taskFilters(), nextCursor);
+      setTasks(prev => [...prev, ...response.data.items]);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Error loading tasks:', error);
+      toast.error('Fehler beim Laden der Aufgaben');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const highlighted = (text, spans) => {
+    if (!spans?.length) return text;
+    const parts = [];
+    let last = 0;
+    spans.forEach(([start, end]) => {
+      parts.push(text.slice(last, start));
+      parts.push(<mark key={start} className="bg-emerald-100 text-inherit">{text.slice(start, end)}</mark>);
+      last = end;
+    });
+    parts.push(text.slice(last));
+    return parts;
+  };
+
+  const hasMore = searchPage ? searchPage.page < searchPage.pages : Boolean(nextCursor);
+
+  const facetCount = (field, value) => {
+    const facet = facets[field]?.find(f => String(f.value) === String(value));
+    return facet ? ` (${facet.count})` : '';
+  };
+
   const loadTopics = async (grade) => {
     try {
       const response = await api.getTopics(grade);
@@ -84,7 +167,8 @@ export default function TaskManagement() {
       correct_answer: '',
       explanation: '',
       xp_reward: 10,
-      difficulty: 'mittel'
+      difficulty: 'mittel',
+      template: ''
     });
     setIsDialogOpen(true);
   };
@@ -100,12 +184,25 @@ export default function TaskManagement() {
       correct_answer: task.correct_answer,
       explanation: task.explanation,
       xp_reward: task.xp_reward,
-      difficulty: task.difficulty
+      difficulty: task.difficulty,
+      template: task.template ? JSON.stringify(task.template, null, 2) : ''
     });
     loadTopics(task.grade);
     setIsDialogOpen(true);
   };
 
+  const loadDuplicates = async () => {
+    setDuplicates(null);
+    setIsDuplicatesDialogOpen(true);
+    try {
+      const response = await api.getDuplicateClusters();
+      setDuplicates(response.data);
+    } catch (error) {
+      toast.error('Fehler beim Laden der Duplikate');
+      setIsDuplicatesDialogOpen(false);
+    }
+  };
+
   const handleDelete = (task) => {
     setSelectedTask(task);
     setIsDeleteDialogOpen(true);
@@ -116,6 +213,7 @@ export default function TaskManagement() {
       await api.deleteTask(selectedTask.id);
       toast.success('Aufgabe gelöscht');
       loadTasks();
+      if (isDuplicatesDialogOpen) loadDuplicates();
     } catch (error) {
       toast.error('Fehler beim Löschen');
     } finally {
@@ -125,6 +223,16 @@ export default function TaskManagement() {
 
   const handleSubmit = async (e) => {
     e.preventDefault();
+
+    let template = null;
+    if (formData.template.trim()) {
+      try {
+        template = JSON.parse(formData.template);
+      } catch (error) {
+        toast.error('Vorlage ist kein gültiges JSON');
+        return;
+      }
+    }
     
     const taskData = {
       grade: parseInt(formData.grade),
@@ -137,21 +245,22 @@ export default function TaskManagement() {
       correct_answer: formData.correct_answer,
       explanation: formData.explanation,
       xp_reward: parseInt(formData.xp_reward),
-      difficulty: formData.difficulty
+      difficulty: formData.difficulty,
+      template
     };
 
     try {
-      if (selectedTask) {
-        await api.updateTask(selectedTask.id, taskData);
-        toast.success('Aufgabe aktualisiert');
-      } else {
-        await api.createTask(taskData);
-        toast.success('Aufgabe erstellt');
+      const response = selectedTask
+        ? await api.updateTask(selectedTask.id, taskData)
+        : await api.createTask(taskData);
+      toast.success(selectedTask ? 'Aufgabe aktualisiert' : 'Aufgabe erstellt');
+      if (response.data.near_duplicate_of) {
+        toast.warning('Eine sehr ähnliche Aufgabe existiert bereits');
       }
       setIsDialogOpen(false);
       loadTasks();
     } catch (error) {
-      toast.error('Fehler beim Speichern');
+      toast.error(error.response?.data?.detail || 'Fehler beim Speichern');
     }
   };
 
@@ -165,6 +274,12 @@ export default function TaskManagement() {
       if (response.data.errors?.length > 0) {
         toast.error(`${response.data.errors.length} Fehler beim Import`);
       }
+      if (response.data.duplicates > 0) {
+        toast.info(`${response.data.duplicates} doppelte Aufgaben übersprungen`);
+      }
+      if (response.data.near_duplicates > 0) {
+        toast.warning(`${response.data.near_duplicates} sehr ähnliche Aufgaben markiert`);
+      }
       loadTasks();
     } catch (error) {
       toast.error('Fehler beim CSV-Import');
@@ -172,11 +287,6 @@ export default function TaskManagement() {
     e.target.value = '';
   };
 
-  const filteredTasks = tasks.filter(task => 
-    task.question.toLowerCase().includes(searchQuery.toLowerCase()) ||
-    task.topic.toLowerCase().includes(searchQuery.toLowerCase())
-  );
-
   return (
     <div className="min-h-screen bg-slate-50">
       {/* Sidebar */}
@@ -248,6 +358,10 @@ export default function TaskManagement() {
                   </span>
                 </Button>
               </label>
+              <Button variant="outline" onClick={loadDuplicates} data-testid="duplicates-btn">
+                <Copy className="w-4 h-4 mr-2" />
+                Duplikate
+              </Button>
               <Button onClick={handleCreate} className="bg-emerald-500 hover:bg-emerald-600" data-testid="create-task-btn">
                 <Plus className="w-4 h-4 mr-2" />
                 Neue Aufgabe
@@ -263,13 +377,22 @@ export default function TaskManagement() {
                   <div className="relative">
                     <Search className="absolute left-3 top-1/2 -translate-y-1/2 w-5 h-5 text-slate-400" />
                     <Input
-                      placeholder="Suchen..."
+                      placeholder={fullTextSearch ? 'Frage, Thema oder Erklärung enthält...' : 'Frage beginnt mit...'}
                       value={searchQuery}
                       onChange={(e) => setSearchQuery(e.target.value)}
                       className="pl-10"
                       data-testid="search-input"
                     />
                   </div>
+                  <label className="flex items-center gap-2 mt-2 text-sm text-slate-600">
+                    <input
+                      type="checkbox"
+                      checked={fullTextSearch}
+                      onChange={(e) => setFullTextSearch(e.target.checked)}
+                      data-testid="fulltext-toggle"
+                    />
+                    Volltextsuche
+                  </label>
                 </div>
                 <Select value={filterGrade} onValueChange={(v) => { setFilterGrade(v); setFilterTopic(''); }}>
                   <SelectTrigger className="w-full sm:w-40" data-testid="filter-grade">
@@ -278,7 +401,7 @@ export default function TaskManagement() {
                   <SelectContent>
                     <SelectItem value="all">Alle Klassen</SelectItem>
                     {[5, 6, 7, 8, 9, 10].map(g => (
-                      <SelectItem key={g} value={g.toString()}>Klasse {g}</SelectItem>
+                      <SelectItem key={g} value={g.toString()}>Klasse {g}{facetCount('grade', g)}</SelectItem>
                     ))}
                   </SelectContent>
                 </Select>
@@ -290,11 +413,32 @@ export default function TaskManagement() {
                     <SelectContent>
                       <SelectItem value="all">Alle Themen</SelectItem>
                       {topics.map(t => (
-                        <SelectItem key={t} value={t}>{t}</SelectItem>
+                        <SelectItem key={t} value={t}>{t}{facetCount('topic', t)}</SelectItem>
                       ))}
                     </SelectContent>
                   </Select>
                 )}
+                <Select value={filterDifficulty} onValueChange={setFilterDifficulty}>
+                  <SelectTrigger className="w-full sm:w-40" data-testid="filter-difficulty">
+                    <SelectValue placeholder="Alle Stufen" />
+                  </SelectTrigger>
+                  <SelectContent>
+                    <SelectItem value="all">Alle Stufen</SelectItem>
+                    {['leicht', 'mittel', 'schwer'].map(d => (
+                      <SelectItem key={d} value={d}>{d.charAt(0).toUpperCase() + d.slice(1)}{facetCount('difficulty', d)}</SelectItem>
+                    ))}
+                  </SelectContent>
+                </Select>
+                <Select value={filterType} onValueChange={setFilterType}>
+                  <SelectTrigger className="w-full sm:w-40" data-testid="filter-type">
+                    <SelectValue placeholder="Alle Typen" />
+                  </SelectTrigger>
+                  <SelectContent>
+                    <SelectItem value="all">Alle Typen</SelectItem>
+                    <SelectItem value="free_text">Freitext</SelectItem>
+                    <SelectItem value="multiple_choice">Multiple Choice</SelectItem>
+                  </SelectContent>
+                </Select>
               </div>
             </CardContent>
           </Card>
@@ -316,11 +460,15 @@ export default function TaskManagement() {
                     </TableRow>
                   </TableHeader>
                   <TableBody>
-                    {filteredTasks.map((task) => (
+                    {tasks.map((task) => (
                       <TableRow key={task.id}>
                         <TableCell>{task.grade}</TableCell>
                         <TableCell className="max-w-[150px] truncate">{task.topic}</TableCell>
-                        <TableCell className="max-w-[300px] truncate">{task.question}</TableCell>
+                        <TableCell className="max-w-[300px] truncate">
+                          {highlighted(task.question, task.highlights?.question)}
+                          {task.is_template && <span className="ml-2 text-xs text-emerald-600">Vorlage</span>}
+                          {task.version > 1 && <span className="ml-2 text-xs text-slate-400">v{task.version}</span>}
+                        </TableCell>
                         <TableCell>
                           <span className={`px-2 py-1 rounded-full text-xs font-medium ${
                             task.task_type === 'multiple_choice' 
@@ -352,7 +500,7 @@ export default function TaskManagement() {
                   </TableBody>
                 </Table>
               </div>
-              {filteredTasks.length === 0 && (
+              {tasks.length === 0 && (
                 <div className="text-center py-12 text-slate-500">
                   Keine Aufgaben gefunden
                 </div>
@@ -360,9 +508,16 @@ export default function TaskManagement() {
             </CardContent>
           </Card>
 
-          <p className="text-sm text-slate-500 mt-4">
-            {filteredTasks.length} Aufgaben angezeigt
-          </p>
+          <div className="flex items-center justify-between mt-4">
+            <p className="text-sm text-slate-500">
+              {tasks.length} von {total} Aufgaben angezeigt
+            </p>
+            {hasMore && (
+              <Button variant="outline" onClick={loadMoreTasks} disabled={loadingMore} data-testid="load-more-tasks">
+                {loadingMore ? 'Lädt...' : 'Mehr laden'}
+              </Button>
+            )}
+          </div>
         </div>
       </main>
 
@@ -495,6 +650,23 @@ export default function TaskManagement() {
               />
             </div>
 
+            <div>
+              <Label>Vorlage (JSON, optional)</Label>
+              <Textarea
+                value={formData.template}
+                onChange={(e) => setFormData({...formData, template: e.target.value})}
+                placeholder='{"question": "Was ist {a} mal 2?", "params": {"a": {"min": 1, "max": 9}}, "answer": "a * 2"}'
+                rows={formData.template ? 8 : 2}
+                className="font-mono text-sm"
+                data-testid="form-template"
+              />
+              {formData.template && (
+                <p className="text-xs text-slate-500 mt-1">
+                  Frage, Antwort und Erklärung werden aus der Vorlage erzeugt.
+                </p>
+              )}
+            </div>
+
             <DialogFooter>
               <Button type="button" variant="outline" onClick={() => setIsDialogOpen(false)}>
                 Abbrechen
@@ -507,6 +679,41 @@ export default function TaskManagement() {
         </DialogContent>
       </Dialog>
 
+      {/* Near-Duplicates Dialog */}
+      <Dialog open={isDuplicatesDialogOpen} onOpenChange={setIsDuplicatesDialogOpen}>
+        <DialogContent className="max-w-3xl max-h-[90vh] overflow-y-auto">
+          <DialogHeader>
+            <DialogTitle style={{ fontFamily: 'Manrope' }}>Sehr ähnliche Aufgaben</DialogTitle>
+          </DialogHeader>
+          {!duplicates ? (
+            <p className="text-slate-500">Lädt...</p>
+          ) : duplicates.clusters.length === 0 ? (
+            <p className="text-slate-500">Keine sehr ähnlichen Aufgaben gefunden</p>
+          ) : (
+            <div className="space-y-4" data-testid="duplicate-clusters">
+              <p className="text-sm text-slate-500">
+                {duplicates.clusters.length} Gruppen, {duplicates.duplicate_tasks} überzählige Aufgaben
+              </p>
+              {duplicates.clusters.map((cluster) => (
+                <div key={cluster.tasks[0].id} className="border rounded-lg divide-y">
+                  {cluster.tasks.map((task) => (
+                    <div key={task.id} className="flex items-center justify-between gap-4 p-3">
+                      <div className="min-w-0">
+                        <p className="truncate text-slate-900">{task.question}</p>
+                        <p className="text-xs text-slate-500">Klasse {task.grade} · {task.topic} · Antwort: {task.correct_answer}</p>
+                      </div>
+                      <Button size="sm" variant="ghost" onClick={() => handleDelete(task)} className="text-red-500 hover:text-red-600" data-testid={`delete-duplicate-${task.id}`}>
+                        <Trash2 className="w-4 h-4" />
+                      </Button>
+                    </div>
+                  ))}
+                </div>
+              ))}
+            </div>
+          )}
+        </DialogContent>
+      </Dialog>
+
       {/* Delete Confirmation Dialog */}
       <Dialog open={isDeleteDialogOpen} onOpenChange={setIsDeleteDialogOpen}>
         <DialogContent>
@@ -53,7 +53,7 @@ export default function WeeklyChallenge() {
     if (!answer.trim() || !currentTask) return;
 
     try {
-      const response = await api.submitWeeklyChallengeAnswer(currentTask.id, answer);
+      const response = await api.submitWeeklyChallengeAnswer(currentTask.id, answer, currentTask.version);
       setResult(response.data);
 
       if (response.data.is_correct) {
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the CPU-side hot paths of backend/server.py.
+
+Each benchmark is timed with timeit (auto-ranged loop count, several
+repeats); the per-call time of the fastest repeat is the headline number.
+Results are written as JSON so runs on different commits can be compared:
+
+    python tests/benchmark.py                      # writes test_reports/benchmarks/<commit>.json
+    python tests/benchmark.py --compare test_reports/benchmarks/abc1234.json
+
+With --compare the exit code is 1 if any benchmark got slower than
+--threshold (default 15%).
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "mathevilla_benchmark")
+
+import jwt  # noqa: E402
+
+import server  # noqa: E402
+
+REPORT_DIR = Path(__file__).parent.parent / "test_reports" / "benchmarks"
+
+
+def sample_tasks(count):
+    # Prepared like the seed does, so template tasks carry their seed-0 text
+    tasks = [task for name in ("core", "additional") for task in server.prepare_pack_tasks(server.load_content_pack(name))][:count]
+    for task in tasks:
+        task.update({"id": str(uuid.uuid4()), "created_at": datetime.now(timezone.utc).isoformat()})
+    return tasks
+
+
+def build_benchmarks():
+    """name -> zero-argument callable"""
+    password_hash = server.hash_password("benchmark123")
+    token = server.create_access_token({"sub": str(uuid.uuid4())})
+    tasks = sample_tasks(100)
+    template_task = next(task for task in server.prepare_pack_tasks(server.load_content_pack("core")) if task["is_template"])
+    template_task["id"] = str(uuid.uuid4())
+    canonical = server.canonical_answer("3/4")
+    graded_task = {"id": str(uuid.uuid4()), "correct_answer": "3x + 12", "answer_canonical": server.canonical_answer("3x + 12")}
+    topic_counts = {"Brüche einführen": 12, "Flächen berechnen": 25, "Prozentrechnung": 16, "Gleichungen": 3, "Dreiecke": 40}
+
+    return {
+        "hash_password": lambda: server.hash_password("benchmark123"),
+        "verify_password": lambda: server.verify_password("benchmark123", password_hash),
+        "create_access_token": lambda: server.create_access_token({"sub": "user-id"}),
+        "decode_access_token": lambda: jwt.decode(token, server.JWT_SECRET, algorithms=[server.JWT_ALGORITHM]),
+        "is_answer_correct": lambda: server.is_answer_correct("  3/4 ", "3/4"),
+        "is_answer_correct_precomputed": lambda: server.is_answer_correct("0,75", "3/4", canonical),
+        "canonical_expression": lambda: server.canonical_expression("3(x + 4) - 2x²"),
+        "grade_answer_memoised": lambda: server.grade_answer(graded_task, "12 + 3x"),
+        "milestone_badges": lambda: server.milestone_badges(120, ["Anfänger"]),
+        "earned_educational_badges": lambda: server.earned_educational_badges(topic_counts),
+        "task_fingerprints": lambda: server.task_fingerprints(tasks[0]),
+        "template_instances_500": lambda: server.generate_instances(template_task, list(range(500))),
+        "task_response_100": lambda: [server.TaskResponse(**task) for task in tasks],
+    }
+
+
+def run_benchmark(func, repeat):
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    timings = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    timings.sort()
+    return {
+        "loops": number,
+        "best_us": round(timings[0] * 1e6, 3),
+        "median_us": round(timings[len(timings) // 2] * 1e6, 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, baseline, threshold):
+    """Print per-benchmark change against a baseline; returns the regressions"""
+    regressions = []
+    print(f"\n{'benchmark':<28} {'baseline us':>12} {'now us':>12} {'change':>8}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<28} {'-':>12} {result['best_us']:>12} {'new':>8}")
+            continue
+        change = result["best_us"] / before["best_us"] - 1
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{name:<28} {before['best_us']:>12} {result['best_us']:>12} {change:>+8.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for backend hot paths")
+    parser.add_argument("--only", nargs="+", help="run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="JSON file to write (default: test_reports/benchmarks/<commit>.json)")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="relative slowdown counted as regression")
+    args = parser.parse_args()
+
+    benchmarks = build_benchmarks()
+    names = args.only or list(benchmarks)
+    results = {}
+    print(f"{'benchmark':<28} {'best us':>12} {'median us':>12} {'loops':>8}")
+    for name in names:
+        results[name] = run_benchmark(benchmarks[name], args.repeat)
+        print(f"{name:<28} {results[name]['best_us']:>12} {results[name]['median_us']:>12} {results[name]['loops']:>8}")
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    output = Path(args.output) if args.output else REPORT_DIR / f"{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())["results"]
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+# load_test.py is a command-line tool, not a test module, but its name
+# matches pytest's *_test.py pattern
+collect_ignore = ["load_test.py"]
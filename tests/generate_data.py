@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for scale testing.
+
+Creates schools with classes, one teacher (admin) per school and students
+with answer histories, daily and weekly challenge documents and class
+assignments, bulk-loaded with insert_many. On an empty database the same --seed and
+--until always produce the same documents, ids included. A catalog that is
+already there is reused as is: the generated history is then the same up to
+the catalog's task ids, which are random when the tasks were seeded through
+the API.
+
+    python tests/generate_data.py --schools 20 --classes-per-school 12 --students-per-class 28 --reset
+
+Answers follow a simple item-response model: every student has an ability,
+every topic a difficulty and every task a difficulty level, and abilities
+grow a little over the simulated period. MONGO_URL and DB_NAME (default
+mathevilla_scale_test) select the database; it is only dropped with --reset.
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "mathevilla_scale_test")
+
+from pymongo import MongoClient  # noqa: E402
+
+import server  # noqa: E402
+
+STUDENT_PASSWORD = "synthetic123"
+TEACHER_PASSWORD = "teacher123"
+BATCH_SIZE = 10_000
+DIFFICULTY_OFFSET = {"leicht": -0.8, "mittel": 0.0, "schwer": 0.8}
+CLASS_LETTERS = "abcdefgh"
+FIRST_NAMES = ["Emma", "Ben", "Mia", "Paul", "Hannah", "Leon", "Sofia", "Finn", "Lina", "Elias",
+               "Emilia", "Noah", "Marie", "Jonas", "Lea", "Luis", "Clara", "Felix", "Ella", "Anton"]
+LAST_NAMES = ["Müller", "Schmidt", "Schneider", "Fischer", "Weber", "Meyer", "Wagner", "Becker",
+              "Schulz", "Hoffmann", "Koch", "Richter", "Klein", "Wolf", "Yılmaz", "Kaya"]
+
+
+class BulkWriter:
+    """Batches documents per collection and inserts them on worker threads"""
+
+    def __init__(self, sync_db, workers):
+        self.db = sync_db
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.buffers = defaultdict(list)
+        self.futures = []
+        self.counts = defaultdict(int)
+
+    def add(self, collection, doc):
+        buffer = self.buffers[collection]
+        buffer.append(doc)
+        if len(buffer) >= BATCH_SIZE:
+            self._flush(collection)
+
+    def _flush(self, collection):
+        batch = self.buffers.pop(collection, [])
+        if batch:
+            self.counts[collection] += len(batch)
+            self.futures.append(self.pool.submit(self.db[collection].insert_many, batch, ordered=False))
+
+    def close(self):
+        for collection in list(self.buffers):
+            self._flush(collection)
+        for future in self.futures:
+            future.result()
+        self.pool.shutdown()
+
+
+def make_uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def ensure_tasks(sync_db, rng, now):
+    """Use the existing catalog, or insert the tasks of all content packs"""
+    # Ordered by content, not id, so a reused catalog is drawn from in the same order
+    tasks = list(sync_db.tasks.find({}, {"_id": 0}).sort([("grade", 1), ("topic", 1), ("question", 1)]))
+    if tasks:
+        return tasks
+    # Prepared the way the server applies packs: template tasks get their
+    # seed-0 instance, every task its fingerprints
+    tasks = [task for name in server.CONTENT_PACKS for task in server.prepare_pack_tasks(server.load_content_pack(name))]
+    for task in tasks:
+        task.update({"id": make_uuid(rng), "created_at": now.isoformat(), "created_by": "system", "version": 1})
+    sync_db.task_versions.insert_many([dict(task) for task in tasks])
+    sync_db.tasks.insert_many([dict(task) for task in tasks])
+    return tasks
+
+
+def ensure_weekly_template(sync_db, grade, week_id, grade_tasks, now):
+    """The shared weekly challenge of a grade, created the way the server does"""
+    medium = sorted(t["id"] for t in grade_tasks if t["difficulty"] == "mittel")
+    if len(medium) < server.WEEKLY_CHALLENGE_SIZE:
+        medium += [t for t in sorted(t["id"] for t in grade_tasks) if t not in medium][:10]
+    seed = int.from_bytes(server.hashlib.sha256(f"{grade}:{week_id}".encode()).digest()[:8], "big")
+    sync_db.weekly_templates.update_one(
+        {"grade": grade, "week_id": week_id},
+        {"$setOnInsert": {
+            "id": str(uuid.uuid5(server.WEEKLY_TEMPLATE_NAMESPACE, f"{grade}:{week_id}")),
+            "task_ids": random.Random(seed).sample(medium, min(server.WEEKLY_CHALLENGE_SIZE, len(medium))),
+            "bonus_xp": server.WEEKLY_BONUS_XP,
+            "created_at": now.isoformat()
+        }},
+        upsert=True
+    )
+    return sync_db.weekly_templates.find_one({"grade": grade, "week_id": week_id}, {"_id": 0})
+
+
+def generate(sync_db, schools=5, classes_per_school=6, students_per_class=25, answers_per_student=200,
+             days=120, seed=42, workers=4, until=None):
+    """Generate the dataset; returns document counts per collection.
+
+    History ends at midnight (UTC) of `until` (YYYY-MM-DD, default today), so
+    the same seed and `until` always give the same documents.
+    """
+    rng = random.Random(seed)
+    end_day = until or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    now = datetime.strptime(end_day, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    tasks = ensure_tasks(sync_db, rng, now)
+
+    tasks_by_grade = defaultdict(list)
+    for task in tasks:
+        tasks_by_grade[task["grade"]].append(task)
+    grades = sorted(tasks_by_grade)
+    topic_difficulty = {topic: rng.gauss(0, 0.6) for topic in sorted({t["topic"] for t in tasks})}
+
+    week_id = (now - timedelta(days=now.weekday())).strftime("%Y-W%W")
+    weekly_templates = {grade: ensure_weekly_template(sync_db, grade, week_id, tasks_by_grade[grade], now) for grade in grades}
+
+    student_hash = server.hash_password(STUDENT_PASSWORD)
+    teacher_hash = server.hash_password(TEACHER_PASSWORD)
+    writer = BulkWriter(sync_db, workers)
+    start = time.perf_counter()
+
+    for school_no in range(schools):
+        school = f"Schule {school_no + 1}"
+        teacher_id = make_uuid(rng)
+        writer.add("users", {
+            "id": teacher_id,
+            "email": f"lehrer{school_no + 1}@mathevilla.de",
+            "password_hash": teacher_hash,
+            "name": f"Lehrkraft {school_no + 1}",
+            "role": "admin",
+            "grade": None,
+            "xp": 0, "level": 1, "badges": [],
+            "school": school,
+            "synthetic": True,
+            "created_at": (now - timedelta(days=days + 30)).isoformat()
+        })
+
+        for class_no in range(classes_per_school):
+            grade = grades[class_no % len(grades)]
+            class_name = f"{grade}{CLASS_LETTERS[class_no // len(grades) % len(CLASS_LETTERS)]}"
+            grade_tasks = tasks_by_grade[grade]
+            student_ids = []
+
+            for student_no in range(students_per_class):
+                student_id = make_uuid(rng)
+                student_ids.append(student_id)
+                ability = rng.gauss(0, 1)
+                growth = rng.uniform(0, 0.8)  # ability gained over the whole period
+                xp = 0
+                correct_total = 0
+
+                for _ in range(answers_per_student):
+                    task = rng.choice(grade_tasks)
+                    age = rng.random()  # 0 = now, 1 = start of the period
+                    skill = ability + growth * (1 - age) - topic_difficulty[task["topic"]] - DIFFICULTY_OFFSET.get(task["difficulty"], 0)
+                    is_correct = rng.random() < 1 / (1 + math.exp(-skill))
+                    result = {
+                        "id": make_uuid(rng),
+                        "user_id": student_id,
+                        "task_id": task["id"],
+                        "task_version": task.get("version", 1),
+                        "grade": grade,
+                        "topic": task["topic"],
+                        "answer": task["correct_answer"] if is_correct else "0",
+                        "is_correct": is_correct,
+                        "created_at": (now - timedelta(seconds=int(age * days * 86400))).isoformat()
+                    }
+                    writer.add("results", result)
+                    writer.add("answers", dict(result))
+                    if is_correct:
+                        xp += task["xp_reward"]
+                        correct_total += 1
+
+                for day_offset in range(min(days, 14)):
+                    if rng.random() < 0.5:
+                        continue
+                    day = (now - timedelta(days=day_offset)).strftime("%Y-%m-%d")
+                    task_ids = server.pick_daily_task_ids(sorted(t["id"] for t in grade_tasks), student_id, day)
+                    done = task_ids[:rng.randint(1, len(task_ids))]
+                    writer.add("daily_challenges", {
+                        "id": server.daily_challenge_id(student_id, day),
+                        "user_id": student_id,
+                        "date": day,
+                        "task_ids": task_ids,
+                        "completed": len(done) == len(task_ids),
+                        "completed_task_ids": done,
+                        "created_at": f"{day}T07:30:00+00:00"
+                    })
+
+                template = weekly_templates[grade]
+                done = template["task_ids"][:rng.randint(0, len(template["task_ids"]))]
+                if done:
+                    writer.add("weekly_progress", {
+                        "user_id": student_id,
+                        "week_id": week_id,
+                        "template_id": template["id"],
+                        "completed_task_ids": done,
+                        "completed": len(done) == len(template["task_ids"])
+                    })
+
+                writer.add("users", {
+                    "id": student_id,
+                    "email": f"schueler{school_no + 1}-{class_name}-{student_no + 1}@mathevilla.de",
+                    "password_hash": student_hash,
+                    "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                    "role": "student",
+                    "grade": grade,
+                    "xp": xp,
+                    "level": xp // 100 + 1,
+                    "badges": server.milestone_badges(correct_total, []),
+                    "school": school,
+                    "class_name": class_name,
+                    "synthetic": True,
+                    "created_at": (now - timedelta(days=days + rng.randint(0, 30))).isoformat()
+                })
+
+            for week in range(4):
+                week_start = now - timedelta(days=now.weekday() + 7 * week)
+                writer.add("class_assignments", {
+                    "id": make_uuid(rng),
+                    "class_name": class_name,
+                    "student_ids": student_ids,
+                    "task_ids": [t["id"] for t in rng.sample(grade_tasks, min(8, len(grade_tasks)))],
+                    "due_date": (week_start + timedelta(days=4)).strftime("%Y-%m-%d"),
+                    "title": f"Wochenplan {class_name} KW {week_start.isocalendar()[1]}",
+                    "created_by": teacher_id,
+                    "created_at": week_start.isoformat(),
+                    "submissions": {}
+                })
+
+    writer.close()
+    elapsed = time.perf_counter() - start
+    total = sum(writer.counts.values())
+    print(f"Inserted {total} documents in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} docs/s)")
+    return dict(writer.counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic MatheVilla dataset")
+    parser.add_argument("--schools", type=int, default=5)
+    parser.add_argument("--classes-per-school", type=int, default=6)
+    parser.add_argument("--students-per-class", type=int, default=25)
+    parser.add_argument("--answers-per-student", type=int, default=200)
+    parser.add_argument("--days", type=int, default=120, help="length of the simulated answer history")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=4, help="threads running insert_many")
+    parser.add_argument("--until", help="last day of the history, YYYY-MM-DD (default: today)")
+    parser.add_argument("--reset", action="store_true", help="drop the database first")
+    args = parser.parse_args()
+
+    sync_db = MongoClient(server.mongo_url)[server.db.name]
+    if args.reset:
+        sync_db.client.drop_database(server.db.name)
+    counts = generate(
+        sync_db, args.schools, args.classes_per_school, args.students_per_class,
+        args.answers_per_student, args.days, args.seed, args.workers, args.until
+    )
+    for collection, count in sorted(counts.items()):
+        print(f"  {collection:<20} {count:>10}")
+    sync_db.client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Load tests for the MatheVilla API.
+
+Seeds a local MongoDB with realistic volumes and drives concurrent classroom
+scenarios against the app, either in-process (default) or against a server
+on localhost. Reports throughput and p50/p95/p99 latency per route.
+
+    python tests/load_test.py --reset
+    python tests/load_test.py --base-url http://localhost:8001 --scenarios login_burst
+
+MONGO_URL and DB_NAME (default mathevilla_load_test) select the database. The
+database is only dropped with --reset. Tokens for seeded students are minted
+with the server's JWT_SECRET, so a remote server must share backend/.env.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+BACKEND_DIR = ROOT_DIR / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "mathevilla_load_test")
+
+import httpx  # noqa: E402
+from pymongo import MongoClient  # noqa: E402
+
+import server  # noqa: E402
+from tests.generate_data import STUDENT_PASSWORD, generate  # noqa: E402
+
+ADMIN_CREDENTIALS = {"email": "admin@mathevilla.de", "password": "admin123"}
+
+
+# ================== SEEDING ==================
+
+async def seed(client, sync_db, args):
+    """Seed tasks through the API, then bulk-load schools, students and histories"""
+    for path in ("/api/seed", "/api/seed/additional", "/api/seed/nrw-hauptschule"):
+        await client.post(path)
+    generate(
+        sync_db, schools=args.schools, classes_per_school=args.classes_per_school,
+        students_per_class=args.students_per_class, answers_per_student=args.results, seed=args.seed
+    )
+
+
+# ================== MEASUREMENT ==================
+
+class Recorder:
+    """Collects latencies per route key"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, client, route_key, url, token=None, **kwargs):
+        method = route_key.split(" ", 1)[0]
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, headers=headers, **kwargs)
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            response, failed = None, True
+        self.latencies[route_key].append(time.perf_counter() - start)
+        if failed:
+            self.errors[route_key] += 1
+        return response
+
+
+def percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct))]
+
+
+def report(name, recorder, wall_time):
+    rows = []
+    total = sum(len(v) for v in recorder.latencies.values())
+    print(f"\n=== {name}: {total} requests in {wall_time:.2f}s ({total / wall_time:.1f} req/s) ===")
+    print(f"{'route':<48} {'count':>6} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for route_key, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        row = {
+            "route": route_key,
+            "count": len(values),
+            "errors": recorder.errors[route_key],
+            "rps": round(len(values) / wall_time, 2),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2),
+        }
+        rows.append(row)
+        print(f"{route_key:<48} {row['count']:>6} {row['errors']:>5} {row['rps']:>8} "
+              f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8} {row['max_ms']:>8}")
+    return {"scenario": name, "requests": total, "wall_time_s": round(wall_time, 3), "routes": rows}
+
+
+# ================== SCENARIOS ==================
+
+async def login_burst(client, ctx, recorder, args):
+    """A whole year group logs in at the start of a lesson"""
+    students = ctx["students"][:args.burst]
+    await asyncio.gather(*[
+        recorder.call(client, "POST /api/auth/login", "/api/auth/login",
+                      json={"email": s["email"], "password": STUDENT_PASSWORD})
+        for s in students
+    ])
+
+
+async def class_submits(client, ctx, recorder, args):
+    """A class opens the daily challenge and submits 20 answers each"""
+    rng = random.Random(args.seed)
+
+    async def student_session(student):
+        token = server.create_access_token({"sub": student["id"]})
+        await recorder.call(client, "GET /api/challenges/daily", "/api/challenges/daily", token)
+        tasks = ctx["tasks_by_grade"][student["grade"]]
+        for _ in range(args.answers):
+            task = rng.choice(tasks)
+            answer = task["correct_answer"] if rng.random() < 0.7 else "falsch"
+            await recorder.call(client, "POST /api/tasks/submit", "/api/tasks/submit", token,
+                                json={"task_id": task["id"], "answer": answer})
+        await recorder.call(client, "GET /api/progress/overview", "/api/progress/overview", token)
+
+    await asyncio.gather(*[student_session(s) for s in ctx["students"][:args.class_size]])
+
+
+async def admin_dashboard(client, ctx, recorder, args):
+    """Teachers open the dashboard and drill into students"""
+    token = ctx["admin_token"]
+    rng = random.Random(args.seed)
+
+    async def teacher_session():
+        for _ in range(3):
+            student = rng.choice(ctx["students"])
+            await asyncio.gather(
+                recorder.call(client, "GET /api/admin/stats", "/api/admin/stats", token),
+                recorder.call(client, "GET /api/admin/students", "/api/admin/students", token),
+                recorder.call(client, "GET /api/admin/tasks", "/api/admin/tasks", token),
+            )
+            await recorder.call(client, "GET /api/admin/students/{student_id}", f"/api/admin/students/{student['id']}", token)
+            await recorder.call(client, "GET /api/reports/parent/{student_id}", f"/api/reports/parent/{student['id']}", token)
+
+    await asyncio.gather(*[teacher_session() for _ in range(args.teachers)])
+
+
+SCENARIOS = {
+    "login_burst": login_burst,
+    "class_submits": class_submits,
+    "admin_dashboard": admin_dashboard,
+}
+
+
+# ================== RUNNER ==================
+
+def load_context(sync_db, admin_token):
+    students = list(sync_db.users.find({"synthetic": True, "role": "student"}, {"_id": 0, "id": 1, "email": 1, "grade": 1}))
+    tasks_by_grade = defaultdict(list)
+    for task in sync_db.tasks.find({}, {"_id": 0, "id": 1, "grade": 1, "correct_answer": 1}):
+        tasks_by_grade[task["grade"]].append(task)
+    return {"students": students, "tasks_by_grade": tasks_by_grade, "admin_token": admin_token}
+
+
+async def run(args):
+    sync_db = MongoClient(server.mongo_url)[server.db.name]
+    if args.reset:
+        sync_db.client.drop_database(server.db.name)
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+    else:
+        await server.app.router.startup()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://loadtest", timeout=60)
+
+    results = []
+    try:
+        if sync_db.users.count_documents({"synthetic": True}) == 0:
+            print("Seeding...")
+            await seed(client, sync_db, args)
+
+        login = await client.post("/api/auth/login", json=ADMIN_CREDENTIALS)
+        ctx = load_context(sync_db, login.json()["access_token"])
+
+        for name in args.scenarios:
+            recorder = Recorder()
+            start = time.perf_counter()
+            await SCENARIOS[name](client, ctx, recorder, args)
+            results.append(report(name, recorder, time.perf_counter() - start))
+    finally:
+        await client.aclose()
+        if not args.base_url:
+            await server.app.router.shutdown()
+        sync_db.client.close()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"\nResults written to {args.json}")
+    return results
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the MatheVilla API")
+    parser.add_argument("--base-url", help="server to test, e.g. http://localhost:8001 (default: in-process app)")
+    parser.add_argument("--reset", action="store_true", help="drop the load test database first")
+    parser.add_argument("--schools", type=int, default=4)
+    parser.add_argument("--classes-per-school", type=int, default=20)
+    parser.add_argument("--students-per-class", type=int, default=25)
+    parser.add_argument("--results", type=int, default=100, help="answer history per student")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--burst", type=int, default=200, help="students in the login burst")
+    parser.add_argument("--class-size", type=int, default=30)
+    parser.add_argument("--answers", type=int, default=20, help="answers per student in class_submits")
+    parser.add_argument("--teachers", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Query budget harness for the MatheVilla API.
+
+Runs API requests in-process against a MongoDB instance and reports how many
+database round trips and returned documents each request cost. The numbers
+come from the per-route accounting of server.RequestMetricsMiddleware.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "mathevilla_budget_test")
+
+import server  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+def mongo_available(timeout_ms=1000):
+    """True if the MongoDB at MONGO_URL answers a ping"""
+    from pymongo import MongoClient
+    try:
+        probe = MongoClient(os.environ["MONGO_URL"], serverSelectionTimeoutMS=timeout_ms)
+        probe.admin.command("ping")
+        probe.close()
+        return True
+    except Exception:
+        return False
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryBudgetClient:
+    """TestClient wrapper that measures database cost per request"""
+
+    def __init__(self, app=server.app):
+        self.client = TestClient(app)
+
+    def __enter__(self):
+        self.client.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.client.__exit__(*exc_info)
+
+    def _totals(self):
+        metrics = server._route_metrics.values()
+        return sum(m["queries"] for m in metrics), sum(m["documents"] for m in metrics)
+
+    def request(self, method, url, **kwargs):
+        """Run one request; returns (response, {"queries": n, "documents": m})"""
+        queries_before, documents_before = self._totals()
+        response = self.client.request(method, url, **kwargs)
+        queries_after, documents_after = self._totals()
+        return response, {
+            "queries": queries_after - queries_before,
+            "documents": documents_after - documents_before,
+        }
+
+    def assert_within_budget(self, route_key, method, url, max_queries=None, max_documents=None, **kwargs):
+        """Run a request and fail if it exceeds its budget.
+
+        The budget defaults to server.QUERY_BUDGETS[route_key]; explicit limits
+        override it. Returns the response.
+        """
+        budget = server.QUERY_BUDGETS[route_key]
+        max_queries = budget["queries"] if max_queries is None else max_queries
+        max_documents = budget["documents"] if max_documents is None else max_documents
+
+        response, cost = self.request(method, url, **kwargs)
+        if cost["queries"] > max_queries or cost["documents"] > max_documents:
+            raise QueryBudgetExceeded(
+                f"{route_key}: {cost['queries']} queries (budget {max_queries}), "
+                f"{cost['documents']} documents (budget {max_documents})"
+            )
+        return response
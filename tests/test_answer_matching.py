@@ -0,0 +1,170 @@
+"""
+Answer matching by canonical form and the grading cache. Pure tests, no
+database needed.
+"""
+
+import asyncio
+import time
+import uuid
+
+import pytest
+
+from tests.query_budget import server
+
+MATCHES = [
+    # decimals, German and English
+    ("3,5", "3.5"),
+    ("3.5", "3,5"),
+    (",5", "0,5"),
+    ("-3", "−3"),
+    ("x = 4", "4"),
+    # thousands separators
+    ("1.000", "1000"),
+    ("1 000", "1000"),
+    ("1,000.5", "1000,5"),
+    # fractions and mixed numbers
+    ("1/2", "0,5"),
+    ("1 1/2", "1,5"),
+    ("½", "0,5"),
+    ("2/4", "1/2"),
+    # units of one dimension convert
+    ("5 cm", "50 mm"),
+    ("50 mm", "5 cm"),
+    ("0,05 m", "5 cm"),
+    ("1,5 h", "90 min"),
+    ("1 l", "1000 ml"),
+    ("2 €", "200 ct"),
+    ("7 m^2", "7 m²"),
+    ("7 qm", "7m2"),
+    # percent
+    ("25 %", "25%"),
+    ("25 Prozent", "25%"),
+    # a more precise answer that rounds to the expected one
+    ("3,1416", "3,14"),
+    ("3,144", "3,14"),
+]
+
+MISMATCHES = [
+    ("5 cm", "5 g"),  # different dimensions
+    ("3,15", "3,14"),
+    ("3,146", "3,14"),  # rounds to 3,15
+    ("3,14", "3,1416"),  # less precise than expected
+    ("3", "3,14"),
+]
+
+# Behaviour decided for ambiguous answers, see ANSWER MATCHING in server.py
+DECIDED = [
+    ("250", "250 m", True),  # a missing unit is not held against the answer
+    ("250 m", "250", True),
+    ("1,000", "1", True),  # German decimal comma
+    ("1,000", "1000", False),
+    ("25", "25%", True),  # % is a unit: 25 % means 25
+    ("25%", "0,25", False),
+    ("0,25", "25%", False),
+    ("2m", "2 m", True),  # letters after a number are a unit when a quantity is expected
+    ("2m", "200 cm", True),
+    ("m·2", "2 m", True),  # and a term reading of the expected quantity still counts
+]
+
+
+@pytest.mark.parametrize("answer, expected", MATCHES)
+def test_equivalent_answers_match(answer, expected):
+    assert server.is_answer_correct(answer, expected)
+
+
+@pytest.mark.parametrize("answer, expected", MISMATCHES)
+def test_different_answers_do_not_match(answer, expected):
+    assert not server.is_answer_correct(answer, expected)
+
+
+@pytest.mark.parametrize("answer, expected, correct", DECIDED)
+def test_ambiguous_answers(answer, expected, correct):
+    assert server.is_answer_correct(answer, expected) is correct
+
+
+def test_stored_canonical_form_is_used_and_refreshed():
+    canonical = server.canonical_answer("5 cm")
+    assert server.is_answer_correct("50 mm", "ignored", canonical)
+    # A canonical form from an older parser version is recomputed
+    assert server.is_answer_correct("50 mm", "5 cm", {**canonical, "v": 0, "value": "0/1"})
+
+
+EQUIVALENT_TERMS = [
+    ("3 + 2x", "2x + 3"),
+    ("x·2", "2x"),
+    ("x/2", "0,5x"),
+    ("a·b·c", "c·(b·a)"),
+    ("(a + b) + c", "a + (b + c)"),
+    ("(a + b)(a - b)", "(a - b)(a + b)"),
+    ("x² + 1", "1 + x^2"),
+    ("2^3x", "8x"),
+    # letters on their own are a product of variables
+    ("ab", "a*b"),
+    ("xy", "yx"),
+    # variables that are also unit symbols
+    ("2m", "m*2"),
+    ("2t", "t·2"),
+    ("2x", "x*2"),
+]
+
+DIFFERENT_TERMS = [
+    ("3a + 5a", "8a"),  # like terms are not collected
+    ("2(x + 1)", "2x + 2"),  # products are not expanded
+    ("x - 3", "3 - x"),
+    ("x^2", "2x"),
+    ("ab", "a + b"),
+    ("2m", "2x"),
+    ("2 cm", "2m"),
+]
+
+
+@pytest.mark.parametrize("answer, expected", EQUIVALENT_TERMS)
+def test_reordered_terms_match(answer, expected):
+    assert server.is_answer_correct(answer, expected)
+
+
+@pytest.mark.parametrize("answer, expected", DIFFERENT_TERMS)
+def test_terms_are_not_simplified(answer, expected):
+    assert not server.is_answer_correct(answer, expected)
+
+
+@pytest.mark.parametrize("answer", [
+    "((((9^64)^64)^64)^64)^64x",
+    "9^9^9^9x",
+    "(1/3)^5000 x",
+    "x" + "^x" * 58,
+    "2x/(a/(b/(c/(d/(e/(f/g))))))" * 3,
+])
+def test_huge_terms_are_rejected_quickly(answer):
+    started = time.perf_counter()
+    assert not server.is_answer_correct(answer, "8x")
+    assert time.perf_counter() - started < 1
+
+
+def test_folding_stays_below_the_bit_cap():
+    assert server.canonical_answer(f"2^{server.EXPRESSION_MAX_BITS - 1}x")["kind"] == "expression"
+    assert server.canonical_answer(f"2^{server.EXPRESSION_MAX_BITS + 1}x")["kind"] == "text"
+
+
+def test_grading_cache_key_covers_task_version_seed_and_answer():
+    task = {"id": str(uuid.uuid4()), "version": 1, "correct_answer": "2x + 3"}
+    assert server.grade_answer(task, "3 + 2x")
+    key = server.grading_cache_key(task, "  3 + 2X ")
+    assert key == (task["id"], 1, None, "3 + 2x") and server._grading_cache[key] is True
+
+    # A new version or another template instance is graded again
+    assert not server.grade_answer({**task, "version": 2, "correct_answer": "2x + 4"}, "3 + 2x")
+    assert not server.grade_answer({**task, "seed": 7, "correct_answer": "5"}, "3 + 2x")
+    assert server.grade_answer(task, "3 + 2x")
+
+
+def test_async_grading_times_out_as_wrong(monkeypatch):
+    task = {"id": str(uuid.uuid4()), "version": 1, "correct_answer": "1"}
+
+    def slow_grade_answer(task, answer):
+        time.sleep(0.5)
+        return True
+
+    monkeypatch.setattr(server, "grade_answer", slow_grade_answer)
+    monkeypatch.setattr(server, "GRADING_TIMEOUT_SECONDS", 0.05)
+    assert asyncio.run(server.grade_answer_async(task, "1")) is False
@@ -0,0 +1,145 @@
+"""
+Content packs: loading, adopting legacy seed tasks and applying upgrades.
+
+The loading tests are pure. The apply tests run in-process against the
+MongoDB at MONGO_URL like the query budget tests, and are skipped when none
+is reachable.
+"""
+
+import pytest
+from pymongo import MongoClient
+
+from tests.query_budget import QueryBudgetClient, mongo_available, server
+
+
+@pytest.mark.parametrize("name", server.CONTENT_PACKS)
+def test_pack_loads_and_prepares(name):
+    pack = server.load_content_pack(name)
+    assert pack["name"] == name and pack["version"] >= 1 and pack["tasks"]
+
+    tasks = server.prepare_pack_tasks(pack)
+    content_ids = [t["content_id"] for t in tasks]
+    assert len(set(content_ids)) == len(content_ids)
+    for task in tasks:
+        assert task["correct_answer"] and task["content_hash"] and task["pack_hash"]
+        assert task["is_template"] == ("template" in task)
+
+
+@pytest.fixture(scope="module")
+def packs():
+    if not mongo_available():
+        pytest.skip("no MongoDB reachable at MONGO_URL")
+
+    sync_db = MongoClient(server.mongo_url)[server.db.name]
+    sync_db.client.drop_database(server.db.name)
+
+    with QueryBudgetClient() as budget_client:
+        client = budget_client.client
+        client.post("/api/seed")
+        admin_token = client.post("/api/auth/login", json={"email": "admin@mathevilla.de", "password": "admin123"}).json()["access_token"]
+        yield {
+            "client": client,
+            "db": sync_db,
+            "admin": {"Authorization": f"Bearer {admin_token}"},
+            "apply": lambda: client.portal.call(server.apply_content_pack, "core"),
+        }
+
+    sync_db.client.drop_database(server.db.name)
+    sync_db.client.close()
+
+
+def _reapply(packs):
+    """Apply core again as if its version had been bumped"""
+    packs["db"].content_packs.delete_one({"name": "core"})
+    return packs["apply"]()
+
+
+def test_applying_a_pack_twice_is_idempotent(packs):
+    before = packs["db"].tasks.count_documents({})
+    versions = packs["db"].task_versions.count_documents({})
+
+    assert packs["apply"]()["inserted"] == 0
+    result = _reapply(packs)
+    assert (result["inserted"], result["updated"]) == (0, 0)
+    assert result["unchanged"] == len(server.load_content_pack("core")["tasks"])
+    assert packs["db"].tasks.count_documents({}) == before
+    assert packs["db"].task_versions.count_documents({}) == versions
+
+
+def test_legacy_seed_tasks_are_adopted_by_fingerprint(packs):
+    task = packs["db"].tasks.find_one({"is_template": False}, {"_id": 0})
+    # A task seeded before content packs: same content, no content_id
+    packs["db"].tasks.delete_one({"id": task["id"]})
+    legacy = {k: v for k, v in task.items() if k not in ("content_id", "pack_hash", "content_pack")}
+    packs["db"].tasks.insert_one(dict(legacy))
+
+    result = _reapply(packs)
+    assert (result["inserted"], result["updated"]) == (0, 1)
+    adopted = list(packs["db"].tasks.find({"content_hash": task["content_hash"]}))
+    assert [(t["id"], t["content_id"]) for t in adopted] == [(task["id"], task["content_id"])]
+
+
+def test_upgrade_replaces_the_task_instead_of_merging(packs):
+    task = packs["db"].tasks.find_one({"is_template": False}, {"_id": 0})
+    # Stored from an older pack version that still had a template
+    packs["db"].tasks.update_one({"id": task["id"]}, {"$set": {"pack_hash": "old", "template": {"params": {}}, "is_template": True}})
+
+    assert _reapply(packs)["updated"] == 1
+    upgraded = packs["db"].tasks.find_one({"id": task["id"]})
+    assert "template" not in upgraded and upgraded["is_template"] is False
+    assert upgraded["version"] == task["version"] + 1
+    assert upgraded["created_at"] == task["created_at"]
+
+
+def test_admin_edits_are_not_overwritten_by_upgrades(packs):
+    task = packs["db"].tasks.find_one({"is_template": False}, {"_id": 0})
+    edited = packs["client"].put(f"/api/admin/tasks/{task['id']}", headers=packs["admin"], json={
+        **{field: task[field] for field in ("grade", "topic", "task_type", "options", "correct_answer", "explanation", "xp_reward", "difficulty")},
+        "question": task["question"] + " (überarbeitet)",
+    })
+    assert edited.status_code == 200, edited.text
+    packs["db"].tasks.update_one({"id": task["id"]}, {"$set": {"pack_hash": "old"}})
+
+    result = _reapply(packs)
+    assert (result["updated"], result["diverged"]) == (0, 1)
+    stored = packs["db"].tasks.find_one({"id": task["id"]})
+    assert stored["diverged"] is True
+    assert stored["question"] == task["question"] + " (überarbeitet)"
+
+
+def test_new_pack_tasks_are_checked_for_near_duplicates(packs):
+    task = packs["db"].tasks.find_one({"is_template": False}, {"_id": 0})
+    # An admin's copy in capitals is in the catalog, the pack task is not
+    copy = {**task, "id": "admin-copy", "question": task["question"].upper(), "created_by": "admin"}
+    for field in ("content_id", "pack_hash", "content_pack"):
+        copy.pop(field)
+    copy.update(server.task_fingerprints(copy))
+    packs["db"].tasks.delete_one({"id": task["id"]})
+    packs["db"].tasks.insert_one(copy)
+
+    assert _reapply(packs)["inserted"] == 1
+    inserted = packs["db"].tasks.find_one({"content_id": task["content_id"]})
+    assert inserted["near_duplicate_of"] == "admin-copy"
+
+
+def test_task_changed_during_upgrade_is_retried(packs, monkeypatch):
+    task = packs["db"].tasks.find_one({"is_template": False}, {"_id": 0})
+    packs["db"].tasks.update_one({"id": task["id"]}, {"$set": {"pack_hash": "old"}})
+
+    def replaced_concurrently(filter, replacement):
+        packs["db"].tasks.update_one({"id": task["id"]}, {"$inc": {"version": 1}})
+        return server_replace_one(filter, replacement)
+
+    server_replace_one = server.ReplaceOne
+    with monkeypatch.context() as patch:
+        patch.setattr(server, "ReplaceOne", replaced_concurrently)
+        result = _reapply(packs)
+    assert result["updated"] == 0
+    assert packs["db"].content_packs.find_one({"name": "core"}) is None
+    assert packs["db"].tasks.find_one({"id": task["id"]})["pack_hash"] == "old"
+    assert packs["db"].task_versions.find_one({"id": task["id"], "version": task["version"] + 1}) is None
+
+    result = packs["apply"]()
+    assert result["updated"] == 1
+    assert packs["db"].content_packs.find_one({"name": "core"})["version"] == result["version"]
+    assert packs["db"].task_versions.find_one({"id": task["id"], "version": task["version"] + 2})
@@ -0,0 +1,189 @@
+"""
+Daily challenge derivation.
+
+The selection tests are pure. The API tests run in-process against the
+MongoDB at MONGO_URL like the query budget tests, and are skipped when none
+is reachable.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo import MongoClient
+
+from tests.query_budget import QueryBudgetClient, mongo_available, server
+
+TASK_IDS = [str(uuid.UUID(int=i)) for i in range(200)]
+
+
+def test_pick_is_deterministic_and_order_independent():
+    picked = server.pick_daily_task_ids(TASK_IDS, "user-1", "2025-03-10")
+    assert len(picked) == server.DAILY_CHALLENGE_SIZE
+    assert server.pick_daily_task_ids(list(reversed(TASK_IDS)), "user-1", "2025-03-10") == picked
+    assert server.pick_daily_task_ids(TASK_IDS, "user-1", "2025-03-11") != picked
+    assert server.pick_daily_task_ids(TASK_IDS, "user-2", "2025-03-10") != picked
+
+
+def test_pick_survives_catalog_changes():
+    picked = server.pick_daily_task_ids(TASK_IDS, "user-1", "2025-03-10")
+
+    # Removing tasks that were not picked changes nothing
+    unpicked = [t for t in TASK_IDS if t not in picked]
+    assert server.pick_daily_task_ids(picked + unpicked[:50], "user-1", "2025-03-10") == picked
+
+    # Adding tasks only ever replaces picks by added tasks
+    added = [str(uuid.uuid4()) for _ in range(100)]
+    repicked = server.pick_daily_task_ids(TASK_IDS + added, "user-1", "2025-03-10")
+    assert all(t in picked or t in added for t in repicked)
+
+    # A deleted pick frees only its own slot
+    repicked = server.pick_daily_task_ids([t for t in TASK_IDS if t != picked[0]], "user-1", "2025-03-10")
+    assert repicked[:-1] == picked[1:]
+
+
+def test_challenge_day_accepts_the_grace_period():
+    now = datetime(2025, 3, 11, 0, 5, tzinfo=timezone.utc)
+    assert server.daily_challenge_day("user-1", server.daily_challenge_id("user-1", "2025-03-11"), now) == "2025-03-11"
+    assert server.daily_challenge_day("user-1", server.daily_challenge_id("user-1", "2025-03-10"), now) == "2025-03-10"
+    assert server.daily_challenge_day("user-1", server.daily_challenge_id("user-1", "2025-03-09"), now) is None
+    assert server.daily_challenge_day("user-2", server.daily_challenge_id("user-1", "2025-03-11"), now) is None
+
+
+@pytest.fixture(scope="module")
+def api():
+    if not mongo_available():
+        pytest.skip("no MongoDB reachable at MONGO_URL")
+
+    sync_db = MongoClient(server.mongo_url)[server.db.name]
+    sync_db.client.drop_database(server.db.name)
+
+    with QueryBudgetClient() as budget_client:
+        client = budget_client.client
+        client.post("/api/seed")
+        # Seeded tasks count as existing for a few days
+        seeded_at = (datetime.now(timezone.utc) - timedelta(days=3)).isoformat()
+        sync_db.tasks.update_many({}, {"$set": {"created_at": seeded_at}})
+        server.invalidate_task_catalog()
+        admin_token = client.post("/api/auth/login", json={"email": "admin@mathevilla.de", "password": "admin123"}).json()["access_token"]
+        yield {"client": client, "db": sync_db, "admin": {"Authorization": f"Bearer {admin_token}"}}
+
+    sync_db.client.drop_database(server.db.name)
+    sync_db.client.close()
+
+
+def _student(api):
+    response = api["client"].post("/api/auth/register", json={
+        "email": f"{uuid.uuid4()}@mathevilla.de", "password": "daily123", "name": "Daily", "grade": 7
+    }).json()
+    return {"Authorization": f"Bearer {response['access_token']}"}
+
+
+def test_tasks_added_during_the_day_do_not_change_the_challenge(api):
+    student = _student(api)
+    served = api["client"].get("/api/challenges/daily", headers=student).json()
+
+    for i in range(30):
+        api["client"].post("/api/admin/tasks", headers=api["admin"], json={
+            "grade": 7, "topic": "Dreiecke", "question": f"Neue Aufgabe {i} {uuid.uuid4()}?", "task_type": "free_text",
+            "correct_answer": str(i), "explanation": "-", "difficulty": "leicht",
+        })
+
+    again = api["client"].get("/api/challenges/daily", headers=student).json()
+    assert [t["id"] for t in again["tasks"]] == [t["id"] for t in served["tasks"]]
+
+    task = served["tasks"][0]
+    response = api["client"].post(f"/api/challenges/submit/{served['id']}", headers=student, json={
+        "task_id": task["id"], "answer": task["correct_answer"]
+    })
+    assert response.status_code == 200, response.text
+    assert response.json()["is_correct"] is True
+    assert response.json()["tasks_remaining"] == len(served["tasks"]) - 1
+
+
+def test_yesterdays_challenge_can_be_finished_after_midnight(api):
+    student = _student(api)
+    user_id = api["client"].get("/api/auth/me", headers=student).json()["id"]
+    yesterday = (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%Y-%m-%d")
+    candidates = [t["id"] for t in api["db"].tasks.find({"grade": 7, "created_at": {"$lt": yesterday}}, {"id": 1})]
+    served = server.pick_daily_task_ids(candidates, user_id, yesterday)
+
+    challenge_id = server.daily_challenge_id(user_id, yesterday)
+    response = api["client"].post(f"/api/challenges/submit/{challenge_id}", headers=student, json={"task_id": served[0], "answer": "x"})
+    assert response.status_code == 200, response.text
+    assert api["db"].daily_challenges.find_one({"id": challenge_id})["task_ids"] == served
+
+    stale_id = server.daily_challenge_id(user_id, "2000-01-01")
+    response = api["client"].post(f"/api/challenges/submit/{stale_id}", headers=student, json={"task_id": served[0], "answer": "x"})
+    assert response.status_code == 404
+
+
+def test_failed_recording_releases_the_task(api, monkeypatch):
+    student = _student(api)
+    served = api["client"].get("/api/challenges/daily", headers=student).json()
+    task = served["tasks"][0]
+
+    async def failing_record_answer(submission, current_user):
+        raise RuntimeError("results unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(server, "record_answer", failing_record_answer)
+        with pytest.raises(RuntimeError):
+            api["client"].post(f"/api/challenges/submit/{served['id']}", headers=student, json={
+                "task_id": task["id"], "answer": task["correct_answer"]
+            })
+    assert api["db"].daily_challenges.find_one({"id": served["id"]})["completed_task_ids"] == []
+
+    response = api["client"].post(f"/api/challenges/submit/{served['id']}", headers=student, json={
+        "task_id": task["id"], "answer": task["correct_answer"]
+    }).json()
+    assert response["xp_earned"] > 0
+    assert "already_submitted" not in response
+
+
+def test_xp_is_incremented_in_place(api):
+    student = _student(api)
+    user_id = api["client"].get("/api/auth/me", headers=student).json()["id"]
+    # Another request raised the XP since this one was authenticated
+    api["db"].users.update_one({"id": user_id}, {"$set": {"xp": 95}})
+    task = api["client"].get("/api/challenges/daily", headers=student).json()["tasks"][0]
+
+    response = api["client"].post("/api/tasks/submit", headers=student, json={
+        "task_id": task["id"], "answer": task["correct_answer"]
+    }).json()
+    user = api["db"].users.find_one({"id": user_id})
+    assert user["xp"] == 95 + response["xp_earned"]
+    assert response["level_up"] is True
+    assert user["level"] == 2
+
+
+def test_duplicate_progress_is_merged_before_indexing(api):
+    api["db"].daily_challenges.drop_indexes()
+    api["db"].daily_challenges.insert_many([
+        {"id": "a", "user_id": "dup", "date": "2025-01-01", "task_ids": ["t1", "t2"], "completed": False,
+         "completed_task_ids": ["t1"], "created_at": "2025-01-01T08:00:00"},
+        {"id": "b", "user_id": "dup", "date": "2025-01-01", "task_ids": ["t1", "t2"], "completed": False,
+         "completed_task_ids": ["t1", "t2"], "created_at": "2025-01-01T09:00:00"},
+    ])
+
+    api["client"].portal.call(server.dedupe_progress_documents)
+    api["client"].portal.call(server.apply_indexes)
+
+    merged = list(api["db"].daily_challenges.find({"user_id": "dup"}))
+    assert [(c["id"], c["completed_task_ids"]) for c in merged] == [("b", ["t1", "t2"])]
+    assert any(index.get("unique") for index in api["db"].daily_challenges.index_information().values())
+
+
+def test_tasks_are_ranked_only_when_the_challenge_is_stored(api, monkeypatch):
+    student = _student(api)
+    served = api["client"].get("/api/challenges/daily", headers=student).json()
+    first, second = served["tasks"][:2]
+    api["client"].post(f"/api/challenges/submit/{served['id']}", headers=student, json={"task_id": first["id"], "answer": "x"})
+
+    async def ranked_again(*args):
+        raise AssertionError("daily tasks ranked for a stored challenge")
+
+    monkeypatch.setattr(server, "get_daily_task_ids", ranked_again)
+    response = api["client"].post(f"/api/challenges/submit/{served['id']}", headers=student, json={"task_id": second["id"], "answer": "x"})
+    assert response.status_code == 200, response.text
+    assert api["db"].daily_challenges.find_one({"id": served["id"]})["completed_task_ids"] == [first["id"], second["id"]]
@@ -0,0 +1,98 @@
+"""
+Idempotency-Key handling on answer submissions.
+
+Runs in-process against the MongoDB at MONGO_URL like the query budget tests,
+and is skipped when none is reachable.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo import MongoClient
+
+from tests.query_budget import QueryBudgetClient, mongo_available, server
+
+
+@pytest.fixture(scope="module")
+def api():
+    if not mongo_available():
+        pytest.skip("no MongoDB reachable at MONGO_URL")
+
+    sync_db = MongoClient(server.mongo_url)[server.db.name]
+    sync_db.client.drop_database(server.db.name)
+
+    with QueryBudgetClient() as budget_client:
+        client = budget_client.client
+        client.post("/api/seed")
+        task = sync_db.tasks.find_one({"grade": 7, "template": None}, {"_id": 0})
+        yield {"client": client, "db": sync_db, "task": task}
+
+    sync_db.client.drop_database(server.db.name)
+    sync_db.client.close()
+
+
+def _submit(api, headers, key, answer=None):
+    return api["client"].post("/api/tasks/submit", headers={**headers, "Idempotency-Key": key}, json={
+        "task_id": api["task"]["id"], "answer": api["task"]["correct_answer"] if answer is None else answer
+    })
+
+
+@pytest.fixture
+def student(api):
+    response = api["client"].post("/api/auth/register", json={
+        "email": f"{uuid.uuid4()}@mathevilla.de", "password": "idem123", "name": "Idem", "grade": 7
+    }).json()
+    return {"headers": {"Authorization": f"Bearer {response['access_token']}"}, "id": response["user"]["id"]}
+
+
+def _results(api, student):
+    return api["db"].results.count_documents({"user_id": student["id"]})
+
+
+def test_replay_returns_the_stored_response(api, student):
+    first = _submit(api, student["headers"], "k1")
+    replay = _submit(api, student["headers"], "k1")
+    assert first.status_code == replay.status_code == 200
+    assert replay.json() == first.json()
+    assert _results(api, student) == 1
+
+    assert _submit(api, student["headers"], "k1", answer="anders").status_code == 422
+
+
+def test_duplicate_while_running_is_rejected(api, student):
+    _submit(api, student["headers"], "k2")
+    # The first request is still running and holds the lease
+    api["db"].idempotency_keys.update_one(
+        {"user_id": student["id"], "key": "k2"},
+        {"$set": {"status": "pending", "lease_until": datetime.now(timezone.utc) + timedelta(minutes=1)}, "$unset": {"response": ""}}
+    )
+    assert _submit(api, student["headers"], "k2").status_code == 409
+    assert _results(api, student) == 1
+
+
+def test_stale_lease_is_taken_over(api, student):
+    _submit(api, student["headers"], "k3")
+    # The worker running the first request died before storing the response
+    api["db"].idempotency_keys.update_one(
+        {"user_id": student["id"], "key": "k3"},
+        {"$set": {"status": "pending", "lease_until": datetime.now(timezone.utc) - timedelta(seconds=1)}, "$unset": {"response": ""}}
+    )
+    retry = _submit(api, student["headers"], "k3")
+    assert retry.status_code == 200
+    assert _submit(api, student["headers"], "k3").json() == retry.json()
+    assert api["db"].idempotency_keys.find_one({"user_id": student["id"], "key": "k3"})["status"] == "done"
+
+
+def test_failure_releases_the_key(api, student, monkeypatch):
+    async def failing_record_answer(submission, current_user):
+        raise RuntimeError("results unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(server, "record_answer", failing_record_answer)
+        with pytest.raises(RuntimeError):
+            _submit(api, student["headers"], "k4")
+    assert api["db"].idempotency_keys.find_one({"user_id": student["id"], "key": "k4"}) is None
+
+    assert _submit(api, student["headers"], "k4").status_code == 200
+    assert _results(api, student) == 1
@@ -0,0 +1,94 @@
+"""
+Near-duplicate detection: MinHash signatures, LSH buckets and clustering.
+
+The clustering tests are pure. The API test runs in-process against the
+MongoDB at MONGO_URL like the query budget tests, and is skipped when none is
+reachable.
+"""
+
+import uuid
+from collections import defaultdict
+
+import pytest
+from pymongo import MongoClient
+
+from tests.query_budget import QueryBudgetClient, mongo_available, server
+
+
+def _task(question, answer="42", **fields):
+    task = {"id": str(uuid.uuid4()), "grade": 7, "topic": "Dreiecke", "question": question, "correct_answer": answer, **fields}
+    return {**task, **server.task_fingerprints(task)}
+
+
+def _buckets(tasks):
+    ids_by_band = defaultdict(list)
+    for task in tasks:
+        for band in task["minhash_bands"]:
+            ids_by_band[band].append(task["id"])
+    return list(ids_by_band.values())
+
+
+ORIGINAL = _task("Ein Dreieck hat die Seiten a = 3 cm, b = 4 cm und c = 5 cm. Berechne den Umfang des Dreiecks in Zentimetern.")
+REWORDED = _task("Ein Dreieck hat die Seiten a = 3 cm, b = 4 cm und c = 5 cm. Berechne den Umfang des Dreiecks in cm.")
+REPUNCTUATED = _task("Ein Dreieck hat die Seiten a=3 cm, b=4 cm und c=5 cm! Berechne den Umfang des Dreiecks in Zentimetern?")
+UNRELATED = _task("Ein Zylinder hat den Radius 2 m und die Höhe 5 m. Wie groß ist sein Volumen?", answer="62,83")
+
+
+def test_signatures_are_deterministic():
+    assert server.task_fingerprints(ORIGINAL)["minhash_bands"] == ORIGINAL["minhash_bands"]
+    assert len(ORIGINAL["minhash_bands"]) == server.MINHASH_BANDS
+
+
+def test_near_duplicates_share_a_band_and_distinct_tasks_do_not():
+    assert set(ORIGINAL["minhash_bands"]) & set(REWORDED["minhash_bands"])
+    assert set(ORIGINAL["minhash_bands"]) == set(REPUNCTUATED["minhash_bands"])
+    assert not set(ORIGINAL["minhash_bands"]) & set(UNRELATED["minhash_bands"])
+
+
+def test_clusters_group_near_duplicates_only():
+    tasks = [ORIGINAL, UNRELATED, REWORDED, REPUNCTUATED]
+    clusters = server.near_duplicate_clusters(_buckets(tasks), tasks)
+    assert [{t["id"] for t in cluster} for cluster in clusters] == [{ORIGINAL["id"], REWORDED["id"], REPUNCTUATED["id"]}]
+
+
+def test_bucket_collisions_below_the_threshold_are_not_clustered():
+    # Both tasks land in one bucket, but their shingles are too different
+    tasks = [ORIGINAL, UNRELATED]
+    assert server.near_duplicate_clusters([[ORIGINAL["id"], UNRELATED["id"]]], tasks) == []
+
+
+def test_match_near_duplicates_against_known_and_earlier_tasks():
+    batch = [UNRELATED, REWORDED, _task(UNRELATED["question"] + " Runde auf zwei Stellen.", answer="62,83")]
+    assert server.match_near_duplicates(batch, [ORIGINAL]) == [None, ORIGINAL["id"], UNRELATED["id"]]
+
+
+@pytest.fixture(scope="module")
+def api():
+    if not mongo_available():
+        pytest.skip("no MongoDB reachable at MONGO_URL")
+
+    sync_db = MongoClient(server.mongo_url)[server.db.name]
+    sync_db.client.drop_database(server.db.name)
+
+    with QueryBudgetClient() as budget_client:
+        client = budget_client.client
+        client.post("/api/seed")
+        admin_token = client.post("/api/auth/login", json={"email": "admin@mathevilla.de", "password": "admin123"}).json()["access_token"]
+        yield {"client": client, "db": sync_db, "admin": {"Authorization": f"Bearer {admin_token}"}}
+
+    sync_db.client.drop_database(server.db.name)
+    sync_db.client.close()
+
+
+def test_duplicate_clusters_route_finds_a_reworded_copy(api):
+    seeded = api["db"].tasks.find_one({"is_template": {"$ne": True}, "task_type": "free_text"}, {"_id": 0})
+    created = api["client"].post("/api/admin/tasks", headers=api["admin"], json={
+        **{field: seeded[field] for field in ("grade", "topic", "task_type", "correct_answer", "explanation", "difficulty")},
+        "question": seeded["question"].rstrip("?.!") + "!",
+    }).json()
+    assert created["near_duplicate_of"] == seeded["id"]
+
+    report = api["client"].get("/api/admin/tasks/duplicates", headers=api["admin"]).json()
+    clusters = [{t["id"] for t in cluster["tasks"]} for cluster in report["clusters"]]
+    assert any({seeded["id"], created["id"]} <= cluster for cluster in clusters)
+    assert report["duplicate_tasks"] == sum(len(cluster) - 1 for cluster in clusters)
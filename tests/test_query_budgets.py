@@ -0,0 +1,283 @@
+"""
+Query budgets for every API route.
+
+Each route is called in-process against the MongoDB at MONGO_URL (a throwaway
+database, DB_NAME defaults to mathevilla_budget_test) and must stay within its
+entry in server.QUERY_BUDGETS. Requires a local mongod; the database tests are
+skipped when none is reachable.
+
+Every case starts from the same database: the state the module fixture seeds
+is restored before each case, so cases do not see each other's writes and can
+run alone or in any order.
+"""
+
+import io
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from pymongo import MongoClient
+
+from tests.query_budget import QueryBudgetClient, mongo_available, server
+
+STUDENT_COUNT = 20
+RESULTS_PER_STUDENT = 40
+
+
+def api_route_keys():
+    return {
+        f"{method} {route.path}"
+        for route in server.app.routes if getattr(route, "path", "").startswith("/api")
+        for method in route.methods
+    }
+
+
+def test_every_route_has_a_budget():
+    assert api_route_keys() - set(server.QUERY_BUDGETS) == set()
+    assert set(server.QUERY_BUDGETS) - api_route_keys() == set()
+
+
+@pytest.fixture(scope="module")
+def ctx():
+    if not mongo_available():
+        pytest.skip("no MongoDB reachable at MONGO_URL")
+
+    sync_db = MongoClient(server.mongo_url)[server.db.name]
+    sync_db.client.drop_database(server.db.name)
+
+    with QueryBudgetClient() as budget_client:
+        client = budget_client.client
+        client.post("/api/seed")
+        admin_token = client.post("/api/auth/login", json={"email": "admin@mathevilla.de", "password": "admin123"}).json()["access_token"]
+
+        students = []
+        for i in range(STUDENT_COUNT):
+            response = client.post("/api/auth/register", json={
+                "email": f"budget{i}@mathevilla.de", "password": "budget123", "name": f"Budget {i}", "grade": 7
+            }).json()
+            students.append({"id": response["user"]["id"], "token": response["access_token"]})
+
+        # Answer history large enough that a per-answer query loop blows the budget
+        tasks = list(sync_db.tasks.find({"grade": 7}, {"_id": 0}))
+        now = datetime.now(timezone.utc).isoformat()
+        history = [
+            {
+                "id": str(uuid.uuid4()),
+                "user_id": student["id"],
+                "task_id": tasks[i % len(tasks)]["id"],
+                "grade": 7,
+                "topic": tasks[i % len(tasks)]["topic"],
+                "answer": "x",
+                "is_correct": i % 3 != 0,
+                "created_at": now,
+            }
+            for student in students for i in range(RESULTS_PER_STUDENT)
+        ]
+        sync_db.results.insert_many([dict(doc) for doc in history])
+        sync_db.answers.insert_many([dict(doc) for doc in history])
+
+        yield {
+            "snapshot": {name: list(sync_db[name].find()) for name in sync_db.list_collection_names()},
+            "client": budget_client,
+            "db": sync_db,
+            "admin": {"Authorization": f"Bearer {admin_token}"},
+            "student": {"Authorization": f"Bearer {students[0]['token']}"},
+            "student_id": students[0]["id"],
+            "task": tasks[0],
+        }
+
+    sync_db.client.drop_database(server.db.name)
+    sync_db.client.close()
+
+
+@pytest.fixture
+def case(ctx):
+    """ctx with the database restored to the seeded state"""
+    for name in ctx["db"].list_collection_names():
+        ctx["db"][name].delete_many({})
+        if ctx["snapshot"].get(name):
+            ctx["db"][name].insert_many([dict(doc) for doc in ctx["snapshot"][name]])
+    server.invalidate_task_catalog()
+    server._weekly_templates.clear()
+    return ctx
+
+
+def _reset_token(ctx):
+    response = ctx["client"].client.post("/api/auth/password-reset-request", json={"email": "budget1@mathevilla.de"})
+    return response.json()["reset_token"]
+
+
+def _new_task_id(ctx):
+    task_id = str(uuid.uuid4())
+    # content_id is unique to the pack task this copies
+    ctx["db"].tasks.insert_one({**ctx["task"], "id": task_id, "content_id": task_id})
+    return task_id
+
+
+def _template_task_id(ctx):
+    return ctx["db"].tasks.find_one({"is_template": True}, {"id": 1})["id"]
+
+
+def _daily_challenge(ctx):
+    return ctx["client"].client.get("/api/challenges/daily", headers=ctx["student"]).json()
+
+
+def _weekly_task(ctx):
+    return ctx["client"].client.get("/api/challenges/weekly", headers=ctx["student"]).json()["tasks"][0]
+
+
+TASK_BODY = {
+    "grade": 7, "topic": "Dreiecke", "question": "Budget-Frage?", "task_type": "free_text",
+    "options": None, "correct_answer": "1", "explanation": "1", "xp_reward": 10, "difficulty": "leicht",
+}
+
+# route key -> callable(ctx) returning (url, request kwargs)
+CASES = {
+    "POST /api/auth/register": lambda c: ("/api/auth/register", {"json": {"email": f"{uuid.uuid4()}@x.de", "password": "budget123", "name": "Neu", "grade": 7}}),
+    "POST /api/auth/login": lambda c: ("/api/auth/login", {"json": {"email": "budget0@mathevilla.de", "password": "budget123"}}),
+    "GET /api/auth/me": lambda c: ("/api/auth/me", {"headers": c["student"]}),
+    "PUT /api/auth/grade": lambda c: ("/api/auth/grade?grade=7", {"headers": c["student"]}),
+    "POST /api/auth/password-reset-request": lambda c: ("/api/auth/password-reset-request", {"json": {"email": "budget1@mathevilla.de"}}),
+    "POST /api/auth/password-reset-confirm": lambda c: ("/api/auth/password-reset-confirm", {"json": {"token": _reset_token(c), "new_password": "budget123"}}),
+    "PUT /api/auth/change-password": lambda c: ("/api/auth/change-password", {"headers": c["student"], "json": {"old_password": "budget123", "new_password": "budget123"}}),
+    "GET /api/tasks/grades": lambda c: ("/api/tasks/grades", {}),
+    "GET /api/tasks/topics/{grade}": lambda c: ("/api/tasks/topics/7", {}),
+    "GET /api/tasks/{grade}/{topic}": lambda c: (f"/api/tasks/7/{c['task']['topic']}", {"headers": c["student"]}),
+    "GET /api/tasks/single/{task_id}": lambda c: (f"/api/tasks/single/{c['task']['id']}", {"headers": c["student"]}),
+    "GET /api/tasks/single/{task_id}/instances": lambda c: (f"/api/tasks/single/{_template_task_id(c)}/instances?count=200", {"headers": c["student"]}),
+    "POST /api/tasks/submit": lambda c: ("/api/tasks/submit", {"headers": c["student"], "json": {"task_id": c["task"]["id"], "answer": c["task"]["correct_answer"]}}),
+    "GET /api/progress/overview": lambda c: ("/api/progress/overview", {"headers": c["student"]}),
+    "GET /api/progress/stats": lambda c: ("/api/progress/stats", {"headers": c["student"]}),
+    "GET /api/challenges/daily": lambda c: ("/api/challenges/daily", {"headers": c["student"]}),
+    "POST /api/challenges/submit/{challenge_id}": lambda c: (lambda ch: (f"/api/challenges/submit/{ch['id']}", {"headers": c["student"], "json": {"task_id": ch["tasks"][0]["id"], "answer": ch["tasks"][0]["correct_answer"]}}))(_daily_challenge(c)),
+    "GET /api/recommendations": lambda c: ("/api/recommendations", {"headers": c["student"]}),
+    "GET /api/recommendations/ai": lambda c: ("/api/recommendations/ai", {"headers": c["student"]}),
+    "GET /api/admin/stats": lambda c: ("/api/admin/stats", {"headers": c["admin"]}),
+    "GET /api/admin/students": lambda c: ("/api/admin/students", {"headers": c["admin"]}),
+    "GET /api/admin/students/{student_id}": lambda c: (f"/api/admin/students/{c['student_id']}", {"headers": c["admin"]}),
+    "POST /api/admin/tasks": lambda c: ("/api/admin/tasks", {"headers": c["admin"], "json": TASK_BODY}),
+    "PUT /api/admin/tasks/{task_id}": lambda c: (f"/api/admin/tasks/{_new_task_id(c)}", {"headers": c["admin"], "json": TASK_BODY}),
+    "DELETE /api/admin/tasks/{task_id}": lambda c: (f"/api/admin/tasks/{_new_task_id(c)}", {"headers": c["admin"]}),
+    "GET /api/admin/tasks/{task_id}/versions": lambda c: (f"/api/admin/tasks/{c['task']['id']}/versions", {"headers": c["admin"]}),
+    "GET /api/admin/tasks": lambda c: ("/api/admin/tasks", {"headers": c["admin"]}),
+    "POST /api/admin/tasks/import-csv": lambda c: ("/api/admin/tasks/import-csv", {"headers": c["admin"], "files": {"file": ("tasks.csv", io.BytesIO(
+        "grade,topic,question,correct_answer\n7,Dreiecke,CSV 1?,1\n7,Dreiecke,CSV 2?,2\n7,Dreiecke,CSV 3?,3\n".encode()
+    ), "text/csv")}}),
+    "GET /api/admin/tasks/duplicates": lambda c: ("/api/admin/tasks/duplicates", {"headers": c["admin"]}),
+    "GET /api/admin/tasks/page": lambda c: ("/api/admin/tasks/page?grade=7&limit=20", {"headers": c["admin"]}),
+    "GET /api/admin/tasks/search": lambda c: ("/api/admin/tasks/search?q=Dreiecke", {"headers": c["admin"]}),
+    "GET /api/admin/tasks/export": lambda c: ("/api/admin/tasks/export?format=csv", {"headers": c["admin"]}),
+    "POST /api/seed": lambda c: ("/api/seed", {}),
+    "POST /api/seed/additional": lambda c: ("/api/seed/additional", {}),
+    "POST /api/seed/nrw-hauptschule": lambda c: ("/api/seed/nrw-hauptschule", {}),
+    "GET /api/admin/content-packs": lambda c: ("/api/admin/content-packs", {"headers": c["admin"]}),
+    "GET /api/features": lambda c: ("/api/features", {"headers": c["student"]}),
+    "PUT /api/admin/features/{user_id}": lambda c: (f"/api/admin/features/{c['student_id']}", {"headers": c["admin"], "json": {}}),
+    "POST /api/ai/explain-mistake": lambda c: ("/api/ai/explain-mistake", {"headers": c["student"], "json": {"task_id": c["task"]["id"], "student_answer": "x"}}),
+    "GET /api/recommendations/adaptive": lambda c: ("/api/recommendations/adaptive", {"headers": c["student"]}),
+    "POST /api/practice/submit": lambda c: ("/api/practice/submit", {"headers": c["student"], "json": {"task_id": c["task"]["id"], "answer": "x"}}),
+    "GET /api/readiness/{topic}": lambda c: (f"/api/readiness/{c['task']['topic']}", {"headers": c["student"]}),
+    "GET /api/badges/available": lambda c: ("/api/badges/available", {}),
+    "GET /api/badges/check": lambda c: ("/api/badges/check", {"headers": c["student"]}),
+    "GET /api/challenges/weekly": lambda c: ("/api/challenges/weekly", {"headers": c["student"]}),
+    "POST /api/challenges/weekly/submit": lambda c: (lambda t: ("/api/challenges/weekly/submit", {"headers": c["student"], "json": {"task_id": t["id"], "answer": t["correct_answer"]}}))(_weekly_task(c)),
+    "GET /api/reports/parent/{student_id}": lambda c: (f"/api/reports/parent/{c['student_id']}", {"headers": c["admin"]}),
+    "POST /api/class/assign": lambda c: ("/api/class/assign", {"headers": c["admin"], "json": {"class_name": "7a", "student_ids": [c["student_id"]], "task_ids": [c["task"]["id"]], "title": "Budget"}}),
+    "GET /api/class/assignments": lambda c: ("/api/class/assignments", {"headers": c["student"]}),
+    "GET /api/admin/index-advisor": lambda c: ("/api/admin/index-advisor", {"headers": c["admin"]}),
+    "GET /api/metrics": lambda c: ("/api/metrics", {}),
+    "GET /api/admin/loop-lag": lambda c: ("/api/admin/loop-lag", {"headers": c["admin"]}),
+    "GET /api/health/live": lambda c: ("/api/health/live", {}),
+    "GET /api/health/ready": lambda c: ("/api/health/ready", {}),
+    "GET /api/admin/profiles": lambda c: ("/api/admin/profiles", {"headers": c["admin"]}),
+    "PUT /api/admin/profiling": lambda c: ("/api/admin/profiling", {"headers": c["admin"], "json": {"sample_rate": 0}}),
+    "GET /api/": lambda c: ("/api/", {}),
+}
+
+
+# route key -> callable(ctx, response) that holds when the response content is right
+CHECKS = {
+    "POST /api/auth/register": lambda c, r: r.json()["access_token"] and r.json()["user"]["grade"] == 7,
+    "POST /api/auth/login": lambda c, r: r.json()["access_token"] and r.json()["user"]["id"] == c["student_id"],
+    "GET /api/auth/me": lambda c, r: r.json()["id"] == c["student_id"],
+    "PUT /api/auth/grade": lambda c, r: r.json()["grade"] == 7,
+    "POST /api/auth/password-reset-request": lambda c, r: r.json()["reset_token"],
+    "POST /api/auth/password-reset-confirm": lambda c, r: "message" in r.json(),
+    "PUT /api/auth/change-password": lambda c, r: "message" in r.json(),
+    "GET /api/tasks/grades": lambda c, r: r.json()["grades"] == [5, 6, 7, 8, 9, 10],
+    "GET /api/tasks/topics/{grade}": lambda c, r: c["task"]["topic"] in r.json()["topics"],
+    "GET /api/tasks/{grade}/{topic}": lambda c, r: c["task"]["id"] in {t["id"] for t in r.json()} and all(t["topic"] == c["task"]["topic"] for t in r.json()),
+    "GET /api/tasks/single/{task_id}": lambda c, r: r.json()["id"] == c["task"]["id"],
+    "GET /api/tasks/single/{task_id}/instances": lambda c, r: r.json() and all(t["correct_answer"] for t in r.json()),
+    "POST /api/tasks/submit": lambda c, r: r.json()["is_correct"] is True and r.json()["xp_earned"] > 0,
+    "GET /api/progress/overview": lambda c, r: c["task"]["topic"] in {p["topic"] for p in r.json()},
+    "GET /api/progress/stats": lambda c, r: r.json()["total_tasks_completed"] >= RESULTS_PER_STUDENT,
+    "GET /api/challenges/daily": lambda c, r: len(r.json()["tasks"]) == server.DAILY_CHALLENGE_SIZE,
+    "POST /api/challenges/submit/{challenge_id}": lambda c, r: r.json()["is_correct"] is True and r.json()["xp_earned"] > 0,
+    "GET /api/recommendations": lambda c, r: all(rec["tasks"] for rec in r.json()),
+    "GET /api/recommendations/ai": lambda c, r: r.json()["recommendation"],
+    "GET /api/admin/stats": lambda c, r: r.json()["total_students"] == STUDENT_COUNT and r.json()["total_answers"] == STUDENT_COUNT * RESULTS_PER_STUDENT,
+    "GET /api/admin/students": lambda c, r: len(r.json()) == STUDENT_COUNT,
+    "GET /api/admin/students/{student_id}": lambda c, r: r.json()["id"] == c["student_id"],
+    "POST /api/admin/tasks": lambda c, r: r.json()["question"] == TASK_BODY["question"],
+    "PUT /api/admin/tasks/{task_id}": lambda c, r: r.json()["question"] == TASK_BODY["question"],
+    "DELETE /api/admin/tasks/{task_id}": lambda c, r: "message" in r.json(),
+    "GET /api/admin/tasks/{task_id}/versions": lambda c, r: r.json()[0]["id"] == c["task"]["id"],
+    "GET /api/admin/tasks": lambda c, r: c["task"]["id"] in {t["id"] for t in r.json()},
+    "POST /api/admin/tasks/import-csv": lambda c, r: r.json()["imported"] == 3 and r.json()["failed"] == 0,
+    "GET /api/admin/tasks/duplicates": lambda c, r: "clusters" in r.json(),
+    "GET /api/admin/tasks/page": lambda c, r: r.json()["items"] and all(t["grade"] == 7 for t in r.json()["items"]),
+    "GET /api/admin/tasks/search": lambda c, r: r.json()["items"],
+    "GET /api/admin/tasks/export": lambda c, r: r.text.startswith("id,grade,topic,question") and c["task"]["id"] in r.text,
+    "POST /api/seed": lambda c, r: r.json()["unchanged"] == r.json()["task_count"],
+    "POST /api/seed/additional": lambda c, r: r.json()["inserted"] > 0,
+    "POST /api/seed/nrw-hauptschule": lambda c, r: r.json()["inserted"] > 0,
+    "GET /api/admin/content-packs": lambda c, r: "core" in {p["name"] for p in r.json()["packs"]},
+    "GET /api/features": lambda c, r: isinstance(r.json()["practice_mode"], bool),
+    "PUT /api/admin/features/{user_id}": lambda c, r: "message" in r.json(),
+    "POST /api/ai/explain-mistake": lambda c, r: c["task"]["correct_answer"] in r.json()["explanation"],
+    "GET /api/recommendations/adaptive": lambda c, r: r.json() and all(rec["task_id"] for rec in r.json()),
+    "POST /api/practice/submit": lambda c, r: r.json()["mode"] == "practice" and r.json()["is_correct"] is False,
+    "GET /api/readiness/{topic}": lambda c, r: r.json()["topic"] == c["task"]["topic"] and r.json()["tasks_completed"] > 0,
+    "GET /api/badges/available": lambda c, r: r.json(),
+    "GET /api/badges/check": lambda c, r: "new_badges" in r.json(),
+    "GET /api/challenges/weekly": lambda c, r: r.json()["task_ids"] and r.json()["grade"] == 7,
+    "POST /api/challenges/weekly/submit": lambda c, r: r.json()["is_correct"] is True and r.json()["progress"].startswith("1/"),
+    "GET /api/reports/parent/{student_id}": lambda c, r: r.json()["summary"]["total_exercises"] == RESULTS_PER_STUDENT,
+    "POST /api/class/assign": lambda c, r: r.json()["assignment_id"],
+    "GET /api/class/assignments": lambda c, r: isinstance(r.json(), list),
+    "GET /api/admin/index-advisor": lambda c, r: r.json()["shapes"] and r.json()["undeclared_routes"] == [],
+    "GET /api/metrics": lambda c, r: "mathevilla_http_requests_total" in r.text,
+    "GET /api/admin/loop-lag": lambda c, r: "p95_ms" in r.json(),
+    "GET /api/health/live": lambda c, r: r.json()["status"] == "ok",
+    "GET /api/health/ready": lambda c, r: r.json()["checks"]["mongo"]["status"] == "up",
+    "GET /api/admin/profiles": lambda c, r: "profiles" in r.json(),
+    "PUT /api/admin/profiling": lambda c, r: r.json()["sample_rate"] == 0,
+    "GET /api/": lambda c, r: r.json()["version"],
+}
+
+
+def test_every_route_has_a_case():
+    assert set(server.QUERY_BUDGETS) - set(CASES) == set()
+    assert set(CASES) - set(CHECKS) == set()
+
+
+@pytest.mark.parametrize("route_key", sorted(CASES))
+def test_route_stays_within_query_budget(case, route_key):
+    method = route_key.split(" ", 1)[0]
+    url, kwargs = CASES[route_key](case)
+    response = case["client"].assert_within_budget(route_key, method, url, **kwargs)
+    assert response.status_code == 200, response.text
+    assert CHECKS[route_key](case, response), response.text
+
+
+def test_task_page_prefix_search_ignores_case(case):
+    question = case["task"]["question"]
+    prefix = question[:6].swapcase()
+    response = case["client"].assert_within_budget(
+        "GET /api/admin/tasks/page", "GET", "/api/admin/tasks/page", params={"q": prefix, "limit": 5}, headers=case["admin"]
+    )
+    page = response.json()
+    assert page["items"] and all(t["question"].lower().startswith(prefix.lower()) for t in page["items"])
+    assert case["task"]["id"] in {t["id"] for t in page["items"]} or page["next_cursor"]
+    assert page["total"] == sum(f["count"] for f in page["facets"]["grade"])
@@ -0,0 +1,117 @@
+"""
+CSV import and export of tasks: row parsing, the per-row report, duplicate
+detection across batches and the export -> import round trip. Pure tests, no
+database needed.
+"""
+
+import csv
+import io
+
+import pytest
+
+from tests.query_budget import server
+
+HEADER = "grade,topic,question,correct_answer,options,task_type,template\n"
+
+
+def _reader(text):
+    return csv.DictReader(io.StringIO(text, newline=""))
+
+
+def _read_all(text, batch_size=server.IMPORT_BATCH_SIZE):
+    """All batches of a file, as read_import_batch is called by the import"""
+    reader, batches, rows_read = _reader(text), [], 0
+    while True:
+        valid, errors = server.read_import_batch(reader, batch_size, rows_read)
+        if not valid and not errors:
+            return batches
+        rows_read += len(valid) + len(errors)
+        batches.append((valid, errors))
+
+
+def test_optional_columns_get_defaults():
+    task = server.parse_task_row({"grade": "7", "topic": "Dreiecke", "question": " Umfang? ", "correct_answer": "12", "options": ""})
+    assert (task.question, task.task_type, task.explanation, task.options, task.template) == ("Umfang?", "free_text", "", None, None)
+    assert server.parse_task_row({
+        "grade": "7", "topic": "Dreiecke", "question": "Welche?", "correct_answer": "a", "options": "a|b|c", "task_type": "multiple_choice"
+    }).options == ["a", "b", "c"]
+
+
+@pytest.mark.parametrize("row, message", [
+    ({"grade": "7", "topic": "Dreiecke", "question": "?", "correct_answer": "1", None: ["zu viel"]}, "Zu viele Spalten"),
+    ({"grade": "7", "topic": "Dreiecke", "question": "?", "correct_answer": "1", "template": "{kaputt"}, "template ist kein gültiges JSON"),
+])
+def test_malformed_rows_raise_value_error(row, message):
+    with pytest.raises(ValueError, match=message):
+        server.parse_task_row(row)
+
+
+def test_report_names_row_line_field_and_message():
+    text = HEADER + (
+        '7,Dreiecke,"Zweizeilige\nFrage?",1,,,\n'  # row 1 spans lines 2-3
+        'sieben,Dreiecke,Frage?,1,,,\n'  # row 2, line 4
+        '7,Dreiecke,Frage?,,,,\n'  # row 3, line 5: correct_answer missing
+        '7,Dreiecke,Frage?,1,,free_text,"{""question"": ""{a}?"", ""answer"": ""min(a)"", ""params"": {""a"": {""min"": 1, ""max"": 9}}}"\n'
+    )
+    [(valid, errors)] = _read_all(text)
+    assert [(row, line) for row, line, _ in valid] == [(1, 3)]
+    assert valid[0][2]["question"] == "Zweizeilige\nFrage?"
+    assert [(e["row"], e["line"], [err["field"] for err in e["errors"]]) for e in errors] == [
+        (2, 4, ["grade"]), (3, 5, ["correct_answer"]), (4, 6, [None]),
+    ]
+    assert all(err["message"] for e in errors for err in e["errors"])
+    assert "Fehler in der Vorlage" in errors[2]["errors"][0]["message"]
+
+
+def test_batches_continue_the_row_numbers():
+    text = HEADER + "".join(f"7,Dreiecke,Frage {i}?,{i},,,\n" for i in range(1, 6)) + "x,Dreiecke,Frage?,1,,,\n"
+    batches = _read_all(text, batch_size=2)
+    assert [len(valid) + len(errors) for valid, errors in batches] == [2, 2, 2]
+    assert [row for valid, _ in batches for row, _, _ in valid] == [1, 2, 3, 4, 5]
+    assert [e["row"] for _, errors in batches for e in errors] == [6]
+
+
+def test_duplicates_are_found_in_the_file_and_the_catalog():
+    text = HEADER + (
+        "7,Dreiecke,Frage A?,1,,,\n"
+        "7,Dreiecke,Frage B?,2,,,\n"
+        "7,Dreiecke,  frage   a?,1,,,\n"  # row 1 again, up to case and whitespace
+        "7,Dreiecke,Frage C?,3,,,\n"
+        "7,Dreiecke,Frage B?,2,,,\n"  # row 2 again, in the next batch
+    )
+    catalog_task = {"grade": 7, "topic": "Dreiecke", "question": "Frage C?", "correct_answer": "3"}
+    existing = {server.task_content_hash(catalog_task): "catalog-id"}
+    seen_hashes = {}
+    new, duplicates = [], []
+    for valid, _ in _read_all(text, batch_size=3):
+        batch_new, batch_duplicates = server.split_import_duplicates(valid, existing, seen_hashes)
+        new += batch_new
+        duplicates += batch_duplicates
+
+    assert [row for row, _, _ in new] == [1, 2]
+    assert [(d["row"], d["duplicate_of"]) for d in duplicates] == [(3, "Zeile 1"), (4, "catalog-id"), (5, "Zeile 2")]
+
+
+def test_export_imports_again_unchanged():
+    tasks = [
+        task for name in server.CONTENT_PACKS for task in server.prepare_pack_tasks(server.load_content_pack(name))
+    ]
+    assert any(task["is_template"] for task in tasks) and any(task.get("options") for task in tasks)
+    for i, task in enumerate(tasks):
+        task["id"] = f"task-{i}"
+
+    buffer = io.StringIO(newline="")
+    writer = csv.writer(buffer)
+    writer.writerow(["id"] + server.CSV_TASK_COLUMNS)
+    writer.writerows(server.task_csv_row(task) for task in tasks)
+
+    batches = _read_all(buffer.getvalue())
+    assert [e for _, errors in batches for e in errors] == []
+    imported = [fields for valid, _ in batches for _, _, fields in valid]
+    assert len(imported) == len(tasks)
+    for task, fields in zip(tasks, imported):
+        expected = {**fields, **{column: task[column] for column in server.CSV_TASK_COLUMNS if column in task}}
+        if task["is_template"]:
+            expected["template"] = server.TaskTemplate.model_validate(task["template"]).model_dump()
+        assert fields == expected, task["id"]
+        assert fields["is_template"] == task["is_template"]
@@ -0,0 +1,138 @@
+"""
+Template tasks through the admin API, the weekly challenge and the data generator.
+
+Runs in-process against the MongoDB at MONGO_URL like the query budget tests,
+and is skipped when none is reachable.
+"""
+
+import uuid
+
+import pytest
+from pymongo import MongoClient
+
+from tests.generate_data import generate
+from tests.query_budget import QueryBudgetClient, mongo_available, server
+
+EDITABLE_FIELDS = ("grade", "topic", "question", "task_type", "options", "correct_answer", "explanation", "xp_reward", "difficulty")
+
+TEMPLATE_TASK = {
+    "grade": 7, "topic": "Terme und Gleichungen", "question": "", "task_type": "free_text", "correct_answer": "",
+    "explanation": "", "xp_reward": 10, "difficulty": "leicht",
+}
+
+
+def _template(answer="a + b", **params):
+    return {
+        "question": "Was ergibt {a} + {b}?", "answer": answer,
+        "params": params or {"a": {"min": 1, "max": 9}, "b": {"min": 1, "max": 9}},
+    }
+
+
+@pytest.mark.parametrize("template", [
+    _template("min(a)"),
+    _template("sqrt()"),
+    _template("a + b", a={"min": -1e308, "max": 1e308, "step": 1e-300}, b={"min": 1, "max": 9}),
+    _template("a + b", a={"min": 0, "max": 10 ** 7}, b={"min": 1, "max": 9}),
+    _template("a + b", a={"min": 0, "max": 1, "step": "nan"}, b={"min": 1, "max": 9}),
+    {"question": "Was ergibt {a}?", "answer": "a", "params": {"a": {"min": "viel"}}},
+    {"question": "Was ergibt {a}?", "params": {"a": {"min": 1, "max": 9}}},
+])
+def test_invalid_templates_raise_value_error(template):
+    with pytest.raises(ValueError):
+        server.validate_task_template({**TEMPLATE_TASK, "template": template})
+
+
+def test_invalid_pack_template_is_left_out():
+    pack = {"name": "test", "version": 1, "tasks": [
+        {**TEMPLATE_TASK, "content_id": "ok", "template": _template()},
+        {**TEMPLATE_TASK, "content_id": "bad", "template": _template("min(a)")},
+    ]}
+    assert [task["content_id"] for task in server.prepare_pack_tasks(pack)] == ["ok"]
+
+
+@pytest.fixture(scope="module")
+def api():
+    if not mongo_available():
+        pytest.skip("no MongoDB reachable at MONGO_URL")
+
+    sync_db = MongoClient(server.mongo_url)[server.db.name]
+    sync_db.client.drop_database(server.db.name)
+
+    with QueryBudgetClient() as budget_client:
+        client = budget_client.client
+        client.post("/api/seed")
+        admin_token = client.post("/api/auth/login", json={"email": "admin@mathevilla.de", "password": "admin123"}).json()["access_token"]
+        yield {"client": client, "db": sync_db, "admin": {"Authorization": f"Bearer {admin_token}"}}
+
+    sync_db.client.drop_database(server.db.name)
+    sync_db.client.close()
+
+
+def _admin_task(api, task_id):
+    items = api["client"].get("/api/admin/tasks", headers=api["admin"]).json()
+    return next(t for t in items if t["id"] == task_id)
+
+
+def test_admin_views_include_the_template(api):
+    task_id = api["db"].tasks.find_one({"is_template": True}, {"id": 1})["id"]
+    assert _admin_task(api, task_id)["template"]["answer"]
+
+    page = api["client"].get("/api/admin/tasks/page", headers=api["admin"], params={"limit": 100}).json()
+    assert all(t["template"] for t in page["items"] if t["is_template"])
+
+
+def test_edit_without_template_field_keeps_the_template(api):
+    task = _admin_task(api, api["db"].tasks.find_one({"is_template": True}, {"id": 1})["id"])
+
+    response = api["client"].put(f"/api/admin/tasks/{task['id']}", headers=api["admin"], json={
+        **{field: task[field] for field in EDITABLE_FIELDS}, "xp_reward": task["xp_reward"] + 5
+    })
+    assert response.status_code == 200, response.text
+    assert response.json()["is_template"] is True
+    assert response.json()["template"] == task["template"]
+
+    # Sending the field explicitly still changes it
+    response = api["client"].put(f"/api/admin/tasks/{task['id']}", headers=api["admin"], json={
+        **{field: task[field] for field in EDITABLE_FIELDS}, "template": None
+    })
+    assert response.json()["is_template"] is False
+    assert api["db"].tasks.find_one({"id": task["id"]}).get("template") is None
+
+
+def test_invalid_template_is_a_bad_request(api):
+    response = api["client"].post("/api/admin/tasks", headers=api["admin"], json={
+        **TEMPLATE_TASK, "template": _template("min(a)")
+    })
+    assert response.status_code == 400, response.text
+
+
+def test_weekly_challenge_grades_the_instance_shown(api):
+    task = api["db"].tasks.find_one({"is_template": True}, {"_id": 0})
+    seed = next(seed for seed in range(1, 100) if server.generate_instances(task, [seed])[0]["correct_answer"] != task["correct_answer"])
+    instance = server.generate_instances(task, [seed])[0]
+    week_id = server.current_week_id()
+    api["db"].weekly_templates.replace_one({"grade": task["grade"], "week_id": week_id}, {
+        "id": str(uuid.uuid4()), "grade": task["grade"], "week_id": week_id, "task_ids": [task["id"]], "bonus_xp": 0,
+    }, upsert=True)
+    server._weekly_templates.clear()
+    token = api["client"].post("/api/auth/register", json={
+        "email": f"{uuid.uuid4()}@mathevilla.de", "password": "weekly123", "name": "Weekly", "grade": task["grade"]
+    }).json()["access_token"]
+
+    response = api["client"].post("/api/challenges/weekly/submit", headers={"Authorization": f"Bearer {token}"}, json={
+        "task_id": task["id"], "answer": instance["correct_answer"], "seed": seed
+    })
+    assert response.status_code == 200, response.text
+    assert response.json()["is_correct"] is True
+    assert response.json()["correct_answer"] == instance["correct_answer"]
+
+
+def test_generator_inserts_prepared_pack_tasks(api):
+    api["db"].client.drop_database(server.db.name)
+    generate(api["db"], schools=1, classes_per_school=1, students_per_class=2, answers_per_student=5, days=3, until="2025-03-10")
+
+    templates = list(api["db"].tasks.find({"is_template": True}))
+    assert templates
+    for task in api["db"].tasks.find():
+        assert task["correct_answer"] and task["content_hash"] and task["minhash_bands"]
+    assert api["db"].task_versions.count_documents({}) == api["db"].tasks.count_documents({})
@@ -0,0 +1,90 @@
+"""
+Which task version an answer is graded against.
+
+Runs in-process against the MongoDB at MONGO_URL like the query budget tests,
+and is skipped when none is reachable.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo import MongoClient
+
+from tests.query_budget import QueryBudgetClient, mongo_available, server
+
+
+@pytest.fixture(scope="module")
+def api():
+    if not mongo_available():
+        pytest.skip("no MongoDB reachable at MONGO_URL")
+
+    sync_db = MongoClient(server.mongo_url)[server.db.name]
+    sync_db.client.drop_database(server.db.name)
+
+    with QueryBudgetClient() as budget_client:
+        client = budget_client.client
+        client.post("/api/seed")
+        admin_token = client.post("/api/auth/login", json={"email": "admin@mathevilla.de", "password": "admin123"}).json()["access_token"]
+        student_token = client.post("/api/auth/register", json={
+            "email": f"{uuid.uuid4()}@mathevilla.de", "password": "version123", "name": "Version", "grade": 7
+        }).json()["access_token"]
+        yield {
+            "client": client,
+            "db": sync_db,
+            "admin": {"Authorization": f"Bearer {admin_token}"},
+            "student": {"Authorization": f"Bearer {student_token}"},
+        }
+
+    sync_db.client.drop_database(server.db.name)
+    sync_db.client.close()
+
+
+def _edited_task(api):
+    """A new task edited once: version 1 answers 1, version 2 answers 2"""
+    body = {
+        "grade": 7, "topic": "Dreiecke", "question": f"Versionierte Aufgabe {uuid.uuid4()}?", "task_type": "free_text",
+        "correct_answer": "1", "explanation": "-", "difficulty": "leicht",
+    }
+    task = api["client"].post("/api/admin/tasks", headers=api["admin"], json=body).json()
+    api["client"].put(f"/api/admin/tasks/{task['id']}", headers=api["admin"], json={**body, "correct_answer": "2"})
+    return task["id"]
+
+
+def _submit(api, task_id, answer, version):
+    return api["client"].post("/api/tasks/submit", headers=api["student"], json={
+        "task_id": task_id, "answer": answer, "task_version": version
+    })
+
+
+def test_version_replaced_moments_ago_is_graded(api):
+    task_id = _edited_task(api)
+    response = _submit(api, task_id, "1", 1)
+    assert response.status_code == 200, response.text
+    assert response.json()["is_correct"] is True
+    assert _submit(api, task_id, "2", 2).json()["is_correct"] is True
+
+
+def test_stale_version_is_rejected(api):
+    task_id = _edited_task(api)
+    replaced_at = datetime.now(timezone.utc) - timedelta(seconds=server.TASK_VERSION_GRACE_SECONDS + 60)
+    api["db"].tasks.update_one({"id": task_id}, {"$set": {"updated_at": replaced_at.isoformat()}})
+    assert _submit(api, task_id, "1", 1).status_code == 409
+
+    # Two edits ago is stale however recent the edit
+    task_id = _edited_task(api)
+    task = api["client"].get(f"/api/tasks/single/{task_id}", headers=api["student"]).json()
+    api["client"].put(f"/api/admin/tasks/{task_id}", headers=api["admin"], json={
+        **{field: task[field] for field in ("grade", "topic", "question", "task_type", "explanation", "difficulty")},
+        "correct_answer": "3",
+    })
+    assert _submit(api, task_id, "1", 1).status_code == 409
+    assert _submit(api, task_id, "9", 9).status_code == 409
+
+
+def test_deleted_task_is_not_graded_at_any_version(api):
+    task_id = _edited_task(api)
+    api["client"].delete(f"/api/admin/tasks/{task_id}", headers=api["admin"])
+    assert _submit(api, task_id, "1", 1).status_code == 404
+    assert _submit(api, task_id, "2", 2).status_code == 404
+    assert _submit(api, task_id, "2", None).status_code == 404